@@ -0,0 +1,120 @@
+import argparse
+import csv
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT_DIR, 'src'))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from run_benchmarks import git_revision, populate
+
+
+def read_csv(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        return sum(1 for _ in csv.DictReader(f))
+
+
+def read_json(path):
+    with open(path, encoding='utf-8') as f:
+        return len(json.load(f))
+
+
+def read_jsonl(path):
+    with open(path, encoding='utf-8') as f:
+        return sum(1 for line in f if json.loads(line))
+
+
+def read_parquet(path):
+    import pyarrow.parquet as pq
+    return pq.read_table(path).num_rows
+
+
+def read_arrow(path):
+    import pyarrow as pa
+    with pa.OSFile(path) as f:
+        return pa.ipc.open_stream(f).read_all().num_rows
+
+
+READERS = {'csv': read_csv, 'json': read_json, 'jsonl': read_jsonl,
+           'parquet': read_parquet, 'arrow': read_arrow}
+
+
+def measure(path, write, read):
+    started = time.perf_counter()
+    write(path)
+    write_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    rows = read(path)
+    read_seconds = time.perf_counter() - started
+    return {
+        'rows': rows,
+        'bytes': os.path.getsize(path),
+        'write_seconds': round(write_seconds, 3),
+        'read_seconds': round(read_seconds, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare export size and speed across CSV, JSON and columnar formats')
+    parser.add_argument('--rows', type=int, default=200000, help='Calls to generate (a quarter get transcripts)')
+    parser.add_argument('--row-group-size', type=int, default=100000)
+    parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+    args = parser.parse_args()
+
+    import columnar_export
+    from models import DatabaseManager
+    from transcript_processor import TranscriptProcessor
+
+    workdir = tempfile.mkdtemp(prefix='robo_export_bench_')
+    db_manager = DatabaseManager(os.path.join(workdir, 'bench.db'))
+    populate(db_manager, args.rows)
+    processor = TranscriptProcessor(db_manager)
+
+    def text_writer(format_type):
+        def write(path):
+            with open(path, 'w', encoding='utf-8', newline='') as f:
+                for chunk in processor.stream_transcripts(format_type):
+                    f.write(chunk)
+        return write
+
+    def columnar_writer(table, format_type):
+        def write(path):
+            columnar_export.write_table(db_manager, table, path, format_type, args.row_group_size)
+        return write
+
+    results = {'transcripts': {}, 'calls': {}}
+    for format_type in ['csv', 'json', 'jsonl']:
+        results['transcripts'][format_type] = measure(
+            os.path.join(workdir, f'transcripts.{format_type}'), text_writer(format_type), READERS[format_type])
+    for table in results:
+        for format_type in columnar_export.COLUMNAR_FORMATS:
+            results[table][format_type] = measure(
+                os.path.join(workdir, f'{table}.{format_type}'), columnar_writer(table, format_type),
+                READERS[format_type])
+
+    report = {
+        'generated_at': datetime.now().isoformat(),
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'calls': args.rows,
+        'row_group_size': args.row_group_size,
+        'results': results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+        print(f'Benchmark report written to {args.output}')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
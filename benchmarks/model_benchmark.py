@@ -0,0 +1,112 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT_DIR, 'src'))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from run_benchmarks import git_revision, populate
+
+
+@dataclass
+class LegacyCall:
+    id: Optional[int] = None
+    contact_id: int = 0
+    call_sid: str = ""
+    status: str = "pending"
+    duration: Optional[int] = None
+    start_time: Optional[datetime] = None
+    end_time: Optional[datetime] = None
+    retry_count: int = 0
+    transcript_url: Optional[str] = None
+    recording_url: Optional[str] = None
+    campaign_id: Optional[str] = None
+    script_id: Optional[int] = None
+
+
+def legacy_read_calls(db_manager):
+    conn = db_manager.get_connection()
+    cursor = conn.cursor()
+    cursor.execute('SELECT * FROM calls ORDER BY start_time DESC')
+    rows = cursor.fetchall()
+    conn.close()
+    return [LegacyCall(
+        id=row['id'],
+        contact_id=row['contact_id'],
+        call_sid=row['call_sid'],
+        status=row['status'],
+        duration=row['duration'],
+        start_time=datetime.fromisoformat(row['start_time']) if row['start_time'] else None,
+        end_time=datetime.fromisoformat(row['end_time']) if row['end_time'] else None,
+        retry_count=row['retry_count'],
+        transcript_url=row['transcript_url'],
+        recording_url=row['recording_url'],
+        campaign_id=row['campaign_id'],
+        script_id=row['script_id']
+    ) for row in rows]
+
+
+def measure(read):
+    gc.collect()
+    started = time.perf_counter()
+    result = read()
+    elapsed = time.perf_counter() - started
+    del result
+    gc.collect()
+    tracemalloc.start()
+    result = read()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'rows': len(result),
+        'seconds': round(elapsed, 3),
+        'retained_mb': round(retained / 2 ** 20, 1),
+        'peak_mb': round(peak / 2 ** 20, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare row decoding cost for call reads')
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+    args = parser.parse_args()
+
+    from models import DatabaseManager
+    workdir = tempfile.mkdtemp(prefix='robo_model_bench_')
+    db_manager = DatabaseManager(os.path.join(workdir, 'bench.db'))
+    populate(db_manager, args.rows)
+
+    results = {
+        'legacy_dataclass': measure(lambda: legacy_read_calls(db_manager)),
+        'slotted_lazy': measure(db_manager.get_all_calls),
+        'raw_dicts': measure(db_manager.get_call_history_rows),
+    }
+    report = {
+        'generated_at': datetime.now().isoformat(),
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'rows': args.rows,
+        'results': results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+        print(f'Benchmark report written to {args.output}')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
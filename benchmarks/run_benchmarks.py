@@ -0,0 +1,330 @@
+import argparse
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(ROOT_DIR, 'src')
+sys.path.append(SRC_DIR)
+
+DEFAULT_SCALES = [10000, 100000, 1000000]
+CALL_STATUSES = ['completed', 'failed', 'busy', 'no-answer', 'completed', 'canceled']
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def latency_summary(seconds):
+    return {
+        'count': len(seconds),
+        'p50_ms': round(percentile(seconds, 0.5) * 1000, 3),
+        'p99_ms': round(percentile(seconds, 0.99) * 1000, 3),
+        'max_ms': round(max(seconds) * 1000, 3),
+    }
+
+
+def serve(wsgi_app, port):
+    from werkzeug.serving import make_server
+    server = make_server('127.0.0.1', port, wsgi_app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def start_environment(args):
+    import logging
+    sim_port = free_port()
+    app_port = free_port()
+    os.environ.update({
+        'TWILIO_ACCOUNT_SID': 'ACbenchmark',
+        'TWILIO_AUTH_TOKEN': 'benchmark',
+        'TWILIO_PHONE_NUMBER': '+15550000000',
+        'TWILIO_API_BASE_URL': f'http://127.0.0.1:{sim_port}',
+        'TWILIO_WEBHOOK_URL': f'http://127.0.0.1:{app_port}/webhook',
+        'LOG_LEVEL': 'WARNING',
+        'DIAL_MAX_CALLS_PER_SECOND': '0',
+        'DIAL_MAX_CONCURRENT': str(args.dial_workers),
+    })
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+    import twilio_simulator
+    settings = twilio_simulator.SimulatorSettings(
+        api_latency_ms=(args.api_latency_ms, args.api_latency_ms),
+        callback_latency_ms=(1, 5),
+        time_scale=args.time_scale,
+        seed=1,
+    )
+    simulator = twilio_simulator.TwilioSimulator(settings)
+    serve(twilio_simulator.create_simulator_app(simulator, f'http://127.0.0.1:{sim_port}'), sim_port)
+
+    import app as app_module
+    serve(app_module.app, app_port)
+    return app_module, simulator, app_port
+
+
+def populate(db_manager, calls, chunk_size=50000):
+    conn = db_manager.get_connection()
+    cursor = conn.cursor()
+    base_time = datetime.now() - timedelta(days=30)
+    for start in range(0, calls, chunk_size):
+        end = min(start + chunk_size, calls)
+        cursor.executemany(
+            'INSERT INTO contacts (phone_number, name, status) VALUES (?, ?, ?)',
+            [(f'+1555{i:07d}', f'Contact {i}', 'active') for i in range(start, end)])
+        cursor.executemany(
+            'INSERT INTO calls (contact_id, call_sid, status, duration, start_time, end_time, retry_count) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            [(i + 1, f'CA{i:032d}', CALL_STATUSES[i % len(CALL_STATUSES)], i % 120,
+              base_time + timedelta(seconds=i), base_time + timedelta(seconds=i + 60), i % 3)
+             for i in range(start, end)])
+        cursor.executemany(
+            'INSERT INTO transcripts (call_id, transcript_text, confidence_score) VALUES (?, ?, ?)',
+            [(i + 1, 'Hello, this is a benchmark call transcript. Thank you for your time.', 0.85)
+             for i in range(start, end) if i % 4 == 0])
+        conn.commit()
+    conn.close()
+
+
+def bench_dialing(args):
+    app_module, simulator, _ = start_environment(args)
+    from models import Contact
+    contact_ids = app_module.db_manager.bulk_add_contacts(
+        [Contact(phone_number=f'+1555{i:07d}', name=f'Contact {i}') for i in range(args.calls)])
+    started = time.perf_counter()
+    result = app_module.call_manager.make_bulk_calls(contact_ids)
+    elapsed = time.perf_counter() - started
+    return {
+        'calls': args.calls,
+        'dial_workers': args.dial_workers,
+        'api_latency_ms': args.api_latency_ms,
+        'successful_calls': result.get('successful_calls', 0),
+        'seconds': round(elapsed, 3),
+        'calls_per_second': round(args.calls / elapsed, 2),
+    }
+
+
+def bench_webhooks(args):
+    import requests
+    app_module, simulator, app_port = start_environment(args)
+    populate(app_module.db_manager, args.calls)
+    statuses = ['ringing', 'in-progress', 'completed', 'busy', 'no-answer']
+    local = threading.local()
+
+    def post(call_id):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        status = statuses[call_id % len(statuses)]
+        started = time.perf_counter()
+        response = session.post(f'http://127.0.0.1:{app_port}/webhook/status/{call_id}', data={
+            'CallSid': f'CA{call_id - 1:032d}', 'CallStatus': status,
+            'CallDuration': '30' if status == 'completed' else '', 'SequenceNumber': '0'})
+        return time.perf_counter() - started, response.status_code
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        outcomes = list(executor.map(post, range(1, args.calls + 1)))
+    elapsed = time.perf_counter() - started
+    summary = latency_summary([latency for latency, _ in outcomes])
+    summary.update({
+        'concurrency': args.concurrency,
+        'errors': sum(1 for _, code in outcomes if code >= 400),
+        'requests_per_second': round(len(outcomes) / elapsed, 2),
+    })
+    return summary
+
+
+def bench_ingest(args):
+    import asyncio
+    from urllib.parse import urlencode
+    from webhook_ingest import WebhookIngest
+    app_module, _, _ = start_environment(args)
+    populate(app_module.db_manager, args.calls)
+    ingest = WebhookIngest(app_module.webhook_processor, app_module.call_manager,
+                           queue_size=args.calls)
+    statuses = ['ringing', 'in-progress', 'completed', 'busy', 'no-answer']
+    bodies = [urlencode({'CallSid': f'CA{call_id - 1:032d}', 'CallStatus': statuses[call_id % len(statuses)],
+                         'CallDuration': '30', 'SequenceNumber': '0'}).encode()
+              for call_id in range(1, args.calls + 1)]
+
+    async def deliver(call_id, body):
+        messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+        codes = []
+
+        async def receive():
+            return messages.pop()
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                codes.append(message['status'])
+
+        await ingest({'type': 'http', 'method': 'POST', 'path': f'/webhook/status/{call_id}', 'headers': []},
+                     receive, send)
+        return codes[0]
+
+    async def deliver_all():
+        # Concurrent like an ASGI server: requests waiting on the inbox share its commits.
+        limit = asyncio.Semaphore(args.concurrency)
+
+        async def bounded(call_id, body):
+            async with limit:
+                return await deliver(call_id, body)
+        return await asyncio.gather(*(bounded(call_id, body) for call_id, body in enumerate(bodies, 1)))
+
+    ingest.start()
+    started = time.perf_counter()
+    codes = asyncio.run(deliver_all())
+    accept_seconds = time.perf_counter() - started
+    ingest.join()
+    drain_seconds = time.perf_counter() - started
+    ingest.stop()
+    return {
+        'calls': args.calls,
+        'workers': ingest.workers,
+        'concurrency': args.concurrency,
+        'errors': sum(1 for code in codes if code >= 400),
+        'accepted_per_second': round(len(codes) / accept_seconds, 2),
+        'processed_per_second': round(ingest.processed / drain_seconds, 2),
+        'failed': ingest.failed,
+    }
+
+
+def bench_scale(args):
+    app_module, _, _ = start_environment(args)
+    started = time.perf_counter()
+    populate(app_module.db_manager, args.calls)
+    populate_seconds = time.perf_counter() - started
+
+    client = app_module.app.test_client()
+    render_times = {'cold': [], 'warm': []}
+    for _ in range(args.repeat):
+        # Cold renders run the dashboard queries and template; warm ones are cache hits.
+        app_module.response_cache.clear()
+        for kind in ('cold', 'warm'):
+            started = time.perf_counter()
+            response = client.get('/')
+            render_times[kind].append(time.perf_counter() - started)
+            if response.status_code != 200:
+                raise RuntimeError(f'Dashboard returned {response.status_code}')
+
+    started = time.perf_counter()
+    dry_run = app_module.retry_handler.retry_failed_calls(dry_run=True)
+    dry_run_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    sweep = app_module.retry_handler.retry_failed_calls()
+    sweep_seconds = time.perf_counter() - started
+    app_module.retry_handler.shutdown()
+
+    return {
+        'calls': args.calls,
+        'populate_seconds': round(populate_seconds, 3),
+        'dashboard_render_ms': {kind: {
+            'median': round(statistics.median(times) * 1000, 3),
+            'min': round(min(times) * 1000, 3),
+        } for kind, times in render_times.items()},
+        'retry_sweep': {
+            'eligible_calls': dry_run.get('eligible_calls', 0),
+            'dry_run_seconds': round(dry_run_seconds, 3),
+            'retries_scheduled': sweep.get('retries_scheduled', 0),
+            'sweep_seconds': round(sweep_seconds, 3),
+        },
+    }
+
+
+SCENARIOS = {
+    'dialing': bench_dialing,
+    'webhooks': bench_webhooks,
+    'ingest': bench_ingest,
+    'scale': bench_scale,
+}
+
+
+def run_scenario(args):
+    workdir = tempfile.mkdtemp(prefix=f'robo_bench_{args.scenario}_')
+    os.chdir(workdir)
+    result = SCENARIOS[args.scenario](args)
+    print(json.dumps(result))
+    sys.stdout.flush()
+    os._exit(0)
+
+
+def spawn(scenario, extra_args, args):
+    command = [sys.executable, os.path.abspath(__file__), '--scenario', scenario,
+               '--dial-workers', str(args.dial_workers), '--api-latency-ms', str(args.api_latency_ms),
+               '--time-scale', str(args.time_scale), '--repeat', str(args.repeat)] + extra_args
+    completed = subprocess.run(command, capture_output=True, text=True)
+    if completed.returncode != 0:
+        return {'error': completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else 'failed'}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end throughput benchmarks (runs offline against the Twilio simulator)')
+    parser.add_argument('--scales', type=lambda value: [int(v) for v in value.split(',')], default=DEFAULT_SCALES)
+    parser.add_argument('--dial-calls', type=int, default=500)
+    parser.add_argument('--webhook-calls', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--dial-workers', type=int, default=8)
+    parser.add_argument('--api-latency-ms', type=float, default=20)
+    parser.add_argument('--time-scale', type=float, default=1000.0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+    parser.add_argument('--scenario', choices=sorted(SCENARIOS), help=argparse.SUPPRESS)
+    parser.add_argument('--calls', type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.scenario:
+        run_scenario(args)
+        return
+
+    results = {
+        'dialing': spawn('dialing', ['--calls', str(args.dial_calls)], args),
+        'webhooks': spawn('webhooks', ['--calls', str(args.webhook_calls),
+                                       '--concurrency', str(args.concurrency)], args),
+        'ingest': spawn('ingest', ['--calls', str(args.webhook_calls),
+                                   '--concurrency', str(args.concurrency)], args),
+        'scale': {str(scale): spawn('scale', ['--calls', str(scale)], args) for scale in args.scales},
+    }
+    report = {
+        'generated_at': datetime.now().isoformat(),
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+        print(f'Benchmark report written to {args.output}')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
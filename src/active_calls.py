@@ -0,0 +1,56 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from config import config
+from models import DatabaseManager
+
+
+class ActiveCallRegistry:
+
+    def __init__(self, db_manager: DatabaseManager, ttl_minutes: float=None):
+        self.db_manager = db_manager
+        self.ttl_minutes = (ttl_minutes if ttl_minutes is not None else
+            config.dialer.active_call_ttl_minutes)
+        self.logger = logging.getLogger(__name__)
+
+    def add(self, call_id: int, call_sid: str):
+        self.db_manager.add_active_call(call_id, call_sid, datetime.now())
+
+    def remove(self, call_id: int) ->bool:
+        return self.remove_many([call_id]) > 0
+
+    def remove_many(self, call_ids: List[int]) ->int:
+        if not call_ids:
+            return 0
+        return self.db_manager.delete_active_calls(call_ids)
+
+    def get(self, call_id: int) ->Optional[Dict[str, Any]]:
+        row = self.db_manager.get_active_call(call_id)
+        if not row:
+            return None
+        return {'call_id': row['call_id'], 'call_sid': row['call_sid'],
+            'started_at': datetime.fromisoformat(row['started_at'])}
+
+    def call_ids(self) ->List[int]:
+        self.expire_stale()
+        return self.db_manager.get_active_call_ids()
+
+    def count(self) ->int:
+        return self.db_manager.count_active_calls()
+
+    def expire_stale(self) ->List[int]:
+        if not self.ttl_minutes or self.ttl_minutes <= 0:
+            return []
+        expired = self.db_manager.expire_active_calls(datetime.now() -
+            timedelta(minutes=self.ttl_minutes))
+        if expired:
+            self.logger.warning(
+                f'Expired {len(expired)} active calls with no final status after {self.ttl_minutes} minutes'
+                )
+        return expired
+
+    def __contains__(self, call_id: int) ->bool:
+        return self.db_manager.get_active_call(call_id) is not None
+
+    def __len__(self) ->int:
+        return self.count()
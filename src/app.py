@@ -1,16 +1,28 @@
-from flask import Flask, request, jsonify, render_template, redirect, url_for, flash, send_file
+from flask import Flask, Response, request, jsonify, render_template, redirect, url_for, flash, stream_with_context
 from werkzeug.utils import secure_filename
 import os
 import logging
+import time
 from datetime import datetime
 import json
 from models import DatabaseManager
 from phone_list_manager import PhoneListManager
 from call_manager import CallManager
 from retry_handler import RetryHandler
-from transcript_processor import TranscriptProcessor
+from transcript_processor import EXPORT_FORMATS, TranscriptProcessor
+from columnar_export import COLUMNAR_FORMATS, EXPORT_TABLES, require_pyarrow, stream_table
 from config import config
-app = Flask(__name__)
+from provider import provider
+from event_bus import event_bus, format_sse
+from response_cache import ResponseCache
+from archive_manager import ArchiveManager
+from webhook_processor import WebhookProcessor
+from change_feed import ChangeFeed
+import metrics
+startup_started = time.perf_counter()
+SSE_KEEPALIVE_SECONDS = 15
+app = Flask(__name__, template_folder=os.path.join(os.path.dirname(os.path.
+    abspath(__file__)), os.pardir, 'templates'))
 app.secret_key = os.environ.get('SECRET_KEY', 'your-secret-key-here')
 UPLOAD_FOLDER = 'data/uploads'
 ALLOWED_EXTENSIONS = {'csv', 'xlsx', 'xls'}
@@ -21,11 +33,47 @@ os.makedirs('logs', exist_ok=True)
 logging.basicConfig(level=getattr(logging, config.log_level), format=
     '%(asctime)s - %(name)s - %(levelname)s - %(message)s', handlers=[
     logging.FileHandler(config.log_file), logging.StreamHandler()])
-db_manager = DatabaseManager()
+db_manager = DatabaseManager(config.database_url, config.archive.directory,
+    config.database_pool_size)
 phone_manager = PhoneListManager(db_manager)
 call_manager = CallManager(db_manager)
 retry_handler = RetryHandler(db_manager, call_manager)
 transcript_processor = TranscriptProcessor(db_manager)
+response_cache = ResponseCache(db_manager, config.response_cache_ttl_seconds)
+archive_manager = ArchiveManager(db_manager)
+webhook_processor = WebhookProcessor(call_manager, transcript_processor,
+    retry_handler)
+change_feed = ChangeFeed(db_manager, event_bus)
+metrics.gauge('robocall_dial_queue_depth',
+    'Dials waiting for a worker, by priority', lambda : {priority: count for
+    priority, count in call_manager.dial_queue.get_stats()[
+    'queued_by_priority'].items()}, ['priority'])
+metrics.gauge('robocall_dials_in_flight', 'Dials being placed right now',
+    lambda : call_manager.dial_queue.in_flight)
+metrics.gauge('robocall_active_calls', 'Calls without a final status yet',
+    call_manager.active_calls.count)
+metrics.gauge('robocall_retry_backlog', 'Retries scheduled but not yet dialed'
+    , retry_handler.dispatcher.count)
+metrics.gauge('robocall_event_subscribers', 'Connected /api/events streams',
+    lambda : len(event_bus.subscribers))
+metrics.counter_callback('robocall_call_transitions',
+    'Call status changes applied, by new status', lambda :
+    call_manager.state_machine.counts()[0], ['status'])
+metrics.counter_callback('robocall_call_transitions_rejected',
+    'Stale or out-of-order status changes ignored', lambda :
+    call_manager.state_machine.counts()[1], ['from', 'to'])
+app.logger.info(
+    f'Startup completed in {(time.perf_counter() - startup_started) * 1000:.1f} ms'
+    )
+
+
+@app.before_request
+def start_background_services():
+    retry_handler.start()
+    call_manager.reconciler.start()
+    provider.start_health_check()
+    archive_manager.start()
+    change_feed.start_following()
 
 
 def allowed_file(filename):
@@ -34,6 +82,8 @@ def allowed_file(filename):
 
 
 @app.route('/')
+@response_cache.cached('calls', 'contacts', 'retry_attempts',
+    'scheduled_retries', 'transcripts')
 def index():
     try:
         call_summary = db_manager.get_call_summary()
@@ -88,6 +138,25 @@ def settings():
         return render_template('error.html', error=str(e))
 
 
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@app.route('/api/health', methods=['GET'])
+def health():
+    return jsonify({'status': 'ok', 'provider': provider.health,
+        'provider_endpoints': provider.get_endpoint_stats(),
+        'active_calls': call_manager.reconciler.get_stats(),
+        'event_stream': event_bus.get_stats(),
+        'response_cache': response_cache.get_stats(),
+        'archive': archive_manager.get_stats(),
+        'webhooks': webhook_processor.get_stats(),
+        'change_feed': change_feed.get_stats(),
+        'call_states': call_manager.state_machine.get_stats(),
+        'scheduled_retries': retry_handler.dispatcher.count()})
+
+
 @app.route('/api/contacts/upload', methods=['POST'])
 def upload_contacts():
     try:
@@ -135,6 +204,7 @@ def add_contact():
 
 
 @app.route('/api/contacts', methods=['GET'])
+@response_cache.cached('contacts')
 def get_contacts():
     try:
         result = phone_manager.get_contacts_summary()
@@ -150,14 +220,10 @@ def start_calls():
         data = request.get_json()
         contact_ids = data.get('contact_ids', [])
         call_script = data.get('call_script', '')
-        delay_seconds = data.get('delay_seconds', 2)
         if not contact_ids:
             return jsonify({'success': False, 'message':
                 'No contacts selected'}), 400
-        if call_script:
-            config.update_call_script(call_script)
-        result = call_manager.make_bulk_calls(contact_ids, call_script,
-            delay_seconds)
+        result = call_manager.make_bulk_calls(contact_ids, call_script)
         return jsonify(result)
     except Exception as e:
         app.logger.error(f'Error starting calls: {str(e)}')
@@ -178,10 +244,16 @@ def get_call_status(call_id):
 
 
 @app.route('/api/calls/history', methods=['GET'])
+@response_cache.cached('calls', 'contacts')
 def get_call_history():
     try:
         limit = request.args.get('limit', 100, type=int)
-        result = call_manager.get_call_history(limit)
+        started_after = request.args.get('started_after', type=datetime.
+            fromisoformat)
+        started_before = request.args.get('started_before', type=datetime.
+            fromisoformat)
+        result = call_manager.get_call_history(limit, started_after,
+            started_before)
         return jsonify(result)
     except Exception as e:
         app.logger.error(f'Error getting call history: {str(e)}')
@@ -198,6 +270,64 @@ def get_active_calls():
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/events', methods=['GET'])
+def stream_events():
+    subscription = event_bus.subscribe()
+
+    def generate():
+        try:
+            yield f'retry: {SSE_KEEPALIVE_SECONDS * 1000}\n\n'
+            while True:
+                events = subscription.get(timeout=SSE_KEEPALIVE_SECONDS)
+                if not events:
+                    yield ': keepalive\n\n'
+                    continue
+                yield ''.join(format_sse(event) for event in events)
+        finally:
+            event_bus.unsubscribe(subscription)
+    return Response(stream_with_context(generate()), mimetype=
+        'text/event-stream', headers={'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'})
+
+
+@app.route('/api/calls/cancel', methods=['POST'])
+def bulk_cancel_calls():
+    try:
+        data = request.get_json() or {}
+        statuses = data.get('status')
+        if isinstance(statuses, str):
+            statuses = [statuses]
+        campaign_id = data.get('campaign_id')
+        started_after = datetime.fromisoformat(data['started_after']
+            ) if data.get('started_after') else None
+        started_before = datetime.fromisoformat(data['started_before']
+            ) if data.get('started_before') else None
+        if not (statuses or campaign_id or started_after or started_before):
+            return jsonify({'success': False, 'message':
+                'A status, time range or campaign filter is required'}), 400
+        result = call_manager.bulk_cancel_calls(statuses, started_after,
+            started_before, campaign_id)
+        matched_call_ids = result.pop('matched_call_ids', [])
+        if result.get('success') and data.get('include_retries', True):
+            retry_result = retry_handler.cancel_retries(matched_call_ids)
+            result['retries_canceled'] = retry_result.get('retries_canceled', 0)
+        return jsonify(result)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        app.logger.error(f'Error bulk canceling calls: {str(e)}')
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
+@app.route('/api/calls/queue', methods=['GET'])
+def get_dial_queue():
+    try:
+        return jsonify(call_manager.dial_queue.get_stats())
+    except Exception as e:
+        app.logger.error(f'Error getting dial queue: {str(e)}')
+        return jsonify({'error': str(e)}), 500
+
+
 @app.route('/api/retry/schedule/<int:call_id>', methods=['POST'])
 def schedule_retry(call_id):
     try:
@@ -215,7 +345,8 @@ def retry_failed_calls():
     try:
         data = request.get_json() or {}
         status_filter = data.get('status_filter')
-        result = retry_handler.retry_failed_calls(status_filter)
+        dry_run = bool(data.get('dry_run', False))
+        result = retry_handler.retry_failed_calls(status_filter, dry_run)
         return jsonify(result)
     except Exception as e:
         app.logger.error(f'Error retrying failed calls: {str(e)}')
@@ -233,12 +364,16 @@ def get_retry_status(call_id):
 
 
 @app.route('/api/transcripts', methods=['GET'])
+@response_cache.cached('transcripts', 'calls', 'contacts')
 def get_transcripts():
     try:
         limit = request.args.get('limit', 50, type=int)
         search = request.args.get('search', '')
         if search:
-            result = transcript_processor.search_transcripts(search, limit)
+            result = transcript_processor.search_transcripts(search, limit,
+                request.args.get('started_after', type=datetime.
+                fromisoformat), request.args.get('started_before', type=
+                datetime.fromisoformat))
         else:
             result = transcript_processor.get_all_transcripts(limit)
         return jsonify(result)
@@ -260,31 +395,48 @@ def get_transcript(call_id):
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/api/reports/export', methods=['POST'])
+@app.route('/api/reports/export', methods=['GET', 'POST'])
 def export_data():
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True) or request.args
         export_type = data.get('type', 'transcripts')
-        format_type = data.get('format', 'json')
+        format_type = data.get('format', 'json').lower()
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        if format_type in COLUMNAR_FORMATS:
+            if export_type not in EXPORT_TABLES:
+                return jsonify({'success': False, 'message':
+                    'Invalid export type'}), 400
+            require_pyarrow()
+            filename = f'{export_type}_export_{timestamp}.{format_type}'
+            return Response(stream_with_context(stream_table(db_manager,
+                export_type, format_type)), mimetype=COLUMNAR_FORMATS[
+                format_type], headers={'Content-Disposition':
+                f'attachment; filename={filename}'})
         if export_type == 'transcripts':
+            if format_type not in EXPORT_FORMATS:
+                return jsonify({'success': False, 'message':
+                    f"Unsupported format. Use one of: {', '.join(EXPORT_FORMATS)}."
+                    }), 400
             filename = f'transcripts_export_{timestamp}.{format_type}'
-            file_path = os.path.join('data', filename)
-            result = transcript_processor.export_transcripts_to_file(file_path,
-                format_type)
+            return Response(stream_with_context(transcript_processor.
+                stream_transcripts(format_type)), mimetype=EXPORT_FORMATS[
+                format_type], headers={'Content-Disposition':
+                f'attachment; filename={filename}'})
         elif export_type == 'contacts':
+            created_after = datetime.fromisoformat(data['created_after']
+                ) if data.get('created_after') else None
+            created_before = datetime.fromisoformat(data['created_before']
+                ) if data.get('created_before') else None
             filename = f'contacts_export_{timestamp}.csv'
-            file_path = os.path.join('data', filename)
-            result = {'success': phone_manager.export_contacts_to_csv(
-                file_path)}
+            return Response(stream_with_context(phone_manager.
+                stream_contacts_csv(data.get('status'), created_after,
+                created_before)), mimetype='text/csv', headers={
+                'Content-Disposition': f'attachment; filename={filename}'})
         else:
             return jsonify({'success': False, 'message': 'Invalid export type'}
                 ), 400
-        if result.get('success', False):
-            return send_file(file_path, as_attachment=True, download_name=
-                filename)
-        else:
-            return jsonify(result), 500
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
         app.logger.error(f'Error exporting data: {str(e)}')
         return jsonify({'success': False, 'message': str(e)}), 500
@@ -292,34 +444,19 @@ def export_data():
 
 @app.route('/webhook/twiml/<int:call_id>', methods=['POST', 'GET'])
 def twiml_response(call_id):
-    try:
-        twiml = call_manager.get_twiml_response(call_id)
-        return twiml, 200, {'Content-Type': 'application/xml'}
-    except Exception as e:
-        app.logger.error(f'Error generating TwiML: {str(e)}')
-        return (
-            """<?xml version="1.0" encoding="UTF-8"?>
-<Response>
-    <Say voice="alice">Hello, this is a test call. Thank you.</Say>
-</Response>"""
-            , 200, {'Content-Type': 'application/xml'})
+    twiml, etag = call_manager.get_twiml_response(call_id)
+    headers = {'Content-Type': 'application/xml'}
+    if etag:
+        headers['ETag'] = etag
+        if etag in request.headers.get('If-None-Match', ''):
+            return '', 304, headers
+    return twiml, 200, headers
 
 
 @app.route('/webhook/status/<int:call_id>', methods=['POST'])
 def call_status_webhook(call_id):
     try:
-        call_status = request.form.get('CallStatus')
-        call_sid = request.form.get('CallSid')
-        call_duration = request.form.get('CallDuration')
-        recording_url = request.form.get('RecordingUrl')
-        duration = int(call_duration) if call_duration else None
-        call_manager.update_call_status(call_id, call_status, call_sid,
-            duration)
-        if recording_url and config.call.transcribe_calls:
-            transcript_processor.process_call_recording(call_id,
-                recording_url=recording_url)
-        if call_status in ['failed', 'no-answer', 'busy']:
-            retry_handler.schedule_retry(call_id)
+        webhook_processor.handle_status(call_id, request.form)
         return 'OK', 200
     except Exception as e:
         app.logger.error(f'Error handling status webhook: {str(e)}')
@@ -329,11 +466,7 @@ def call_status_webhook(call_id):
 @app.route('/webhook/recording/<int:call_id>', methods=['POST'])
 def recording_webhook(call_id):
     try:
-        recording_sid = request.form.get('RecordingSid')
-        recording_url = request.form.get('RecordingUrl')
-        if recording_url and config.call.transcribe_calls:
-            transcript_processor.process_call_recording(call_id,
-                recording_sid, recording_url)
+        webhook_processor.handle_recording(call_id, request.form)
         return 'OK', 200
     except Exception as e:
         app.logger.error(f'Error handling recording webhook: {str(e)}')
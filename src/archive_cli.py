@@ -0,0 +1,42 @@
+import argparse
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import List
+from archive_manager import ArchiveManager
+from config import config
+from models import DatabaseManager
+
+
+def main(argv: List[str]=None):
+    parser = argparse.ArgumentParser(description=
+        'Move closed calls into monthly archive databases')
+    parser.add_argument('--db', default=config.database_url, help=
+        'Database URL or SQLite file to archive from')
+    parser.add_argument('--archive-dir', default=config.archive.directory)
+    parser.add_argument('--older-than-days', type=float, default=config.
+        archive.min_age_days, help=
+        'Archive closed calls started more than this many days ago')
+    parser.add_argument('--vacuum', action='store_true', help=
+        'Compact the hot database after archiving')
+    parser.add_argument('--list', action='store_true', help=
+        'List archive files and exit')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format=
+        '%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if '://' not in args.db and not os.path.exists(args.db):
+        parser.error(f'Database not found: {args.db}')
+    archive_manager = ArchiveManager(DatabaseManager(args.db, args.
+        archive_dir), args.older_than_days)
+    if not args.list:
+        moved = archive_manager.archive(datetime.now() - timedelta(days=
+            args.older_than_days))
+        print(f'Archived {sum(moved.values())} calls across {len(moved)} months')
+        if args.vacuum:
+            archive_manager.vacuum()
+    for archive in archive_manager.list_archives():
+        print(f"{archive['month']}: {archive['path']} ({archive['bytes']} bytes)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+from config import config
+from models import ARCHIVE_SCHEMA, DatabaseManager, month_bounds
+CLOSED_STATUSES = ['completed', 'failed', 'no-answer', 'busy', 'canceled']
+ARCHIVE_BATCH_SIZE = 5000
+ARCHIVED_TABLES = {'calls': ('start_time', 'id', 'status', 'duration'),
+    'retry_attempts': ('attempted_at', 'call_id', 'status', None),
+    'transcripts': ('created_at', 'call_id', "''", 'confidence_score')}
+
+
+class ArchiveManager:
+
+    def __init__(self, db_manager: DatabaseManager, min_age_days: float=
+        None, interval_hours: float=None, batch_size: int=ARCHIVE_BATCH_SIZE):
+        self.db_manager = db_manager
+        self.min_age_days = (min_age_days if min_age_days is not None else
+            config.archive.min_age_days)
+        self.interval_hours = (interval_hours if interval_hours is not None
+             else config.archive.interval_hours)
+        self.batch_size = batch_size
+        self.logger = logging.getLogger(__name__)
+        self.last_run = None
+        self.last_run_ms = None
+        self.archived_calls = 0
+        self._archive_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if (self._thread or not self.min_age_days or self.min_age_days <= 0 or
+            not self.interval_hours or self.interval_hours <= 0 or self.
+            db_manager.backend.name != 'sqlite'):
+            return
+        with self._archive_lock:
+            if self._thread:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name=
+                'call-archiver', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.archive()
+            except Exception as e:
+                self.logger.error(f'Error archiving calls: {str(e)}')
+            self._stop.wait(self.interval_hours * 3600)
+
+    def archive(self, before: datetime=None) ->Dict[str, int]:
+        """Move closed calls started before ``before`` (default: ``min_age_days`` ago),
+        with their retry attempts and transcripts, into monthly archive databases."""
+        if self.db_manager.backend.name != 'sqlite':
+            raise RuntimeError(
+                'Archiving to monthly files is only supported for SQLite storage'
+                )
+        before = before or datetime.now() - timedelta(days=self.min_age_days)
+        with self._archive_lock:
+            started = time.perf_counter()
+            os.makedirs(self.db_manager.archive_dir, exist_ok=True)
+            moved = {}
+            for month in self._pending_months(before):
+                moved[month] = self._archive_month(month, before)
+                self.logger.info(
+                    f'Archived {moved[month]} calls from {month} to {self.db_manager.archive_path(month)}'
+                    )
+            if moved:
+                self.db_manager._mark_changed(*ARCHIVED_TABLES)
+            self.archived_calls += sum(moved.values())
+            self.last_run = datetime.now()
+            self.last_run_ms = round((time.perf_counter() - started) * 1000, 1)
+            return moved
+
+    def _pending_months(self, before: datetime) ->List[str]:
+        conn = self.db_manager.get_connection(raw=True)
+        cursor = conn.cursor()
+        placeholders = ', '.join('?' for _ in CLOSED_STATUSES)
+        cursor.execute(
+            f"""
+            SELECT DISTINCT SUBSTR(start_time, 1, 7) FROM calls
+            WHERE start_time < ? AND status IN ({placeholders})
+            ORDER BY 1
+        """
+            , (before, *CLOSED_STATUSES))
+        months = [row[0] for row in cursor.fetchall()]
+        conn.close()
+        return months
+
+    def _archive_month(self, month: str, before: datetime) ->int:
+        month_start, month_end = month_bounds(month)
+        upper = min(month_end, str(before))
+        placeholders = ', '.join('?' for _ in CLOSED_STATUSES)
+        conn = self.db_manager.get_connection(raw=True)
+        moved = 0
+        try:
+            conn.execute(f'ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}', (self.
+                db_manager.archive_path(month),))
+            columns = {table: self._prepare_table(conn, table) for table in
+                ARCHIVED_TABLES}
+            conn.execute(
+                'CREATE TEMP TABLE IF NOT EXISTS archive_batch (id INTEGER PRIMARY KEY)'
+                )
+            while True:
+                with conn:
+                    conn.execute('DELETE FROM archive_batch')
+                    batch = conn.execute(
+                        f"""
+                        INSERT INTO archive_batch (id)
+                        SELECT id FROM main.calls
+                        WHERE start_time >= ? AND start_time < ? AND status IN ({placeholders})
+                          AND id NOT IN (SELECT call_id FROM main.active_calls)
+                          AND id NOT IN (SELECT call_id FROM main.scheduled_retries)
+                        LIMIT ?
+                    """
+                        , (month_start, upper, *CLOSED_STATUSES, self.
+                        batch_size)).rowcount
+                    if not batch:
+                        break
+                    for table, (time_column, key, status, value
+                        ) in ARCHIVED_TABLES.items():
+                        selected = ', '.join(columns[table])
+                        conn.execute(
+                            f'INSERT OR REPLACE INTO {ARCHIVE_SCHEMA}.{table} ({selected}) SELECT {selected} FROM main.{table} WHERE {key} IN (SELECT id FROM archive_batch)'
+                            )
+                        conn.execute(
+                            f"""
+                            INSERT INTO main.archived_stats (month, table_name, status, row_count, value_total, value_count)
+                            SELECT ?, ?, COALESCE({status}, ''), COUNT(*), COALESCE(SUM({value or 'NULL'}), 0), COUNT({value or 'NULL'})
+                            FROM main.{table} WHERE {key} IN (SELECT id FROM archive_batch)
+                            GROUP BY 3
+                            ON CONFLICT (month, table_name, status) DO UPDATE SET
+                                row_count = archived_stats.row_count + excluded.row_count,
+                                value_total = archived_stats.value_total + excluded.value_total,
+                                value_count = archived_stats.value_count + excluded.value_count
+                        """
+                            , (month, table))
+                        conn.execute(
+                            f'DELETE FROM main.{table} WHERE {key} IN (SELECT id FROM archive_batch)'
+                            )
+                moved += batch
+        finally:
+            conn.close()
+        return moved
+
+    def _prepare_table(self, conn, table: str) ->List[str]:
+        """Create or widen the archive copy of ``table`` to match the hot schema."""
+        columns = [row[1] for row in conn.execute(
+            f'PRAGMA main.table_info({table})')]
+        existing = [row[1] for row in conn.execute(
+            f'PRAGMA {ARCHIVE_SCHEMA}.table_info({table})')]
+        if not existing:
+            sql = conn.execute(
+                "SELECT sql FROM main.sqlite_master WHERE type = 'table' AND name = ?"
+                , (table,)).fetchone()[0]
+            conn.execute(sql.replace(f'CREATE TABLE {table}',
+                f'CREATE TABLE {ARCHIVE_SCHEMA}.{table}', 1))
+            conn.execute(
+                f'CREATE INDEX IF NOT EXISTS {ARCHIVE_SCHEMA}.idx_{table}_{ARCHIVED_TABLES[table][0]} ON {table} ({ARCHIVED_TABLES[table][0]})'
+                )
+            if table != 'calls':
+                conn.execute(
+                    f'CREATE INDEX IF NOT EXISTS {ARCHIVE_SCHEMA}.idx_{table}_call_id ON {table} (call_id)'
+                    )
+        else:
+            for column in columns:
+                if column not in existing:
+                    definition = next(row[2] for row in conn.execute(
+                        f'PRAGMA main.table_info({table})') if row[1] ==
+                        column)
+                    conn.execute(
+                        f'ALTER TABLE {ARCHIVE_SCHEMA}.{table} ADD COLUMN {column} {definition}'
+                        )
+        return columns
+
+    def list_archives(self) ->List[Dict[str, Any]]:
+        return [{'month': month, 'path': self.db_manager.archive_path(month
+            ), 'bytes': os.path.getsize(self.db_manager.archive_path(month)
+            )} for month in self.db_manager.archive_months()]
+
+    def vacuum(self):
+        conn = self.db_manager.get_connection()
+        conn.execute('VACUUM')
+        conn.close()
+
+    def get_stats(self) ->Dict[str, Any]:
+        return {'archives': len(self.db_manager.archive_months()),
+            'archived_calls': self.archived_calls, 'last_run': self.
+            last_run.isoformat() if self.last_run else None, 'last_run_ms':
+            self.last_run_ms, 'min_age_days': self.min_age_days}
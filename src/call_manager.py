@@ -1,12 +1,26 @@
-from twilio.rest import Client
 from twilio.base.exceptions import TwilioException
 from datetime import datetime, timedelta
 import logging
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Tuple
 from models import Call, Contact, DatabaseManager
 from config import config
-import time
+from dial_queue import DialQueue
+from active_calls import ActiveCallRegistry
+from call_reconciler import CallReconciler
+from call_state import (CALL_STATUSES, FAILURE_STATUSES, CallStateMachine,
+    allowed_from, is_final)
+from twiml_renderer import FALLBACK_TWIML, TwimlRenderer
+from provider import provider
+from event_bus import event_bus
+from metrics import CALLS_DIALED
+from concurrent.futures import CancelledError, Future
+from concurrent.futures import ThreadPoolExecutor
 import threading
+import uuid
+BULK_CANCEL_WORKERS = 16
+SCRIPT_CACHE_SIZE = 1024
+ACTIVE_CALL_STATUSES = ['pending', 'initiated', 'queued', 'ringing',
+    'in-progress']
 
 
 class CallManager:
@@ -14,42 +28,40 @@ class CallManager:
     def __init__(self, db_manager: DatabaseManager):
         self.db_manager = db_manager
         self.logger = logging.getLogger(__name__)
-        self.twilio_client = None
-        self.active_calls = {}
+        self.active_calls = ActiveCallRegistry(db_manager)
+        self.state_machine = CallStateMachine()
         self.call_queue = []
         self.is_calling = False
-        self._init_twilio_client()
+        self.dial_queue = DialQueue(self.make_call, config.dialer.
+            max_concurrent_dials, config.dialer.max_calls_per_second,
+            active_call_count=self.active_calls.count,
+            max_active_calls=config.dialer.max_active_calls)
+        self.reconciler = CallReconciler(self)
+        self.twiml_renderer = TwimlRenderer()
+        self.script_cache = {}
+        self.on_failure = None
 
-    def _init_twilio_client(self):
-        try:
-            if not config.twilio.account_sid or not config.twilio.auth_token:
-                self.logger.error('Twilio credentials not configured')
-                return
-            self.twilio_client = Client(config.twilio.account_sid, config.
-                twilio.auth_token)
-            account = self.twilio_client.api.accounts(config.twilio.account_sid
-                ).fetch()
-            self.logger.info(
-                f'Twilio client initialized successfully. Account: {account.friendly_name}'
-                )
-        except Exception as e:
-            self.logger.error(f'Failed to initialize Twilio client: {str(e)}')
-            self.twilio_client = None
+    @property
+    def twilio_client(self):
+        return provider.client
 
-    def make_call(self, contact: Contact, call_script: str=None) ->Dict[str,
-        Any]:
+    def make_call(self, contact: Contact, call_script: str=None,
+        campaign_id: str=None, script_id: int=None) ->Dict[str, Any]:
         if not self.twilio_client:
             return {'success': False, 'message':
                 'Twilio client not initialized', 'call_id': None}
         if not config.twilio.phone_number:
             return {'success': False, 'message':
                 'Twilio phone number not configured', 'call_id': None}
-        script = call_script or config.call.call_script
         try:
+            if script_id is None and call_script:
+                script_id = self.db_manager.add_script(call_script)
             call = Call(contact_id=contact.id, status='pending', start_time
-                =datetime.now(), retry_count=0)
+                =datetime.now(), retry_count=0, campaign_id=campaign_id,
+                script_id=script_id)
             call_id = self.db_manager.add_call(call)
             call.id = call_id
+            self.active_calls.add(call_id, None)
             twiml_url = f'{config.twilio.webhook_url}/twiml/{call_id}'
             twilio_call = self.twilio_client.calls.create(to=contact.
                 phone_number, from_=config.twilio.phone_number, url=
@@ -57,12 +69,25 @@ class CallManager:
                 =config.call.record_calls, status_callback=
                 f'{config.twilio.webhook_url}/status/{call_id}',
                 status_callback_event=['initiated', 'ringing', 'answered',
-                'completed'])
+                'completed'], recording_status_callback=
+                f'{config.twilio.webhook_url}/recording/{call_id}')
             call.call_sid = twilio_call.sid
             call.status = 'initiated'
-            self.db_manager.update_call(call)
-            self.active_calls[call_id] = {'call': call, 'contact': contact,
-                'twilio_call': twilio_call, 'script': script}
+            CALLS_DIALED.inc('initiated')
+            self.active_calls.add(call_id, twilio_call.sid)
+            if self.transition_call_status(call_id, 'initiated', twilio_call
+                .sid):
+                self._publish_status(call, contact)
+            elif self.db_manager.get_call_status(call_id) == 'canceled':
+                self.active_calls.remove(call_id)
+                self.twilio_client.calls(twilio_call.sid).update(status=
+                    'canceled')
+                self.logger.info(
+                    f'Hung up call {call_id} (SID: {twilio_call.sid}): it was canceled while dialing'
+                    )
+                return {'success': False, 'message':
+                    'Call was canceled while dialing', 'call_id': call_id,
+                    'call_sid': twilio_call.sid}
             self.logger.info(
                 f'Call initiated to {contact.phone_number} (Call ID: {call_id}, SID: {twilio_call.sid})'
                 )
@@ -73,24 +98,36 @@ class CallManager:
             self.logger.error(
                 f'Twilio error making call to {contact.phone_number}: {str(e)}'
                 )
+            CALLS_DIALED.inc('failed')
             if 'call' in locals():
-                call.status = 'failed'
-                call.end_time = datetime.now()
-                self.db_manager.update_call(call)
+                self.active_calls.remove(call.id)
+                self.transition_call_status(call.id, 'failed', end_time=
+                    datetime.now())
             return {'success': False, 'message': f'Twilio error: {str(e)}',
                 'call_id': call_id if 'call_id' in locals() else None}
         except Exception as e:
             self.logger.error(
                 f'Error making call to {contact.phone_number}: {str(e)}')
+            CALLS_DIALED.inc('failed')
             if 'call' in locals():
-                call.status = 'failed'
-                call.end_time = datetime.now()
-                self.db_manager.update_call(call)
+                self.active_calls.remove(call.id)
+                self.transition_call_status(call.id, 'failed', end_time=
+                    datetime.now())
             return {'success': False, 'message': f'Error: {str(e)}',
                 'call_id': call_id if 'call_id' in locals() else None}
 
-    def make_bulk_calls(self, contact_ids: List[int], call_script: str=None,
-        delay_seconds: int=2) ->Dict[str, Any]:
+    def enqueue_call(self, contact: Contact, call_script: str=None,
+        priority: int=None, campaign_id: str=None, script_id: int=None
+        ) ->Future:
+        if priority is None:
+            priority = config.dialer.campaign_priority
+        return self.dial_queue.submit(contact, call_script, priority,
+            campaign_id=campaign_id, script_id=script_id)
+
+    def make_bulk_calls(self, contact_ids: List[int], call_script: str=None
+        ) ->Dict[str, Any]:
+        """Queue every contact at once and wait for the dials; the dial queue's
+        rate limiter (``DIAL_MAX_CALLS_PER_SECOND``) spaces them out."""
         if self.is_calling:
             return {'success': False, 'message':
                 'Another calling session is already in progress', 'results': []
@@ -99,7 +136,11 @@ class CallManager:
         results = []
         successful_calls = 0
         failed_calls = 0
+        campaign_id = uuid.uuid4().hex
         try:
+            script_id = self.db_manager.add_script(call_script
+                ) if call_script else None
+            pending = []
             for contact_id in contact_ids:
                 contact = self.db_manager.get_contact(contact_id)
                 if not contact:
@@ -107,8 +148,18 @@ class CallManager:
                         False, 'message': 'Contact not found'})
                     failed_calls += 1
                     continue
-                result = self.make_call(contact, call_script)
-                result['contact_id'] = contact_id
+                pending.append((contact, self.enqueue_call(contact,
+                    campaign_id=campaign_id, script_id=script_id)))
+            for contact, future in pending:
+                try:
+                    result = future.result()
+                except CancelledError:
+                    result = {'success': False, 'message':
+                        'Canceled before dialing', 'call_id': None}
+                except Exception as e:
+                    result = {'success': False, 'message':
+                        f'Error: {str(e)}', 'call_id': None}
+                result['contact_id'] = contact.id
                 result['phone_number'] = contact.phone_number
                 result['name'] = contact.name
                 results.append(result)
@@ -116,46 +167,71 @@ class CallManager:
                     successful_calls += 1
                 else:
                     failed_calls += 1
-                if delay_seconds > 0:
-                    time.sleep(delay_seconds)
             self.logger.info(
                 f'Bulk calling completed: {successful_calls} successful, {failed_calls} failed'
                 )
             return {'success': True, 'message':
                 f'Bulk calling completed: {successful_calls} successful, {failed_calls} failed'
-                , 'total_calls': len(contact_ids), 'successful_calls':
+                , 'campaign_id': campaign_id, 'total_calls': len(
+                contact_ids), 'successful_calls':
                 successful_calls, 'failed_calls': failed_calls, 'results':
                 results}
         except Exception as e:
             self.logger.error(f'Error in bulk calling: {str(e)}')
             return {'success': False, 'message':
-                f'Error in bulk calling: {str(e)}', 'results': results}
+                f'Error in bulk calling: {str(e)}', 'campaign_id':
+                campaign_id, 'results': results}
         finally:
             self.is_calling = False
 
     def update_call_status(self, call_id: int, status: str, call_sid: str=
         None, duration: int=None) ->bool:
-        try:
-            call = self.db_manager.get_call(call_id)
-            if not call:
-                self.logger.error(f'Call not found: {call_id}')
-                return False
-            call.status = status
-            if call_sid:
-                call.call_sid = call_sid
-            if duration is not None:
-                call.duration = duration
-            if status in ['completed', 'failed', 'no-answer', 'busy',
-                'canceled']:
-                call.end_time = datetime.now()
-                if call_id in self.active_calls:
-                    del self.active_calls[call_id]
-            self.db_manager.update_call(call)
-            self.logger.info(f'Updated call {call_id} status to {status}')
+        """Apply a status change if the state machine allows it. Returns False when the
+        call is missing, already has ``status``, or the change is stale, e.g. ``ringing``
+        after ``completed``. Only the last case counts as a rejected transition.
+        Storage errors propagate, so webhook callers can release their claim on the event.
+        ``on_failure`` (set by ``RetryHandler``) gets the call id whenever a busy,
+        no-answer or failed status is accepted, from a webhook or the reconciler."""
+        final = is_final(status)
+        if not self.transition_call_status(call_id, status, call_sid,
+            duration, datetime.now() if final else None):
+            return False
+        if final:
+            self.active_calls.remove(call_id)
+        if status in FAILURE_STATUSES and self.on_failure:
+            self.on_failure(call_id)
+        if event_bus.has_subscribers:
+            self._publish_status(self.db_manager.get_call(call_id))
+        self.logger.debug(f'Updated call {call_id} status to {status}')
+        return True
+
+    def transition_call_status(self, call_id: int, status: str, call_sid:
+        str=None, duration: int=None, end_time: datetime=None) ->bool:
+        if self.db_manager.transition_call_status(call_id, status,
+            allowed_from(status), call_sid, duration, end_time):
+            self.state_machine.record_accepted(status)
             return True
-        except Exception as e:
-            self.logger.error(f'Error updating call status: {str(e)}')
+        previous = self.db_manager.get_call_status(call_id)
+        if previous == status:
             return False
+        self.state_machine.record_rejected(previous, status)
+        if previous is None:
+            self.logger.error(f'Call not found: {call_id}')
+        else:
+            self.logger.debug(
+                f'Ignoring {status} for call {call_id}: already {previous}')
+        return False
+
+    def _publish_status(self, call: Call, contact: Contact=None):
+        if not event_bus.has_subscribers:
+            return
+        if contact is None:
+            contact = self.db_manager.get_contact(call.contact_id)
+        event_bus.publish('call_status', {'call_id': call.id, 'call_sid':
+            call.call_sid, 'status': call.status, 'duration': call.duration,
+            'contact_name': contact.name if contact else '', 'phone_number':
+            contact.phone_number if contact else '', 'start_time': call.
+            start_time.isoformat() if call.start_time else None})
 
     def get_call_status(self, call_id: int) ->Optional[Dict[str, Any]]:
         try:
@@ -190,32 +266,13 @@ class CallManager:
             return None
 
     def get_active_calls(self) ->List[Dict[str, Any]]:
-        active_call_info = []
-        for call_id, call_data in self.active_calls.items():
-            call_info = self.get_call_status(call_id)
-            if call_info:
-                active_call_info.append(call_info)
-        return active_call_info
+        return self.reconciler.get_active_calls()
 
-    def get_call_history(self, limit: int=100) ->List[Dict[str, Any]]:
+    def get_call_history(self, limit: int=100, started_after: datetime=
+        None, started_before: datetime=None) ->List[Dict[str, Any]]:
         try:
-            calls = self.db_manager.get_all_calls()
-            if limit:
-                calls = calls[:limit]
-            call_history = []
-            for call in calls:
-                contact = self.db_manager.get_contact(call.contact_id)
-                call_info = {'call_id': call.id, 'contact_id': call.
-                    contact_id, 'contact_name': contact.name if contact else
-                    '', 'phone_number': contact.phone_number if contact else
-                    '', 'call_sid': call.call_sid, 'status': call.status,
-                    'duration': call.duration, 'start_time': call.
-                    start_time.isoformat() if call.start_time else None,
-                    'end_time': call.end_time.isoformat() if call.end_time else
-                    None, 'retry_count': call.retry_count, 'recording_url':
-                    call.recording_url, 'transcript_url': call.transcript_url}
-                call_history.append(call_info)
-            return call_history
+            return self.db_manager.get_call_history_rows(limit,
+                started_after, started_before)
         except Exception as e:
             self.logger.error(f'Error getting call history: {str(e)}')
             return []
@@ -228,11 +285,10 @@ class CallManager:
             if call.call_sid and self.twilio_client:
                 twilio_call = self.twilio_client.calls(call.call_sid).update(
                     status='canceled')
-                call.status = 'canceled'
-                call.end_time = datetime.now()
-                self.db_manager.update_call(call)
-                if call_id in self.active_calls:
-                    del self.active_calls[call_id]
+                if not self.update_call_status(call_id, 'canceled'):
+                    return {'success': False, 'message':
+                        f'Call already {self.db_manager.get_call_status(call_id)}'
+                        }
                 self.logger.info(f'Call {call_id} canceled successfully')
                 return {'success': True, 'message':
                     'Call canceled successfully'}
@@ -245,22 +301,99 @@ class CallManager:
             return {'success': False, 'message':
                 f'Error canceling call: {str(e)}'}
 
-    def get_twiml_response(self, call_id: int) ->str:
+    def bulk_cancel_calls(self, statuses: List[str]=None, started_after:
+        datetime=None, started_before: datetime=None, campaign_id: str=None
+        ) ->Dict[str, Any]:
+        """Cancel the calls matching the filter that are still active. Calls matched by a
+        final status are never sent to the provider; they are only returned in
+        ``matched_call_ids`` so their scheduled retries can be dropped."""
+        unknown = [status for status in statuses or [] if status not in
+            CALL_STATUSES]
+        if unknown:
+            raise ValueError(f"Unknown call status: {', '.join(unknown)}")
         try:
-            if call_id in self.active_calls:
-                script = self.active_calls[call_id]['script']
-            else:
-                script = config.call.call_script
-            twiml = f"""<?xml version="1.0" encoding="UTF-8"?>
-<Response>
-    <Say voice="alice">{script}</Say>
-    <Pause length="2"/>
-    <Say voice="alice">Thank you for your time. Goodbye.</Say>
-</Response>"""
-            return twiml
+            dial_jobs_canceled = self.dial_queue.cancel_pending(campaign_id
+                ) if campaign_id else 0
+            rows = self.db_manager.find_calls(statuses, started_after,
+                started_before, campaign_id)
+            active_rows = [row for row in rows if row['status'] in
+                ACTIVE_CALL_STATUSES]
+            to_cancel = [row['id'] for row in active_rows if not row['call_sid']
+                ]
+            live_calls = [row for row in active_rows if row['call_sid']]
+            errors = []
+            if live_calls and self.twilio_client:
+                with ThreadPoolExecutor(max_workers=BULK_CANCEL_WORKERS
+                    ) as executor:
+                    outcomes = executor.map(self._cancel_provider_call,
+                        live_calls)
+                    for row, error in zip(live_calls, outcomes):
+                        if error:
+                            errors.append({'call_id': row['id'], 'error':
+                                error})
+                        else:
+                            to_cancel.append(row['id'])
+            elif live_calls:
+                errors.extend({'call_id': row['id'], 'error':
+                    'Twilio client not available'} for row in live_calls)
+            canceled = self.db_manager.bulk_update_call_status(to_cancel,
+                'canceled', datetime.now(), allowed_from('canceled'))
+            self.state_machine.record_accepted('canceled', canceled)
+            self.active_calls.remove_many(to_cancel)
+            for call_id in to_cancel:
+                event_bus.publish('call_status', {'call_id': call_id,
+                    'status': 'canceled'})
+            self.logger.info(
+                f'Bulk cancel: {canceled} calls canceled, {len(errors)} errors, {dial_jobs_canceled} queued dials dropped'
+                )
+            return {'success': True, 'message':
+                f'Canceled {canceled} calls', 'calls_matched': len(rows),
+                'calls_canceled': canceled, 'queued_dials_canceled':
+                dial_jobs_canceled, 'errors': errors, 'matched_call_ids': [
+                row['id'] for row in rows]}
+        except Exception as e:
+            self.logger.error(f'Error bulk canceling calls: {str(e)}')
+            return {'success': False, 'message':
+                f'Error bulk canceling calls: {str(e)}'}
+
+    def _cancel_provider_call(self, row) ->Optional[str]:
+        try:
+            provider_status = 'completed' if row['status'
+                ] == 'in-progress' else 'canceled'
+            self.twilio_client.calls(row['call_sid']).update(status=
+                provider_status)
+            return None
+        except Exception as e:
+            return str(e)
+
+    def get_twiml_response(self, call_id: int) ->Tuple[bytes, str]:
+        try:
+            script = self.get_call_script(call_id) or config.call.call_script
+            template = self.twiml_renderer.get_template(script)
+            variables = None
+            if template.variables:
+                variables = self._get_script_variables(call_id)
+            return self.twiml_renderer.render(script, variables)
         except Exception as e:
             self.logger.error(f'Error generating TwiML: {str(e)}')
-            return """<?xml version="1.0" encoding="UTF-8"?>
-<Response>
-    <Say voice="alice">Hello, this is a test call. Thank you for your time.</Say>
-</Response>"""
+            return FALLBACK_TWIML, None
+
+    def get_call_script(self, call_id: int) ->Optional[str]:
+        script_id = self.db_manager.get_call_script_id(call_id)
+        if script_id is None:
+            return None
+        script = self.script_cache.get(script_id)
+        if script is None:
+            script = self.db_manager.get_script(script_id)
+            if len(self.script_cache) >= SCRIPT_CACHE_SIZE:
+                self.script_cache.clear()
+            self.script_cache[script_id] = script
+        return script
+
+    def _get_script_variables(self, call_id: int) ->Dict[str, str]:
+        rows = self.db_manager.get_calls_with_contacts([call_id])
+        if not rows:
+            return {}
+        name = rows[0]['contact_name'] or ''
+        return {'name': name, 'first_name': name.split(' ')[0] if name else
+            '', 'phone_number': rows[0]['phone_number'] or ''}
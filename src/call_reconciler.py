@@ -0,0 +1,157 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from call_state import FINAL_STATUSES
+from config import config
+IN_FLIGHT_PROVIDER_STATUSES = ['queued', 'ringing', 'in-progress']
+LIST_PAGE_SIZE = 1000
+START_TIME_MARGIN = timedelta(minutes=5)
+
+
+def _isoformat(value: Optional[str]) ->Optional[str]:
+    return datetime.fromisoformat(value).isoformat() if value else None
+
+
+class CallReconciler:
+
+    def __init__(self, call_manager, interval_seconds: float=None,
+        max_workers: int=None):
+        self.call_manager = call_manager
+        self.db_manager = call_manager.db_manager
+        self.interval_seconds = (interval_seconds if interval_seconds is not
+            None else config.provider.status_refresh_seconds)
+        self.max_workers = max(max_workers or config.provider.
+            status_fetch_workers, 1)
+        self.logger = logging.getLogger(__name__)
+        self.snapshot = []
+        self.refreshed_at = None
+        self.last_refresh_ms = None
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+            thread_name_prefix='reconciler')
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread or not self.interval_seconds or self.interval_seconds <= 0:
+            return
+        with self._refresh_lock:
+            if self._thread:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name=
+                'call-reconciler', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def get_active_calls(self) ->List[Dict[str, Any]]:
+        if self.refreshed_at is None or not self._thread:
+            self.refresh()
+        return self.snapshot
+
+    def get_stats(self) ->Dict[str, Any]:
+        return {'active_calls': len(self.snapshot), 'refreshed_at': self.
+            refreshed_at.isoformat() if self.refreshed_at else None,
+            'last_refresh_ms': self.last_refresh_ms, 'interval_seconds':
+            self.interval_seconds}
+
+    def refresh(self):
+        with self._refresh_lock:
+            started = time.perf_counter()
+            call_ids = self.call_manager.active_calls.call_ids()
+            rows = self.db_manager.get_calls_with_contacts(call_ids)
+            provider_calls = self._fetch_provider_calls(rows)
+            snapshot = []
+            for row in rows:
+                twilio_info = provider_calls.get(row['call_sid'])
+                if (twilio_info and twilio_info['status'] in
+                    FINAL_STATUSES and row['status'] not in FINAL_STATUSES):
+                    self.logger.info(
+                        f"Reconciled call {row['id']} to {twilio_info['status']} from provider state"
+                        )
+                    self.call_manager.update_call_status(row['id'],
+                        twilio_info['status'], duration=twilio_info[
+                        'duration'])
+                    continue
+                if row['status'] in FINAL_STATUSES:
+                    self.call_manager.active_calls.remove(row['id'])
+                    continue
+                snapshot.append(self._format(row, twilio_info))
+            self.snapshot = snapshot
+            self.refreshed_at = datetime.now()
+            self.last_refresh_ms = round((time.perf_counter() - started) *
+                1000, 3)
+
+    def _fetch_provider_calls(self, rows) ->Dict[str, Dict[str, Any]]:
+        sids = {row['call_sid'] for row in rows if row['call_sid']}
+        if not sids or not self.call_manager.twilio_client:
+            return {}
+        start_times = [datetime.fromisoformat(row['start_time']) for row in
+            rows if row['call_sid'] and row['start_time']]
+        started_after = (min(start_times) if start_times else datetime.now()
+            ) - START_TIME_MARGIN
+        found = {}
+        for listed in self._executor.map(lambda status: self._list_calls(
+            status, started_after), IN_FLIGHT_PROVIDER_STATUSES):
+            found.update({sid: info for sid, info in listed.items() if sid in
+                sids})
+        missing = [sid for sid in sids if sid not in found]
+        for sid, info in zip(missing, self._executor.map(self._fetch_call,
+            missing)):
+            if info:
+                found[sid] = info
+        return found
+
+    def _list_calls(self, status: str, started_after: datetime) ->Dict[str,
+        Dict[str, Any]]:
+        try:
+            return {twilio_call.sid: self._twilio_info(twilio_call) for
+                twilio_call in self.call_manager.twilio_client.calls.list(
+                status=status, start_time_after=started_after, page_size=
+                LIST_PAGE_SIZE)}
+        except Exception as e:
+            self.logger.warning(
+                f'Could not list {status} calls from Twilio: {str(e)}')
+            return {}
+
+    def _fetch_call(self, call_sid: str) ->Optional[Dict[str, Any]]:
+        try:
+            return self._twilio_info(self.call_manager.twilio_client.calls(
+                call_sid).fetch())
+        except Exception as e:
+            self.logger.warning(f'Could not fetch Twilio call info: {str(e)}')
+            return None
+
+    def _twilio_info(self, twilio_call) ->Dict[str, Any]:
+        return {'status': twilio_call.status, 'direction': twilio_call.
+            direction, 'duration': int(twilio_call.duration) if twilio_call
+            .duration else None, 'price': twilio_call.price, 'price_unit':
+            twilio_call.price_unit}
+
+    def _format(self, row, twilio_info: Optional[Dict[str, Any]]) ->Dict[
+        str, Any]:
+        return {'call_id': row['id'], 'contact_id': row['contact_id'],
+            'contact_name': row['contact_name'] or '', 'phone_number': row[
+            'phone_number'] or '', 'call_sid': row['call_sid'], 'status':
+            row['status'], 'duration': row['duration'], 'start_time':
+            _isoformat(row['start_time']), 'end_time': _isoformat(row[
+            'end_time']), 'retry_count': row[
+            'retry_count'], 'recording_url': row['recording_url'],
+            'transcript_url': row['transcript_url'], 'twilio_info': twilio_info
+            }
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                self.logger.error(f'Error reconciling active calls: {str(e)}')
+            self._stop.wait(self.interval_seconds)
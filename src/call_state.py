@@ -0,0 +1,54 @@
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+FINAL_STATUSES = ['completed', 'failed', 'no-answer', 'busy', 'canceled']
+FAILURE_STATUSES = ['failed', 'no-answer', 'busy']
+TRANSITIONS = {'pending': ['queued', 'initiated', 'ringing', 'in-progress',
+    *FINAL_STATUSES], 'queued': ['initiated', 'ringing', 'in-progress', *
+    FINAL_STATUSES], 'initiated': ['ringing', 'in-progress', *
+    FINAL_STATUSES], 'ringing': ['in-progress', *FINAL_STATUSES],
+    'in-progress': ['completed', 'failed', 'canceled']}
+CALL_STATUSES = [*TRANSITIONS, *FINAL_STATUSES]
+PREDECESSORS = {status: [current for current, targets in TRANSITIONS.items(
+    ) if status in targets] for status in {target for targets in
+    TRANSITIONS.values() for target in targets}}
+
+
+def is_final(status: str) ->bool:
+    return status in FINAL_STATUSES
+
+
+def allowed_from(status: str) ->List[str]:
+    """Statuses a call may move to ``status`` from; empty for unknown statuses."""
+    return PREDECESSORS.get(status, [])
+
+
+class CallStateMachine:
+    """Counts accepted and rejected status transitions. The transitions themselves are
+    enforced by ``DatabaseManager.transition_call_status``, one conditional UPDATE each,
+    so a late or reordered callback can never move a call backwards."""
+
+    def __init__(self):
+        self.accepted = Counter()
+        self.rejected = Counter()
+        self._lock = threading.Lock()
+
+    def record_accepted(self, status: str, count: int=1):
+        with self._lock:
+            self.accepted[status] += count
+
+    def record_rejected(self, previous: Optional[str], status: str):
+        with self._lock:
+            self.rejected[previous or 'missing', status] += 1
+
+    def counts(self) ->Tuple[Dict[str, int], Dict[Tuple[str, str], int]]:
+        """Copies of the accepted (by status) and rejected (by from/to) counters."""
+        with self._lock:
+            return dict(self.accepted), dict(self.rejected)
+
+    def get_stats(self) ->Dict[str, Any]:
+        with self._lock:
+            return {'accepted': dict(self.accepted), 'rejected': sum(self.
+                rejected.values()), 'rejected_transitions': {
+                f'{previous}->{status}': count for (previous, status),
+                count in self.rejected.most_common()}}
@@ -0,0 +1,136 @@
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List
+from config import config
+from event_bus import EventBus
+from models import DatabaseManager
+FEED_BATCH_SIZE = 1000
+FEED_RETENTION = timedelta(hours=1)
+
+
+class ChangeFeed:
+    """Carries table changes and event-bus events from the webhook ingestion process to
+    the Flask app through the ``change_feed`` table.
+
+    The publishing side records the tables its ``DatabaseManager`` marks changed and the
+    events published on its bus, and appends them from one thread, so entry ids commit
+    in order. The following side polls for new entries, bumps its own table versions
+    (invalidating ``ResponseCache`` entries) and republishes the events to its SSE
+    subscribers."""
+
+    def __init__(self, db_manager: DatabaseManager, event_bus: EventBus,
+        poll_seconds: float=None):
+        self.db_manager = db_manager
+        self.event_bus = event_bus
+        self.poll_seconds = (poll_seconds if poll_seconds is not None else
+            config.webhooks.change_feed_poll_seconds)
+        self.logger = logging.getLogger(__name__)
+        self.published = 0
+        self.relayed = 0
+        self.last_id = None
+        self.last_prune = datetime.now()
+        self._changed = set()
+        self._subscription = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start_publishing(self):
+        if not self.poll_seconds or self.poll_seconds <= 0 or self._thread:
+            return
+        self.db_manager.on_change = self._record_tables
+        if self._subscription is None:
+            self._subscription = self.event_bus.subscribe()
+        self._start(self._publish_loop, 'change-feed-publisher')
+
+    def start_following(self):
+        if not self.poll_seconds or self.poll_seconds <= 0 or self._thread:
+            return
+        if self.last_id is None:
+            self.last_id = self.db_manager.get_change_feed_head()
+        self._start(self._follow_loop, 'change-feed-follower')
+
+    def _start(self, target, name: str):
+        with self._lock:
+            if self._thread:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=target, name=name,
+                daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        if self._subscription is not None:
+            self.db_manager.on_change = None
+            self.event_bus.unsubscribe(self._subscription)
+            self._subscription = None
+            try:
+                self.publish()
+            except Exception as e:
+                self.logger.error(f'Error publishing change feed: {str(e)}')
+
+    def _record_tables(self, tables: Iterable[str]):
+        with self._lock:
+            self._changed.update(tables)
+
+    def _publish_loop(self):
+        while not self._stop.is_set():
+            events = self._subscription.get(timeout=self.poll_seconds)
+            try:
+                self.publish(events)
+            except Exception as e:
+                self.logger.error(f'Error publishing change feed: {str(e)}')
+
+    def publish(self, events: List[Dict[str, Any]]=()) ->int:
+        """Append the tables changed since the last call and ``events`` to the feed."""
+        with self._lock:
+            tables, self._changed = self._changed, set()
+        entries = [(','.join(sorted(tables)), None, None)] if tables else []
+        entries += [(None, event['type'], event['data']) for event in events]
+        if entries:
+            try:
+                self.db_manager.add_change_feed_entries(entries, datetime.now())
+            except Exception:
+                self._record_tables(tables)
+                raise
+            self.published += len(entries)
+        if datetime.now() - self.last_prune > FEED_RETENTION:
+            self.last_prune = datetime.now()
+            self.db_manager.delete_change_feed(self.last_prune - FEED_RETENTION)
+        return len(entries)
+
+    def _follow_loop(self):
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                self.follow()
+            except Exception as e:
+                self.logger.error(f'Error following change feed: {str(e)}')
+
+    def follow(self) ->int:
+        """Apply the entries appended since the last call."""
+        if self.last_id is None:
+            self.last_id = self.db_manager.get_change_feed_head()
+        relayed = 0
+        while True:
+            entries = self.db_manager.get_change_feed(self.last_id,
+                FEED_BATCH_SIZE)
+            for entry_id, table_names, event_type, data in entries:
+                if table_names:
+                    self.db_manager._mark_changed(*table_names.split(','))
+                if event_type:
+                    self.event_bus.publish(event_type, data)
+                self.last_id = entry_id
+            relayed += len(entries)
+            if len(entries) < FEED_BATCH_SIZE:
+                break
+        self.relayed += relayed
+        return relayed
+
+    def get_stats(self) ->Dict[str, Any]:
+        return {'published': self.published, 'relayed': self.relayed,
+            'last_id': self.last_id}
@@ -0,0 +1,157 @@
+import logging
+from typing import Any, BinaryIO, Callable, Iterator, Tuple
+from models import PARTITIONED_TABLES, DatabaseManager
+ROW_GROUP_SIZE = 100000
+COLUMNAR_FORMATS = {'parquet': 'application/vnd.apache.parquet', 'arrow':
+    'application/vnd.apache.arrow.stream'}
+EXPORT_TABLES = {'calls': [('id', 'int64'), ('contact_id', 'int64'), (
+    'call_sid', 'string'), ('status', 'category'), ('duration', 'int32'), (
+    'start_time', 'timestamp'), ('end_time', 'timestamp'), ('retry_count',
+    'int32'), ('campaign_id', 'category'), ('script_id', 'int64'), (
+    'recording_url', 'string'), ('transcript_url', 'string')], 'contacts':
+    [('id', 'int64'), ('phone_number', 'string'), ('name', 'string'), (
+    'status', 'category'), ('created_at', 'timestamp')], 'retry_attempts':
+    [('id', 'int64'), ('call_id', 'int64'), ('attempt_number', 'int32'), (
+    'status', 'category'), ('attempted_at', 'timestamp'), ('failure_reason',
+    'string')], 'transcripts': [('id', 'int64'), ('call_id', 'int64'), (
+    'transcript_text', 'string'), ('confidence_score', 'float64'), (
+    'created_at', 'timestamp')]}
+logger = logging.getLogger(__name__)
+
+
+def require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+        return pyarrow
+    except ImportError:
+        raise RuntimeError(
+            'Columnar exports require pyarrow. Install it with: pip install pyarrow'
+            )
+
+
+def _arrow_type(pa, kind: str):
+    if kind == 'category':
+        return pa.dictionary(pa.int32(), pa.string())
+    if kind == 'timestamp':
+        return pa.timestamp('us')
+    return getattr(pa, kind)()
+
+
+def build_schema(table: str):
+    pa = require_pyarrow()
+    return pa.schema([(name, _arrow_type(pa, kind)) for name, kind in
+        EXPORT_TABLES[table]])
+
+
+def _to_array(pa, values: Tuple, kind: str):
+    if kind == 'category':
+        return pa.array(values, pa.string()).dictionary_encode()
+    if kind == 'timestamp':
+        return pa.array(values, pa.string()).cast(pa.timestamp('us'))
+    return pa.array(values, _arrow_type(pa, kind))
+
+
+def iter_record_batches(db_manager: DatabaseManager, table: str,
+    row_group_size: int=ROW_GROUP_SIZE) ->Iterator[Any]:
+    """Record batches of ``table``; calls, retry attempts and transcripts include the
+    archive months, oldest first, each ordered by id."""
+    pa = require_pyarrow()
+    columns = EXPORT_TABLES[table]
+    schema = build_schema(table)
+    selected = ', '.join(name for name, _ in columns)
+    if table in PARTITIONED_TABLES:
+        batches = db_manager.iter_partition_batches(
+            f'SELECT {selected} FROM {{schema}}{table} ORDER BY id',
+            batch_size=row_group_size, raw=True)
+    else:
+        batches = db_manager.iter_batches(
+            f'SELECT {selected} FROM {table} ORDER BY id', batch_size=
+            row_group_size, raw=True)
+    for rows in batches:
+        values = list(zip(*rows))
+        yield pa.RecordBatch.from_arrays([_to_array(pa, values[index], kind
+            ) for index, (_, kind) in enumerate(columns)], schema=schema)
+
+
+def _validate(table: str, format: str):
+    if table not in EXPORT_TABLES:
+        raise ValueError(
+            f"Unknown table. Use one of: {', '.join(EXPORT_TABLES)}.")
+    if format not in COLUMNAR_FORMATS:
+        raise ValueError(
+            f"Unsupported format. Use one of: {', '.join(COLUMNAR_FORMATS)}.")
+
+
+def _open_writer(pa, sink, table: str, format: str):
+    schema = build_schema(table)
+    if format == 'parquet':
+        return pa.parquet.ParquetWriter(sink, schema, compression='zstd')
+    return pa.ipc.new_stream(sink, schema)
+
+
+def write_table(db_manager: DatabaseManager, table: str, sink: BinaryIO,
+    format: str='parquet', row_group_size: int=ROW_GROUP_SIZE, progress:
+    Callable[[int], None]=None) ->int:
+    _validate(table, format)
+    pa = require_pyarrow()
+    writer = _open_writer(pa, sink, table, format)
+    rows = 0
+    try:
+        for batch in iter_record_batches(db_manager, table, row_group_size):
+            writer.write_batch(batch)
+            rows += batch.num_rows
+            if progress:
+                progress(rows)
+    finally:
+        writer.close()
+    logger.info(f'Exported {rows} {table} rows as {format}')
+    return rows
+
+
+class _ChunkSink:
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) ->int:
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) ->int:
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def writable(self) ->bool:
+        return True
+
+    def drain(self) ->bytes:
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_table(db_manager: DatabaseManager, table: str, format: str=
+    'parquet', row_group_size: int=ROW_GROUP_SIZE) ->Iterator[bytes]:
+    _validate(table, format)
+    pa = require_pyarrow()
+    sink = _ChunkSink()
+    writer = _open_writer(pa, pa.PythonFile(sink, mode='w'), table, format)
+    try:
+        for batch in iter_record_batches(db_manager, table, row_group_size):
+            writer.write_batch(batch)
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    finally:
+        writer.close()
+    yield sink.drain()
@@ -1,6 +1,6 @@
 import os
-from dataclasses import dataclass
-from typing import Optional
+from dataclasses import dataclass, field
+from typing import Dict, Optional
 
 
 @dataclass
@@ -9,6 +9,34 @@ class TwilioConfig:
     auth_token: str
     phone_number: str
     webhook_url: Optional[str] = None
+    api_base_url: Optional[str] = None
+
+
+@dataclass
+class ProviderConfig:
+    pool_size: int = 32
+    connect_timeout_seconds: float = 3.05
+    read_timeout_seconds: float = 15.0
+    max_retries: int = 3
+    backoff_seconds: float = 0.5
+    status_refresh_seconds: float = 5.0
+    status_fetch_workers: int = 8
+
+
+@dataclass
+class RetryPolicy:
+    base_delay_minutes: Optional[float] = None
+    backoff_factor: float = 2.0
+    max_delay_minutes: float = 240
+    jitter_ratio: float = 0.2
+
+
+def _default_retry_policies() -> Dict[str, RetryPolicy]:
+    return {
+        'busy': RetryPolicy(),
+        'no-answer': RetryPolicy(backoff_factor=3.0),
+        'failed': RetryPolicy(base_delay_minutes=10, backoff_factor=3.0)
+    }
 
 
 @dataclass
@@ -18,6 +46,37 @@ class RetryConfig:
     retry_on_busy: bool = True
     retry_on_no_answer: bool = True
     retry_on_failed: bool = True
+    policies: Dict[str, RetryPolicy] = field(default_factory=_default_retry_policies)
+    max_retries_per_minute: int = 60
+    quiet_hours_start: Optional[int] = None
+    quiet_hours_end: Optional[int] = None
+
+
+@dataclass
+class DialerConfig:
+    max_calls_per_second: float = 1.0
+    max_concurrent_dials: int = 4
+    max_active_calls: int = 0
+    campaign_priority: int = 0
+    retry_priority: int = 1
+    active_call_ttl_minutes: float = 120
+
+
+@dataclass
+class ArchiveConfig:
+    directory: str = "data/archive"
+    min_age_days: float = 90
+    interval_hours: float = 24
+
+
+@dataclass
+class WebhookConfig:
+    ingest_port: int = 5001
+    ingest_workers: int = 4
+    ingest_queue_size: int = 10000
+    dedup_cache_size: int = 50000
+    dedup_retention_hours: float = 48
+    change_feed_poll_seconds: float = 1.0
 
 
 @dataclass
@@ -35,13 +94,52 @@ class Config:
             account_sid=os.getenv('TWILIO_ACCOUNT_SID', ''),
             auth_token=os.getenv('TWILIO_AUTH_TOKEN', ''),
             phone_number=os.getenv('TWILIO_PHONE_NUMBER', ''),
-            webhook_url=os.getenv('TWILIO_WEBHOOK_URL', 'http://localhost:5000/webhook')
+            webhook_url=os.getenv('TWILIO_WEBHOOK_URL', 'http://localhost:5000/webhook'),
+            api_base_url=os.getenv('TWILIO_API_BASE_URL') or None
+        )
+        
+        self.provider = ProviderConfig(
+            pool_size=int(os.getenv('PROVIDER_POOL_SIZE', '32')),
+            connect_timeout_seconds=float(os.getenv('PROVIDER_CONNECT_TIMEOUT', '3.05')),
+            read_timeout_seconds=float(os.getenv('PROVIDER_READ_TIMEOUT', '15')),
+            max_retries=int(os.getenv('PROVIDER_MAX_RETRIES', '3')),
+            backoff_seconds=float(os.getenv('PROVIDER_BACKOFF_SECONDS', '0.5')),
+            status_refresh_seconds=float(os.getenv('PROVIDER_STATUS_REFRESH_SECONDS', '5')),
+            status_fetch_workers=int(os.getenv('PROVIDER_STATUS_FETCH_WORKERS', '8'))
         )
         
-        self.retry = RetryConfig()
+        self.retry = RetryConfig(
+            max_retries_per_minute=int(os.getenv('RETRY_MAX_PER_MINUTE', '60')),
+            quiet_hours_start=int(os.getenv('RETRY_QUIET_HOURS_START')) if os.getenv('RETRY_QUIET_HOURS_START') else None,
+            quiet_hours_end=int(os.getenv('RETRY_QUIET_HOURS_END')) if os.getenv('RETRY_QUIET_HOURS_END') else None
+        )
         self.call = CallConfig()
+        self.dialer = DialerConfig(
+            max_calls_per_second=float(os.getenv('DIAL_MAX_CALLS_PER_SECOND', '1')),
+            max_concurrent_dials=int(os.getenv('DIAL_MAX_CONCURRENT', '4')),
+            max_active_calls=int(os.getenv('DIAL_MAX_ACTIVE_CALLS', '0')),
+            retry_priority=int(os.getenv('DIAL_RETRY_PRIORITY', '1')),
+            active_call_ttl_minutes=float(os.getenv('DIAL_ACTIVE_CALL_TTL_MINUTES', '120'))
+        )
+        
+        self.archive = ArchiveConfig(
+            directory=os.getenv('ARCHIVE_DIR', 'data/archive'),
+            min_age_days=float(os.getenv('ARCHIVE_MIN_AGE_DAYS', '90')),
+            interval_hours=float(os.getenv('ARCHIVE_INTERVAL_HOURS', '24'))
+        )
+        
+        self.webhooks = WebhookConfig(
+            ingest_port=int(os.getenv('WEBHOOK_INGEST_PORT', '5001')),
+            ingest_workers=int(os.getenv('WEBHOOK_INGEST_WORKERS', '4')),
+            ingest_queue_size=int(os.getenv('WEBHOOK_INGEST_QUEUE_SIZE', '10000')),
+            dedup_cache_size=int(os.getenv('WEBHOOK_DEDUP_CACHE_SIZE', '50000')),
+            dedup_retention_hours=float(os.getenv('WEBHOOK_DEDUP_RETENTION_HOURS', '48')),
+            change_feed_poll_seconds=float(os.getenv('WEBHOOK_CHANGE_FEED_POLL_SECONDS', '1'))
+        )
         
-        self.database_url = os.getenv('DATABASE_URL', 'sqlite:///robo_calls.db')
+        self.database_url = os.getenv('DATABASE_URL', 'sqlite:///data/robo_calls.db')
+        self.database_pool_size = int(os.getenv('DATABASE_POOL_SIZE', '10'))
+        self.response_cache_ttl_seconds = float(os.getenv('RESPONSE_CACHE_TTL_SECONDS', '5'))
         
         self.flask_host = os.getenv('FLASK_HOST', '0.0.0.0')
         self.flask_port = int(os.getenv('FLASK_PORT', '5000'))
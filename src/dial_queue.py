@@ -0,0 +1,130 @@
+import itertools
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional
+from models import Contact
+ACTIVE_CALL_POLL_SECONDS = 0.5
+
+
+class RateLimiter:
+
+    def __init__(self, rate_per_second: float):
+        self.rate_per_second = rate_per_second
+        self.next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.rate_per_second or self.rate_per_second <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + 1.0 / self.rate_per_second
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class DialQueue:
+
+    def __init__(self, dial_func: Callable[[Contact, Optional[str]], Dict[
+        str, Any]], max_workers: int, calls_per_second: float,
+        active_call_count: Callable[[], int]=None, max_active_calls: int=0):
+        self.dial_func = dial_func
+        self.max_workers = max(max_workers, 1)
+        self.limiter = RateLimiter(calls_per_second)
+        self.active_call_count = active_call_count
+        self.max_active_calls = max_active_calls
+        self.logger = logging.getLogger(__name__)
+        self.queue = queue.PriorityQueue()
+        self.pending_by_priority = {}
+        self.in_flight = 0
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._workers = []
+        self._running = False
+
+    def start(self):
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+            for index in range(self.max_workers):
+                worker = threading.Thread(target=self._work, name=
+                    f'dialer-{index}', daemon=True)
+                worker.start()
+                self._workers.append(worker)
+
+    def stop(self):
+        with self._lock:
+            self._running = False
+            workers, self._workers = self._workers, []
+        for _ in workers:
+            self.queue.put((float('-inf'), next(self._sequence), None))
+        for worker in workers:
+            worker.join(timeout=5)
+
+    def submit(self, contact: Contact, call_script: str=None, priority:
+        int=0, **dial_kwargs) ->Future:
+        self.start()
+        future = Future()
+        with self._lock:
+            self.pending_by_priority[priority] = self.pending_by_priority.get(
+                priority, 0) + 1
+        self.queue.put((priority, next(self._sequence), (contact,
+            call_script, dial_kwargs, future)))
+        return future
+
+    def cancel_pending(self, campaign_id: str) ->int:
+        canceled = 0
+        with self.queue.mutex:
+            for _, _, job in self.queue.queue:
+                if job and job[2].get('campaign_id') == campaign_id and job[3
+                    ].cancel():
+                    canceled += 1
+        return canceled
+
+    def depth(self) ->int:
+        return self.queue.qsize()
+
+    def get_stats(self) ->Dict[str, Any]:
+        with self._lock:
+            return {'queued': sum(self.pending_by_priority.values()),
+                'queued_by_priority': {str(priority): count for priority,
+                count in self.pending_by_priority.items() if count},
+                'in_flight': self.in_flight, 'workers': self.max_workers,
+                'calls_per_second': self.limiter.rate_per_second}
+
+    def _wait_for_capacity(self):
+        if not self.max_active_calls or not self.active_call_count:
+            return
+        while self._running and self.active_call_count(
+            ) >= self.max_active_calls:
+            time.sleep(ACTIVE_CALL_POLL_SECONDS)
+
+    def _work(self):
+        while True:
+            priority, _, job = self.queue.get()
+            if job is None:
+                return
+            contact, call_script, dial_kwargs, future = job
+            with self._lock:
+                self.pending_by_priority[priority] -= 1
+            if not future.set_running_or_notify_cancel():
+                continue
+            self._wait_for_capacity()
+            self.limiter.acquire()
+            with self._lock:
+                self.in_flight += 1
+            try:
+                future.set_result(self.dial_func(contact, call_script, **
+                    dial_kwargs))
+            except Exception as e:
+                self.logger.error(
+                    f'Error dialing {contact.phone_number}: {str(e)}')
+                future.set_exception(e)
+            finally:
+                with self._lock:
+                    self.in_flight -= 1
@@ -0,0 +1,87 @@
+import itertools
+import json
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List
+SUBSCRIBER_BUFFER_SIZE = 256
+
+
+class Subscription:
+
+    def __init__(self, buffer_size: int=SUBSCRIBER_BUFFER_SIZE):
+        self.buffer = deque(maxlen=buffer_size)
+        self.dropped = 0
+        self._ready = threading.Event()
+
+    def push(self, event: Dict[str, Any]):
+        if len(self.buffer) == self.buffer.maxlen:
+            self.dropped += 1
+        self.buffer.append(event)
+        self._ready.set()
+
+    def get(self, timeout: float=None) ->List[Dict[str, Any]]:
+        if not self._ready.wait(timeout):
+            return []
+        self._ready.clear()
+        events = []
+        while self.buffer:
+            events.append(self.buffer.popleft())
+        return events
+
+
+class EventBus:
+
+    def __init__(self, buffer_size: int=SUBSCRIBER_BUFFER_SIZE):
+        self.buffer_size = buffer_size
+        self.logger = logging.getLogger(__name__)
+        self.subscribers = set()
+        self.published = 0
+        self._sequence = itertools.count(1)
+        self._lock = threading.Lock()
+
+    @property
+    def has_subscribers(self) ->bool:
+        return bool(self.subscribers)
+
+    def subscribe(self) ->Subscription:
+        subscription = Subscription(self.buffer_size)
+        with self._lock:
+            self.subscribers = self.subscribers | {subscription}
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self.subscribers = self.subscribers - {subscription}
+        if subscription.dropped:
+            self.logger.warning(
+                f'Event subscriber dropped {subscription.dropped} events while it was connected'
+                )
+
+    def publish(self, event_type: str, data: Dict[str, Any]):
+        event_id = next(self._sequence)
+        self.published = event_id
+        subscribers = self.subscribers
+        if not subscribers:
+            return
+        event = {'id': event_id, 'type': event_type, 'data':
+            data, 'timestamp': datetime.now().isoformat()}
+        for subscription in subscribers:
+            subscription.push(event)
+
+    def get_stats(self) ->Dict[str, Any]:
+        subscribers = self.subscribers
+        return {'subscribers': len(subscribers), 'published': self.
+            published, 'dropped': sum(subscription.dropped for subscription in
+            subscribers)}
+
+
+def format_sse(event: Dict[str, Any]) ->str:
+    payload = dict(event['data'], timestamp=event['timestamp'])
+    return (
+        f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(payload)}\n\n"
+        )
+
+
+event_bus = EventBus()
@@ -0,0 +1,48 @@
+import argparse
+import logging
+import os
+import sys
+import time
+from typing import List
+from columnar_export import COLUMNAR_FORMATS, EXPORT_TABLES, ROW_GROUP_SIZE, write_table
+from config import config
+from models import DatabaseManager
+
+
+def main(argv: List[str]=None):
+    parser = argparse.ArgumentParser(description=
+        'Export call data to Parquet or Arrow for analytics')
+    parser.add_argument('tables', nargs='*', help=
+        f"Tables to export: {', '.join(EXPORT_TABLES)} (default: all)")
+    parser.add_argument('--format', choices=sorted(COLUMNAR_FORMATS),
+        default='parquet')
+    parser.add_argument('--db', default=config.database_url, help=
+        'Database URL or SQLite file to read from')
+    parser.add_argument('--output-dir', default='data/exports')
+    parser.add_argument('--row-group-size', type=int, default=ROW_GROUP_SIZE)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format=
+        '%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    unknown = [table for table in args.tables if table not in EXPORT_TABLES]
+    if unknown:
+        parser.error(f"Unknown tables: {', '.join(unknown)}")
+    if '://' not in args.db and not os.path.exists(args.db):
+        parser.error(f'Database not found: {args.db}')
+    db_manager = DatabaseManager(args.db)
+    os.makedirs(args.output_dir, exist_ok=True)
+    for table in args.tables or list(EXPORT_TABLES):
+        file_path = os.path.join(args.output_dir, f'{table}.{args.format}')
+        started = time.perf_counter()
+        try:
+            rows = write_table(db_manager, table, file_path, args.format,
+                args.row_group_size)
+        except RuntimeError as e:
+            print(str(e), file=sys.stderr)
+            sys.exit(1)
+        print(
+            f'{table}: {rows} rows -> {file_path} ({os.path.getsize(file_path)} bytes, {time.perf_counter() - started:.2f}s)'
+            )
+
+
+if __name__ == '__main__':
+    main()
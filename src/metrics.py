@@ -0,0 +1,233 @@
+import functools
+import inspect
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Iterator, Sequence, Tuple
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value: Any) ->str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n',
+        '\\n')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[Any], extra: str=''
+    ) ->str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names,
+        values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) ->str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter; ``inc`` takes the label values positionally.
+
+    Like the other stats counters in the app, updates are not locked: each one is a
+    single in-place addition, which the GIL does not interrupt, and taking a lock
+    would cost more than the update itself."""
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str]=()
+        ):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.values = {}
+
+    def inc(self, *label_values, amount: float=1):
+        cell = self.values.get(label_values)
+        if cell is None:
+            cell = self.values.setdefault(label_values, [0])
+        cell[0] += amount
+
+    def samples(self) ->Iterator[Tuple[str, str, float]]:
+        for label_values, (value,) in list(self.values.items()):
+            yield self.name + '_total', _format_labels(self.labels,
+                label_values), value
+
+
+class Histogram:
+    """Bucketed histogram. Buckets are stored non-cumulatively so ``observe`` is one
+    bisect and two unlocked additions (see ``Counter``); they are summed when the
+    registry is rendered."""
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str]=
+        (), buckets: Sequence[float]=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self.series = {}
+
+    def _series(self, label_values: Tuple) ->list:
+        series = self.series.get(label_values)
+        if series is None:
+            series = self.series.setdefault(label_values, [0] * (len(self.
+                buckets) + 1) + [0.0])
+        return series
+
+    def observe(self, value: float, *label_values):
+        series = self._series(label_values)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def time(self, *label_values) ->Callable:
+        """Decorator observing the wall time of each call. The series is resolved once,
+        so the per-call cost is two clock reads, a bisect and two additions."""
+        series = self._series(label_values)
+        buckets = self.buckets
+        perf_counter = time.perf_counter
+
+        def decorator(func):
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                started = perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    elapsed = perf_counter() - started
+                    series[bisect_left(buckets, elapsed)] += 1
+                    series[-1] += elapsed
+            return wrapper
+        return decorator
+
+    def samples(self) ->Iterator[Tuple[str, str, float]]:
+        for label_values, counts in list(self.series.items()):
+            counts = list(counts)
+            if not any(counts[:-1]):
+                continue
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                yield self.name + '_bucket', _format_labels(self.labels,
+                    label_values, f'le="{_format_value(float(bound))}"'
+                    ), cumulative
+            yield self.name + '_sum', _format_labels(self.labels,
+                label_values), counts[-1]
+            yield self.name + '_count', _format_labels(self.labels,
+                label_values), cumulative
+
+
+class CallbackMetric:
+    """Gauge or counter read from ``callback`` at scrape time, for values the app
+    already tracks (queue depths, stats counters). The callback returns a number or
+    a ``{label_values: number}`` dict."""
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[],
+        Any], labels: Sequence[str]=(), kind: str='gauge'):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.labels = tuple(labels)
+        self.kind = kind
+
+    def samples(self) ->Iterator[Tuple[str, str, float]]:
+        values = self.callback()
+        if not isinstance(values, dict):
+            values = {(): values}
+        name = self.name + '_total' if self.kind == 'counter' else self.name
+        for label_values, value in values.items():
+            if not isinstance(label_values, tuple):
+                label_values = label_values,
+            yield name, _format_labels(self.labels, label_values), value
+
+
+class Registry:
+
+    def __init__(self):
+        self.metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        """Add ``metric``, replacing any metric of the same name."""
+        with self._lock:
+            self.metrics[metric.name] = metric
+        return metric
+
+    def render(self) ->str:
+        with self._lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            try:
+                samples = list(metric.samples())
+            except Exception as e:
+                lines.append(f'# {metric.name} unavailable: {_escape(e)}')
+                continue
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(f'{name}{labels} {_format_value(value)}' for name,
+                labels, value in samples)
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def counter(name: str, documentation: str, labels: Sequence[str]=()
+    ) ->Counter:
+    return registry.register(Counter(name, documentation, labels))
+
+
+def histogram(name: str, documentation: str, labels: Sequence[str]=(),
+    buckets: Sequence[float]=LATENCY_BUCKETS) ->Histogram:
+    return registry.register(Histogram(name, documentation, labels, buckets))
+
+
+def gauge(name: str, documentation: str, callback: Callable[[], Any],
+    labels: Sequence[str]=()) ->CallbackMetric:
+    return registry.register(CallbackMetric(name, documentation, callback,
+        labels))
+
+
+def counter_callback(name: str, documentation: str, callback: Callable[[],
+    Any], labels: Sequence[str]=()) ->CallbackMetric:
+    return registry.register(CallbackMetric(name, documentation, callback,
+        labels, 'counter'))
+
+
+def timed_methods(metric: Histogram, exclude: Sequence[str]=()):
+    """Class decorator observing every public method's duration, labelled by method
+    name. Generator methods are left alone since their work happens after return."""
+
+    def decorate(cls):
+        for name, member in list(vars(cls).items()):
+            if (name.startswith('_') or name in exclude or not inspect.
+                isfunction(member) or inspect.isgeneratorfunction(member)):
+                continue
+            setattr(cls, name, metric.time(name)(member))
+        return cls
+    return decorate
+
+
+DB_QUERY_SECONDS = histogram('robocall_db_query_seconds',
+    'Time spent in each DatabaseManager method', ['method'])
+PROVIDER_REQUEST_SECONDS = histogram('robocall_provider_request_seconds',
+    'Twilio API request latency including retries', ['endpoint'])
+PROVIDER_ERRORS = counter('robocall_provider_errors',
+    'Twilio API requests that failed or returned an error status', [
+    'endpoint'])
+CALLS_DIALED = counter('robocall_calls_dialed',
+    'Outbound calls placed, by outcome', ['outcome'])
+WEBHOOK_SECONDS = histogram('robocall_webhook_seconds',
+    'Time to apply a Twilio callback', ['kind'])
+WEBHOOK_EVENTS = counter('robocall_webhook_events',
+    'Twilio callbacks received, by kind and outcome', ['kind', 'outcome'])
+TRANSCRIPTION_SECONDS = histogram('robocall_transcription_seconds',
+    'Time to download and transcribe a recording', ['outcome'])
+
+
+def render() ->str:
+    return registry.render()
@@ -1,11 +1,45 @@
+import os
+import glob
 import sqlite3
+import hashlib
+import itertools
+from contextlib import closing
 from datetime import datetime
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Iterator, Sequence, Tuple
 from dataclasses import dataclass
 import json
+from metrics import DB_QUERY_SECONDS, timed_methods
+from storage import POOL_SIZE, open_backend
 
 
-@dataclass
+class LazyTimestamp:
+    
+    def __init__(self, slot):
+        self.slot = slot
+    
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        value = self.slot.__get__(instance, owner)
+        if value.__class__ is str:
+            value = datetime.fromisoformat(value) if value else None
+            self.slot.__set__(instance, value)
+        return value
+    
+    def __set__(self, instance, value):
+        self.slot.__set__(instance, value)
+
+
+def lazy_timestamps(*names: str):
+    def decorate(cls):
+        for name in names:
+            setattr(cls, name, LazyTimestamp(cls.__dict__[name]))
+        return cls
+    return decorate
+
+
+@lazy_timestamps('created_at')
+@dataclass(slots=True)
 class Contact:
     id: Optional[int] = None
     phone_number: str = ""
@@ -14,7 +48,8 @@ class Contact:
     status: str = "active"
 
 
-@dataclass
+@lazy_timestamps('start_time', 'end_time')
+@dataclass(slots=True)
 class Call:
     id: Optional[int] = None
     contact_id: int = 0
@@ -26,9 +61,11 @@ class Call:
     retry_count: int = 0
     transcript_url: Optional[str] = None
     recording_url: Optional[str] = None
+    campaign_id: Optional[str] = None
+    script_id: Optional[int] = None
 
 
-@dataclass
+@dataclass(slots=True)
 class RetryAttempt:
     id: Optional[int] = None
     call_id: int = 0
@@ -38,7 +75,8 @@ class RetryAttempt:
     failure_reason: Optional[str] = None
 
 
-@dataclass
+@lazy_timestamps('created_at')
+@dataclass(slots=True)
 class Transcript:
     id: Optional[int] = None
     call_id: int = 0
@@ -47,22 +85,42 @@ class Transcript:
     created_at: Optional[datetime] = None
 
 
+CONTACT_COLUMNS = 'id, phone_number, name, created_at, status'
+CALL_COLUMNS = ('id, contact_id, call_sid, status, duration, start_time, end_time, retry_count, '
+                'transcript_url, recording_url, campaign_id, script_id')
+TRANSCRIPT_COLUMNS = 'id, call_id, transcript_text, confidence_score, created_at'
+ARCHIVE_SCHEMA = 'archive'
+PARTITIONED_TABLES = ('calls', 'retry_attempts', 'transcripts')
+
+
+def month_bounds(month: str) -> Tuple[str, str]:
+    year, number = (int(part) for part in month.split('-'))
+    following = f'{year + 1}-01' if number == 12 else f'{year}-{number + 1:02d}'
+    return f'{month}-01', f'{following}-01'
+
+
+@timed_methods(DB_QUERY_SECONDS, exclude=('get_connection', 'archive_path', 'get_table_versions'))
 class DatabaseManager:
     
-    def __init__(self, db_path: str = "data/robo_calls.db"):
-        self.db_path = db_path
+    def __init__(self, db_path: str = "data/robo_calls.db", archive_dir: str = None,
+                 pool_size: int = POOL_SIZE):
+        """``db_path`` is a SQLite file path or a ``sqlite:///`` / ``postgresql://`` URL."""
+        self.backend = open_backend(db_path, pool_size)
+        self.db_path = getattr(self.backend, 'path', None)
+        self.archive_dir = archive_dir or os.path.join(os.path.dirname(self.db_path or ''), 'archive')
+        self.table_versions = {}
+        self.on_change = None
+        self._change_counter = itertools.count(1)
         self.init_database()
     
-    def get_connection(self) -> sqlite3.Connection:
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        return conn
+    def get_connection(self, raw: bool = False):
+        return self.backend.connect(raw)
     
     def init_database(self):
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        cursor.execute('''
+        cursor.execute(self.backend.ddl('''
             CREATE TABLE IF NOT EXISTS contacts (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 phone_number TEXT UNIQUE NOT NULL,
@@ -70,9 +128,9 @@ class DatabaseManager:
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 status TEXT DEFAULT 'active'
             )
-        ''')
+        '''))
         
-        cursor.execute('''
+        cursor.execute(self.backend.ddl('''
             CREATE TABLE IF NOT EXISTS calls (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 contact_id INTEGER NOT NULL,
@@ -86,9 +144,9 @@ class DatabaseManager:
                 recording_url TEXT,
                 FOREIGN KEY (contact_id) REFERENCES contacts (id)
             )
-        ''')
+        '''))
         
-        cursor.execute('''
+        cursor.execute(self.backend.ddl('''
             CREATE TABLE IF NOT EXISTS retry_attempts (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 call_id INTEGER NOT NULL,
@@ -98,9 +156,9 @@ class DatabaseManager:
                 failure_reason TEXT,
                 FOREIGN KEY (call_id) REFERENCES calls (id)
             )
-        ''')
+        '''))
         
-        cursor.execute('''
+        cursor.execute(self.backend.ddl('''
             CREATE TABLE IF NOT EXISTS transcripts (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 call_id INTEGER NOT NULL,
@@ -109,11 +167,106 @@ class DatabaseManager:
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 FOREIGN KEY (call_id) REFERENCES calls (id)
             )
-        ''')
+        '''))
+        
+        cursor.execute(self.backend.ddl('''
+            CREATE TABLE IF NOT EXISTS scheduled_retries (
+                call_id INTEGER PRIMARY KEY,
+                attempt_number INTEGER NOT NULL,
+                due_at TIMESTAMP NOT NULL,
+                FOREIGN KEY (call_id) REFERENCES calls (id)
+            )
+        '''))
+        
+        cursor.execute(self.backend.ddl('''
+            CREATE TABLE IF NOT EXISTS scripts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                checksum TEXT UNIQUE NOT NULL,
+                script_text TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        '''))
+        
+        cursor.execute(self.backend.ddl('''
+            CREATE TABLE IF NOT EXISTS active_calls (
+                call_id INTEGER PRIMARY KEY,
+                call_sid TEXT,
+                started_at TIMESTAMP NOT NULL,
+                FOREIGN KEY (call_id) REFERENCES calls (id)
+            )
+        '''))
+        
+        cursor.execute(self.backend.ddl('''
+            CREATE TABLE IF NOT EXISTS webhook_events (
+                call_sid TEXT NOT NULL,
+                event TEXT NOT NULL,
+                sequence_number INTEGER NOT NULL,
+                received_at TIMESTAMP NOT NULL,
+                UNIQUE (call_sid, event, sequence_number)
+            )
+        '''))
+        
+        cursor.execute(self.backend.ddl('''
+            CREATE TABLE IF NOT EXISTS webhook_inbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                call_id INTEGER NOT NULL,
+                form TEXT NOT NULL,
+                received_at TIMESTAMP NOT NULL
+            )
+        '''))
+        
+        cursor.execute(self.backend.ddl('''
+            CREATE TABLE IF NOT EXISTS change_feed (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                table_names TEXT,
+                event_type TEXT,
+                data TEXT,
+                created_at TIMESTAMP NOT NULL
+            )
+        '''))
+        
+        cursor.execute(self.backend.ddl('''
+            CREATE TABLE IF NOT EXISTS archived_stats (
+                month TEXT NOT NULL,
+                table_name TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT '',
+                row_count INTEGER NOT NULL DEFAULT 0,
+                value_total REAL NOT NULL DEFAULT 0,
+                value_count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (month, table_name, status)
+            )
+        '''))
+        
+        self._ensure_column(cursor, 'calls', 'campaign_id', 'TEXT')
+        self._ensure_column(cursor, 'calls', 'script_id', 'INTEGER REFERENCES scripts (id)')
+        
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_calls_status ON calls (status, retry_count)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_contacts_created_at ON contacts (created_at)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_calls_start_time ON calls (start_time)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_calls_campaign_id ON calls (campaign_id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_scheduled_retries_due_at ON scheduled_retries (due_at)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_retry_attempts_call_id ON retry_attempts (call_id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_active_calls_started_at ON active_calls (started_at)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_webhook_events_received_at ON webhook_events (received_at)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_change_feed_created_at ON change_feed (created_at)')
         
         conn.commit()
         conn.close()
     
+    def _mark_changed(self, *tables: str):
+        for table in tables:
+            self.table_versions[table] = next(self._change_counter)
+        if self.on_change:
+            self.on_change(tables)
+    
+    def get_table_versions(self, tables: Tuple[str, ...]) -> Tuple[int, ...]:
+        return tuple(self.table_versions.get(table, 0) for table in tables)
+    
+    def _ensure_column(self, cursor, table: str, column: str, definition: str):
+        if column not in self.backend.column_names(cursor, table):
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+    
     def add_contact(self, contact: Contact) -> int:
         conn = self.get_connection()
         cursor = conn.cursor()
@@ -121,50 +274,84 @@ class DatabaseManager:
         cursor.execute('''
             INSERT INTO contacts (phone_number, name, status)
             VALUES (?, ?, ?)
+            RETURNING id
         ''', (contact.phone_number, contact.name, contact.status))
         
-        contact_id = cursor.lastrowid
+        contact_id = cursor.fetchone()[0]
         conn.commit()
         conn.close()
+        self._mark_changed('contacts')
         return contact_id
     
     def get_contact(self, contact_id: int) -> Optional[Contact]:
-        conn = self.get_connection()
+        conn = self.get_connection(raw=True)
         cursor = conn.cursor()
         
-        cursor.execute('SELECT * FROM contacts WHERE id = ?', (contact_id,))
+        cursor.execute(f'SELECT {CONTACT_COLUMNS} FROM contacts WHERE id = ?', (contact_id,))
         row = cursor.fetchone()
         conn.close()
-        
-        if row:
-            return Contact(
-                id=row['id'],
-                phone_number=row['phone_number'],
-                name=row['name'],
-                created_at=datetime.fromisoformat(row['created_at']) if row['created_at'] else None,
-                status=row['status']
-            )
-        return None
+        return Contact(*row) if row else None
     
     def get_all_contacts(self) -> List[Contact]:
-        conn = self.get_connection()
+        conn = self.get_connection(raw=True)
         cursor = conn.cursor()
         
-        cursor.execute('SELECT * FROM contacts ORDER BY created_at DESC')
-        rows = cursor.fetchall()
+        cursor.execute(f'SELECT {CONTACT_COLUMNS} FROM contacts ORDER BY created_at DESC')
+        contacts = [Contact(*row) for row in cursor.fetchall()]
         conn.close()
-        
-        contacts = []
-        for row in rows:
-            contacts.append(Contact(
-                id=row['id'],
-                phone_number=row['phone_number'],
-                name=row['name'],
-                created_at=datetime.fromisoformat(row['created_at']) if row['created_at'] else None,
-                status=row['status']
-            ))
         return contacts
     
+    def get_contact_rows(self) -> List[Dict[str, Any]]:
+        conn = self.get_connection(raw=True)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT id, phone_number, name, status, REPLACE(created_at, ' ', 'T') AS created_at
+            FROM contacts
+            ORDER BY contacts.created_at DESC
+        ''')
+        columns = [description[0] for description in cursor.description]
+        rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        conn.close()
+        return rows
+    
+    def iter_contacts(self, status: str = None, created_after: datetime = None,
+                      created_before: datetime = None, batch_size: int = 1000) -> Iterator[sqlite3.Row]:
+        conditions = []
+        params = []
+        if status:
+            conditions.append('status = ?')
+            params.append(status)
+        if created_after:
+            conditions.append('created_at >= ?')
+            params.append(created_after)
+        if created_before:
+            conditions.append('created_at < ?')
+            params.append(created_before)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        
+        for rows in self.iter_batches(f'''
+            SELECT id, phone_number, name, status, created_at
+            FROM contacts {where}
+            ORDER BY created_at DESC
+        ''', params, batch_size):
+            yield from rows
+    
+    def iter_batches(self, query: str, params: Sequence[Any] = (), batch_size: int = 1000,
+                     raw: bool = False) -> Iterator[List[Any]]:
+        """Yield ``fetchmany`` batches; PostgreSQL reads through a server-side cursor."""
+        conn = self.get_connection(raw)
+        try:
+            cursor = self.backend.stream_cursor(conn, batch_size)
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            conn.close()
+    
     def bulk_add_contacts(self, contacts: List[Contact]) -> List[int]:
         conn = self.get_connection()
         cursor = conn.cursor()
@@ -173,12 +360,15 @@ class DatabaseManager:
         for contact in contacts:
             try:
                 cursor.execute('''
-                    INSERT OR IGNORE INTO contacts (phone_number, name, status)
+                    INSERT INTO contacts (phone_number, name, status)
                     VALUES (?, ?, ?)
+                    ON CONFLICT (phone_number) DO NOTHING
+                    RETURNING id
                 ''', (contact.phone_number, contact.name, contact.status))
                 
-                if cursor.lastrowid:
-                    contact_ids.append(cursor.lastrowid)
+                inserted = cursor.fetchone()
+                if inserted:
+                    contact_ids.append(inserted[0])
                 else:
                     cursor.execute('SELECT id FROM contacts WHERE phone_number = ?', (contact.phone_number,))
                     existing_row = cursor.fetchone()
@@ -189,6 +379,7 @@ class DatabaseManager:
         
         conn.commit()
         conn.close()
+        self._mark_changed('contacts')
         return contact_ids
     
     def add_call(self, call: Call) -> int:
@@ -196,14 +387,17 @@ class DatabaseManager:
         cursor = conn.cursor()
         
         cursor.execute('''
-            INSERT INTO calls (contact_id, call_sid, status, duration, start_time, end_time, retry_count, transcript_url, recording_url)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            INSERT INTO calls (contact_id, call_sid, status, duration, start_time, end_time, retry_count, transcript_url, recording_url, campaign_id, script_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            RETURNING id
         ''', (call.contact_id, call.call_sid, call.status, call.duration, 
-              call.start_time, call.end_time, call.retry_count, call.transcript_url, call.recording_url))
+              call.start_time, call.end_time, call.retry_count, call.transcript_url, call.recording_url,
+              call.campaign_id, call.script_id))
         
-        call_id = cursor.lastrowid
+        call_id = cursor.fetchone()[0]
         conn.commit()
         conn.close()
+        self._mark_changed('calls')
         return call_id
     
     def update_call(self, call: Call):
@@ -220,77 +414,275 @@ class DatabaseManager:
         
         conn.commit()
         conn.close()
+        self._mark_changed('calls')
     
-    def get_call(self, call_id: int) -> Optional[Call]:
+    def transition_call_status(self, call_id: int, status: str, allowed_from: List[str],
+                               call_sid: str = None, duration: int = None,
+                               end_time: datetime = None) -> bool:
+        """Move a call to ``status`` only if its current status is in ``allowed_from``.
+        The check and the write are one statement, so concurrent callbacks cannot race."""
+        if not allowed_from:
+            return False
         conn = self.get_connection()
         cursor = conn.cursor()
+        placeholders = ', '.join('?' for _ in allowed_from)
         
-        cursor.execute('SELECT * FROM calls WHERE id = ?', (call_id,))
-        row = cursor.fetchone()
+        cursor.execute(f'''
+            UPDATE calls SET
+                status = ?, call_sid = COALESCE(?, call_sid), duration = COALESCE(?, duration),
+                end_time = COALESCE(?, end_time)
+            WHERE id = ? AND status IN ({placeholders})
+        ''', (status, call_sid, duration, end_time, call_id, *allowed_from))
+        
+        updated = cursor.rowcount == 1
+        conn.commit()
         conn.close()
+        if updated:
+            self._mark_changed('calls')
+        return updated
+    
+    def get_call_status(self, call_id: int) -> Optional[str]:
+        row = self._fetch_partitioned('SELECT status FROM {schema}calls WHERE id = ?', (call_id,))
+        return row[0] if row else None
+    
+    def set_call_recording_url(self, call_id: int, recording_url: str):
+        conn = self.get_connection()
+        cursor = conn.cursor()
         
-        if row:
-            return Call(
-                id=row['id'],
-                contact_id=row['contact_id'],
-                call_sid=row['call_sid'],
-                status=row['status'],
-                duration=row['duration'],
-                start_time=datetime.fromisoformat(row['start_time']) if row['start_time'] else None,
-                end_time=datetime.fromisoformat(row['end_time']) if row['end_time'] else None,
-                retry_count=row['retry_count'],
-                transcript_url=row['transcript_url'],
-                recording_url=row['recording_url']
-            )
-        return None
+        cursor.execute('UPDATE calls SET recording_url = ? WHERE id = ?', (recording_url, call_id))
+        
+        conn.commit()
+        conn.close()
+        self._mark_changed('calls')
     
-    def get_calls_by_status(self, status: str) -> List[Call]:
+    def increment_retry_count(self, call_id: int) -> int:
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        cursor.execute('SELECT * FROM calls WHERE status = ? ORDER BY start_time DESC', (status,))
-        rows = cursor.fetchall()
+        cursor.execute('UPDATE calls SET retry_count = retry_count + 1 WHERE id = ? RETURNING retry_count',
+                       (call_id,))
+        
+        row = cursor.fetchone()
+        conn.commit()
         conn.close()
+        self._mark_changed('calls')
+        return row[0] if row else 0
+    
+    def get_call(self, call_id: int) -> Optional[Call]:
+        row = self._fetch_partitioned(f'SELECT {CALL_COLUMNS} FROM {{schema}}calls WHERE id = ?', (call_id,))
+        return Call(*row) if row else None
+    
+    def get_calls_by_status(self, status: str) -> List[Call]:
+        conn = self.get_connection(raw=True)
+        cursor = conn.cursor()
         
-        calls = []
-        for row in rows:
-            calls.append(Call(
-                id=row['id'],
-                contact_id=row['contact_id'],
-                call_sid=row['call_sid'],
-                status=row['status'],
-                duration=row['duration'],
-                start_time=datetime.fromisoformat(row['start_time']) if row['start_time'] else None,
-                end_time=datetime.fromisoformat(row['end_time']) if row['end_time'] else None,
-                retry_count=row['retry_count'],
-                transcript_url=row['transcript_url'],
-                recording_url=row['recording_url']
-            ))
+        cursor.execute(f'SELECT {CALL_COLUMNS} FROM calls WHERE status = ? ORDER BY start_time DESC', (status,))
+        calls = [Call(*row) for row in cursor.fetchall()]
+        conn.close()
         return calls
     
     def get_all_calls(self) -> List[Call]:
+        conn = self.get_connection(raw=True)
+        cursor = conn.cursor()
+        
+        cursor.execute(f'SELECT {CALL_COLUMNS} FROM calls ORDER BY start_time DESC')
+        calls = [Call(*row) for row in cursor.fetchall()]
+        conn.close()
+        return calls
+    
+    def get_call_history_rows(self, limit: int = None, started_after: datetime = None,
+                              started_before: datetime = None) -> List[Dict[str, Any]]:
+        conditions = []
+        params = []
+        if started_after:
+            conditions.append('c.start_time >= ?')
+            params.append(started_after)
+        if started_before:
+            conditions.append('c.start_time < ?')
+            params.append(started_before)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        
+        query = f'''
+            SELECT c.id AS call_id, c.contact_id,
+                   COALESCE(ct.name, '') AS contact_name, COALESCE(ct.phone_number, '') AS phone_number,
+                   c.call_sid, c.status, c.duration,
+                   REPLACE(c.start_time, ' ', 'T') AS start_time, REPLACE(c.end_time, ' ', 'T') AS end_time,
+                   c.retry_count, c.recording_url, c.transcript_url
+            FROM {{schema}}calls c
+            LEFT JOIN contacts ct ON c.contact_id = ct.id
+            {where}
+            ORDER BY c.start_time DESC
+        '''
+        if limit:
+            query += f' LIMIT {int(limit)}'
+        return self.query_partitions(query, params, 'start_time', limit, started_after, started_before)
+    
+    def archive_path(self, month: str) -> str:
+        return os.path.join(self.archive_dir, f"calls_{month.replace('-', '_')}.db")
+    
+    def archive_months(self, started_after: datetime = None, started_before: datetime = None) -> List[str]:
+        if self.backend.name != 'sqlite':
+            return []
+        months = []
+        for path in glob.glob(os.path.join(self.archive_dir, 'calls_*.db')):
+            month = os.path.basename(path)[6:-3].replace('_', '-')
+            month_start, month_end = month_bounds(month)
+            if started_after and month_end <= str(started_after):
+                continue
+            if started_before and month_start >= str(started_before):
+                continue
+            months.append(month)
+        return sorted(months)
+    
+    def iter_partitions(self, conn, started_after: datetime = None, started_before: datetime = None,
+                        oldest_first: bool = False) -> Iterator[Tuple[str, Optional[str]]]:
+        """Yield the hot tables' prefix (empty) and then, newest first, each overlapping
+        archive month attached as ``archive.``; ``oldest_first`` yields the months
+        oldest first and the hot tables last."""
+        months = self.archive_months(started_after, started_before)
+        if not oldest_first:
+            yield '', None
+            months.reverse()
+        for month in months:
+            conn.execute(f'ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}', (self.archive_path(month),))
+            try:
+                yield f'{ARCHIVE_SCHEMA}.', month
+            finally:
+                conn.execute(f'DETACH DATABASE {ARCHIVE_SCHEMA}')
+        if oldest_first:
+            yield '', None
+    
+    def iter_partition_batches(self, query: str, params: Sequence[Any] = (), batch_size: int = 1000,
+                               raw: bool = False) -> Iterator[List[Any]]:
+        """``iter_batches`` over the archive months, oldest first, and then the hot
+        tables; ``{schema}`` in the query prefixes the partitioned tables."""
+        conn = self.get_connection(raw)
+        with closing(conn), closing(self.iter_partitions(conn, oldest_first=True)) as partitions:
+            for schema, _ in partitions:
+                cursor = self.backend.stream_cursor(conn, batch_size)
+                try:
+                    cursor.execute(query.format(schema=schema), params)
+                    while True:
+                        rows = cursor.fetchmany(batch_size)
+                        if not rows:
+                            break
+                        yield rows
+                finally:
+                    cursor.close()
+    
+    def _fetch_partitioned(self, query: str, params: Sequence[Any]):
+        """First row of ``query`` in the hot tables or, failing that, in the archive
+        months newest first; ``{schema}`` prefixes the partitioned tables."""
+        conn = self.get_connection(raw=True)
+        with closing(conn), closing(self.iter_partitions(conn)) as partitions:
+            for schema, _ in partitions:
+                cursor = conn.execute(query.format(schema=schema), params)
+                row = cursor.fetchone()
+                cursor.close()
+                if row:
+                    return row
+        return None
+    
+    def query_partitions(self, query: str, params: List[Any], order_key: str, limit: int = None,
+                         started_after: datetime = None, started_before: datetime = None) -> List[Dict[str, Any]]:
+        """Run ``query`` against the hot database and, only while it can still change the
+        newest ``limit`` rows, against archive months. ``{schema}`` in the query prefixes
+        the partitioned tables; rows are merged newest first on ``order_key``."""
+        conn = self.get_connection(raw=True)
+        rows = []
+        with closing(conn), closing(self.iter_partitions(conn, started_after, started_before)) as partitions:
+            for schema, month in partitions:
+                if month and limit and len(rows) >= limit and (rows[limit - 1][order_key] or '') >= month_bounds(month)[1]:
+                    break
+                cursor = conn.execute(query.format(schema=schema), params)
+                columns = [description[0] for description in cursor.description]
+                rows.extend(dict(zip(columns, row)) for row in cursor.fetchall())
+                cursor.close()
+                if month:
+                    rows.sort(key=lambda row: row[order_key] or '', reverse=True)
+        return rows[:limit] if limit else rows
+    
+    def get_archived_stats(self, table: str) -> Dict[str, Tuple[int, float, int]]:
+        conn = self.get_connection(raw=True)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT status, SUM(row_count), SUM(value_total), SUM(value_count)
+            FROM archived_stats WHERE table_name = ? GROUP BY status
+        ''', (table,))
+        stats = {status: (rows, total, count) for status, rows, total, count in cursor.fetchall()}
+        conn.close()
+        return stats
+    
+    def find_calls(self, statuses: List[str] = None, started_after: datetime = None,
+                   started_before: datetime = None, campaign_id: str = None) -> List[sqlite3.Row]:
+        """Calls matching every given filter; an empty ``statuses`` list matches nothing."""
+        if statuses is not None and not statuses:
+            return []
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        cursor.execute('SELECT * FROM calls ORDER BY start_time DESC')
+        conditions = []
+        params = []
+        if statuses:
+            conditions.append(f"status IN ({', '.join('?' for _ in statuses)})")
+            params.extend(statuses)
+        if started_after:
+            conditions.append('start_time >= ?')
+            params.append(started_after)
+        if started_before:
+            conditions.append('start_time < ?')
+            params.append(started_before)
+        if campaign_id:
+            conditions.append('campaign_id = ?')
+            params.append(campaign_id)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        
+        cursor.execute(f'SELECT id, call_sid, status FROM calls {where}', params)
         rows = cursor.fetchall()
         conn.close()
+        return rows
+    
+    def get_calls_with_contacts(self, call_ids: List[int]) -> List[sqlite3.Row]:
+        if not call_ids:
+            return []
         
-        calls = []
-        for row in rows:
-            calls.append(Call(
-                id=row['id'],
-                contact_id=row['contact_id'],
-                call_sid=row['call_sid'],
-                status=row['status'],
-                duration=row['duration'],
-                start_time=datetime.fromisoformat(row['start_time']) if row['start_time'] else None,
-                end_time=datetime.fromisoformat(row['end_time']) if row['end_time'] else None,
-                retry_count=row['retry_count'],
-                transcript_url=row['transcript_url'],
-                recording_url=row['recording_url']
-            ))
-        return calls
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        rows = []
+        for start in range(0, len(call_ids), 500):
+            chunk = call_ids[start:start + 500]
+            placeholders = ', '.join('?' for _ in chunk)
+            cursor.execute(f'''
+                SELECT c.*, ct.name AS contact_name, ct.phone_number
+                FROM calls c
+                LEFT JOIN contacts ct ON c.contact_id = ct.id
+                WHERE c.id IN ({placeholders})
+            ''', chunk)
+            rows.extend(cursor.fetchall())
+        conn.close()
+        return rows
+    
+    def bulk_update_call_status(self, call_ids: List[int], status: str, end_time: datetime = None,
+                                allowed_from: List[str] = None) -> int:
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        if allowed_from is None:
+            cursor.executemany('UPDATE calls SET status = ?, end_time = COALESCE(?, end_time) WHERE id = ?',
+                               [(status, end_time, call_id) for call_id in call_ids])
+        else:
+            placeholders = ', '.join('?' for _ in allowed_from)
+            cursor.executemany(f'UPDATE calls SET status = ?, end_time = COALESCE(?, end_time) '
+                               f'WHERE id = ? AND status IN ({placeholders})',
+                               [(status, end_time, call_id, *allowed_from) for call_id in call_ids])
+        
+        updated = cursor.rowcount
+        conn.commit()
+        conn.close()
+        self._mark_changed('calls')
+        return updated
     
     def add_retry_attempt(self, retry: RetryAttempt) -> int:
         conn = self.get_connection()
@@ -299,44 +691,386 @@ class DatabaseManager:
         cursor.execute('''
             INSERT INTO retry_attempts (call_id, attempt_number, status, failure_reason)
             VALUES (?, ?, ?, ?)
+            RETURNING id
         ''', (retry.call_id, retry.attempt_number, retry.status, retry.failure_reason))
         
-        retry_id = cursor.lastrowid
+        retry_id = cursor.fetchone()[0]
         conn.commit()
         conn.close()
+        self._mark_changed('retry_attempts')
         return retry_id
     
-    def add_transcript(self, transcript: Transcript) -> int:
+    def bulk_add_retry_attempts(self, retries: List[RetryAttempt]) -> int:
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.executemany('''
+            INSERT INTO retry_attempts (call_id, attempt_number, status, failure_reason)
+            VALUES (?, ?, ?, ?)
+        ''', [(retry.call_id, retry.attempt_number, retry.status, retry.failure_reason)
+              for retry in retries])
+        
+        inserted = cursor.rowcount
+        conn.commit()
+        conn.close()
+        self._mark_changed('retry_attempts')
+        return inserted
+    
+    def get_retry_candidates(self, statuses: List[str], max_attempts: int) -> List[sqlite3.Row]:
+        if not statuses:
+            return []
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        placeholders = ', '.join('?' for _ in statuses)
+        cursor.execute(f'''
+            SELECT c.id, c.status, c.retry_count, s.call_id IS NOT NULL AS scheduled
+            FROM calls c
+            LEFT JOIN scheduled_retries s ON s.call_id = c.id
+            WHERE c.status IN ({placeholders}) AND c.retry_count < ?
+        ''', (*statuses, max_attempts))
+        rows = cursor.fetchall()
+        conn.close()
+        return rows
+    
+    def schedule_retries(self, entries: List[Tuple[int, int, datetime]]) -> int:
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        existing = set()
+        for start in range(0, len(entries), 500):
+            chunk = [entry[0] for entry in entries[start:start + 500]]
+            placeholders = ', '.join('?' for _ in chunk)
+            cursor.execute(f'SELECT call_id FROM scheduled_retries WHERE call_id IN ({placeholders})', chunk)
+            existing.update(row['call_id'] for row in cursor.fetchall())
+        
+        cursor.executemany('''
+            INSERT INTO scheduled_retries (call_id, attempt_number, due_at)
+            VALUES (?, ?, ?)
+            ON CONFLICT (call_id) DO UPDATE SET attempt_number = excluded.attempt_number, due_at = excluded.due_at
+        ''', entries)
+        
+        conn.commit()
+        conn.close()
+        self._mark_changed('scheduled_retries')
+        return len({entry[0] for entry in entries} - existing)
+    
+    def delete_scheduled_retries(self, call_ids: List[int]) -> int:
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.executemany('DELETE FROM scheduled_retries WHERE call_id = ?',
+                           [(call_id,) for call_id in call_ids])
+        
+        deleted = cursor.rowcount
+        conn.commit()
+        conn.close()
+        self._mark_changed('scheduled_retries')
+        return deleted
+    
+    def claim_scheduled_retries(self, call_ids: List[int], due_before: datetime) -> List[Tuple[int, int]]:
+        """Delete the retries of ``call_ids`` that are due and return the ``(call_id,
+        attempt_number)`` pairs this call removed. When several processes race for
+        the same row only one of them gets it back."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        claimed = []
+        for call_id in call_ids:
+            cursor.execute('DELETE FROM scheduled_retries WHERE call_id = ? AND due_at <= ? RETURNING attempt_number',
+                           (call_id, due_before))
+            row = cursor.fetchone()
+            if row:
+                claimed.append((call_id, row[0]))
+        
+        conn.commit()
+        conn.close()
+        if claimed:
+            self._mark_changed('scheduled_retries')
+        return claimed
+    
+    def get_scheduled_retry(self, call_id: int) -> Optional[sqlite3.Row]:
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT * FROM scheduled_retries WHERE call_id = ?', (call_id,))
+        row = cursor.fetchone()
+        conn.close()
+        return row
+    
+    def get_scheduled_retries_before(self, due_before: datetime) -> List[sqlite3.Row]:
         conn = self.get_connection()
         cursor = conn.cursor()
         
         cursor.execute('''
-            INSERT INTO transcripts (call_id, transcript_text, confidence_score)
+            SELECT call_id, attempt_number, due_at FROM scheduled_retries
+            WHERE due_at < ? ORDER BY due_at
+        ''', (due_before,))
+        rows = cursor.fetchall()
+        conn.close()
+        return rows
+    
+    def count_scheduled_retries(self) -> int:
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT COUNT(*) as count FROM scheduled_retries')
+        count = cursor.fetchone()['count']
+        conn.close()
+        return count
+    
+    def add_script(self, script_text: str) -> int:
+        checksum = hashlib.sha256(script_text.encode('utf-8')).hexdigest()
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('INSERT INTO scripts (checksum, script_text) VALUES (?, ?) ON CONFLICT (checksum) DO NOTHING',
+                       (checksum, script_text))
+        cursor.execute('SELECT id FROM scripts WHERE checksum = ?', (checksum,))
+        script_id = cursor.fetchone()['id']
+        conn.commit()
+        conn.close()
+        self._mark_changed('scripts')
+        return script_id
+    
+    def get_script(self, script_id: int) -> Optional[str]:
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT script_text FROM scripts WHERE id = ?', (script_id,))
+        row = cursor.fetchone()
+        conn.close()
+        return row['script_text'] if row else None
+    
+    def get_call_script_id(self, call_id: int) -> Optional[int]:
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT script_id FROM calls WHERE id = ?', (call_id,))
+        row = cursor.fetchone()
+        conn.close()
+        return row['script_id'] if row else None
+    
+    def add_active_call(self, call_id: int, call_sid: str, started_at: datetime):
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            INSERT INTO active_calls (call_id, call_sid, started_at)
             VALUES (?, ?, ?)
-        ''', (transcript.call_id, transcript.transcript_text, transcript.confidence_score))
+            ON CONFLICT (call_id) DO UPDATE SET call_sid = excluded.call_sid, started_at = excluded.started_at
+        ''', (call_id, call_sid, started_at))
         
-        transcript_id = cursor.lastrowid
         conn.commit()
         conn.close()
-        return transcript_id
     
-    def get_transcript_by_call_id(self, call_id: int) -> Optional[Transcript]:
+    def delete_active_calls(self, call_ids: List[int]) -> int:
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.executemany('DELETE FROM active_calls WHERE call_id = ?',
+                           [(call_id,) for call_id in call_ids])
+        
+        deleted = cursor.rowcount
+        conn.commit()
+        conn.close()
+        return deleted
+    
+    def claim_webhook_event(self, call_sid: str, event: str, sequence_number: int,
+                            received_at: datetime) -> bool:
+        """Record a callback delivery; False if the same event was already recorded."""
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        cursor.execute('SELECT * FROM transcripts WHERE call_id = ?', (call_id,))
+        cursor.execute('''
+            INSERT INTO webhook_events (call_sid, event, sequence_number, received_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT (call_sid, event, sequence_number) DO NOTHING
+        ''', (call_sid, event, sequence_number, received_at))
+        
+        claimed = cursor.rowcount == 1
+        conn.commit()
+        conn.close()
+        return claimed
+    
+    def release_webhook_event(self, call_sid: str, event: str, sequence_number: int):
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('DELETE FROM webhook_events WHERE call_sid = ? AND event = ? AND sequence_number = ?',
+                       (call_sid, event, sequence_number))
+        
+        conn.commit()
+        conn.close()
+    
+    def delete_webhook_events(self, received_before: datetime) -> int:
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('DELETE FROM webhook_events WHERE received_at < ?', (received_before,))
+        
+        deleted = cursor.rowcount
+        conn.commit()
+        conn.close()
+        return deleted
+    
+    def add_webhook_inbox_events(self, events: List[Tuple[str, int, Dict[str, str]]],
+                                 received_at: datetime) -> List[int]:
+        """Persist accepted ``(kind, call_id, form)`` callbacks, in one transaction, until
+        they have been applied. Returns their ids in order."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        event_ids = []
+        for kind, call_id, form in events:
+            cursor.execute('''
+                INSERT INTO webhook_inbox (kind, call_id, form, received_at)
+                VALUES (?, ?, ?, ?)
+                RETURNING id
+            ''', (kind, call_id, json.dumps(form), received_at))
+            event_ids.append(cursor.fetchone()[0])
+        
+        conn.commit()
+        conn.close()
+        return event_ids
+    
+    def delete_webhook_inbox_events(self, event_ids: List[int]) -> int:
+        if not event_ids:
+            return 0
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        placeholders = ', '.join('?' for _ in event_ids)
+        cursor.execute(f'DELETE FROM webhook_inbox WHERE id IN ({placeholders})', event_ids)
+        
+        deleted = cursor.rowcount
+        conn.commit()
+        conn.close()
+        return deleted
+    
+    def get_webhook_inbox_events(self) -> List[Tuple[int, str, int, Dict[str, str]]]:
+        """Callbacks accepted but not applied yet, oldest first."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT id, kind, call_id, form FROM webhook_inbox ORDER BY id')
+        events = [(row['id'], row['kind'], row['call_id'], json.loads(row['form']))
+                  for row in cursor.fetchall()]
+        conn.close()
+        return events
+    
+    def add_change_feed_entries(self, entries: List[Tuple[Optional[str], Optional[str], Optional[Dict[str, Any]]]],
+                                created_at: datetime) -> int:
+        """Append ``(table_names, event_type, data)`` entries for other processes to follow."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.executemany('''
+            INSERT INTO change_feed (table_names, event_type, data, created_at)
+            VALUES (?, ?, ?, ?)
+        ''', [(table_names, event_type, json.dumps(data) if data is not None else None, created_at)
+              for table_names, event_type, data in entries])
+        
+        conn.commit()
+        conn.close()
+        return len(entries)
+    
+    def get_change_feed(self, after_id: int, limit: int) -> List[Tuple[int, Optional[str], Optional[str],
+                                                                       Optional[Dict[str, Any]]]]:
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT id, table_names, event_type, data FROM change_feed
+            WHERE id > ? ORDER BY id LIMIT ?
+        ''', (after_id, limit))
+        entries = [(row['id'], row['table_names'], row['event_type'],
+                    json.loads(row['data']) if row['data'] is not None else None)
+                   for row in cursor.fetchall()]
+        conn.close()
+        return entries
+    
+    def get_change_feed_head(self) -> int:
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT COALESCE(MAX(id), 0) FROM change_feed')
+        head = cursor.fetchone()[0]
+        conn.close()
+        return head
+    
+    def delete_change_feed(self, created_before: datetime) -> int:
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('DELETE FROM change_feed WHERE created_at < ?', (created_before,))
+        
+        deleted = cursor.rowcount
+        conn.commit()
+        conn.close()
+        return deleted
+    
+    def get_active_call(self, call_id: int) -> Optional[sqlite3.Row]:
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT * FROM active_calls WHERE call_id = ?', (call_id,))
         row = cursor.fetchone()
         conn.close()
+        return row
+    
+    def get_active_call_ids(self) -> List[int]:
+        conn = self.get_connection()
+        cursor = conn.cursor()
         
-        if row:
-            return Transcript(
-                id=row['id'],
-                call_id=row['call_id'],
-                transcript_text=row['transcript_text'],
-                confidence_score=row['confidence_score'],
-                created_at=datetime.fromisoformat(row['created_at']) if row['created_at'] else None
-            )
-        return None
+        cursor.execute('SELECT call_id FROM active_calls ORDER BY started_at')
+        call_ids = [row['call_id'] for row in cursor.fetchall()]
+        conn.close()
+        return call_ids
+    
+    def count_active_calls(self) -> int:
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT COUNT(*) as count FROM active_calls')
+        count = cursor.fetchone()['count']
+        conn.close()
+        return count
+    
+    def expire_active_calls(self, started_before: datetime) -> List[int]:
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT call_id FROM active_calls WHERE started_at < ?', (started_before,))
+        call_ids = [row['call_id'] for row in cursor.fetchall()]
+        cursor.executemany('DELETE FROM active_calls WHERE call_id = ?',
+                           [(call_id,) for call_id in call_ids])
+        
+        conn.commit()
+        conn.close()
+        return call_ids
+    
+    def add_transcript(self, transcript: Transcript) -> int:
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            INSERT INTO transcripts (call_id, transcript_text, confidence_score)
+            VALUES (?, ?, ?)
+            RETURNING id
+        ''', (transcript.call_id, transcript.transcript_text, transcript.confidence_score))
+        
+        transcript_id = cursor.fetchone()[0]
+        conn.commit()
+        conn.close()
+        self._mark_changed('transcripts')
+        return transcript_id
+    
+    def get_transcript_by_call_id(self, call_id: int) -> Optional[Transcript]:
+        row = self._fetch_partitioned(f'SELECT {TRANSCRIPT_COLUMNS} FROM {{schema}}transcripts WHERE call_id = ?',
+                                      (call_id,))
+        return Transcript(*row) if row else None
     
     def get_call_summary(self) -> Dict[str, Any]:
         conn = self.get_connection()
@@ -352,18 +1086,21 @@ class DatabaseManager:
         cursor.execute('SELECT COUNT(*) as count FROM contacts')
         total_contacts = cursor.fetchone()['count']
         
-        cursor.execute('SELECT COUNT(*) as count FROM calls')
-        total_calls = cursor.fetchone()['count']
-        
-        cursor.execute('SELECT AVG(duration) as avg_duration FROM calls WHERE duration IS NOT NULL')
-        avg_duration = cursor.fetchone()['avg_duration']
+        cursor.execute('SELECT SUM(duration) as duration_total, COUNT(duration) as duration_count FROM calls')
+        durations = cursor.fetchone()
+        duration_total = durations['duration_total'] or 0
+        duration_count = durations['duration_count']
         
         conn.close()
         
+        for status, (rows, total, count) in self.get_archived_stats('calls').items():
+            status_counts[status] = status_counts.get(status, 0) + rows
+            duration_total += total
+            duration_count += count
+        
         return {
             'total_contacts': total_contacts,
-            'total_calls': total_calls,
+            'total_calls': sum(status_counts.values()),
             'status_counts': status_counts,
-            'average_duration': avg_duration
+            'average_duration': duration_total / duration_count if duration_count else None
         }
-
@@ -1,8 +1,14 @@
+import csv
+import io
 import pandas as pd
 import re
-from typing import List, Dict, Tuple, Optional
+from datetime import datetime
+from typing import Callable, List, Dict, Iterator, Tuple, Optional
 from models import Contact, DatabaseManager
 import logging
+EXPORT_BATCH_SIZE = 1000
+EXPORT_COLUMNS = ['ID', 'Phone Number', 'Name', 'Status', 'Created At']
+PROGRESS_LOG_ROWS = 100000
 
 
 class PhoneListManager:
@@ -185,33 +191,58 @@ class PhoneListManager:
 
     def get_contacts_summary(self) ->Dict[str, any]:
         try:
-            contacts = self.db_manager.get_all_contacts()
+            contacts = self.db_manager.get_contact_rows()
             status_counts = {}
             for contact in contacts:
-                status = contact.status
+                status = contact['status']
                 status_counts[status] = status_counts.get(status, 0) + 1
             return {'total_contacts': len(contacts), 'status_counts':
-                status_counts, 'contacts': [{'id': c.id, 'phone_number': c.
-                phone_number, 'name': c.name, 'status': c.status,
-                'created_at': c.created_at.isoformat() if c.created_at else
-                None} for c in contacts]}
+                status_counts, 'contacts': contacts}
         except Exception as e:
             self.logger.error(f'Error getting contacts summary: {str(e)}')
             return {'total_contacts': 0, 'status_counts': {}, 'contacts': []}
 
-    def export_contacts_to_csv(self, file_path: str) ->bool:
+    def stream_contacts_csv(self, status: str=None, created_after:
+        datetime=None, created_before: datetime=None, progress: Callable[[
+        int], None]=None, batch_size: int=EXPORT_BATCH_SIZE) ->Iterator[str]:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_COLUMNS)
+        count = 0
+        for count, row in enumerate(self.db_manager.iter_contacts(status,
+            created_after, created_before, batch_size), 1):
+            created_at = row['created_at']
+            writer.writerow([row['id'], row['phone_number'], row['name'],
+                row['status'], created_at.replace(' ', 'T', 1) if
+                created_at else ''])
+            if count % batch_size == 0:
+                if progress:
+                    progress(count)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        if progress:
+            progress(count)
+        yield buffer.getvalue()
+
+    def export_contacts_to_csv(self, file_path: str, status: str=None,
+        created_after: datetime=None, created_before: datetime=None,
+        progress: Callable[[int], None]=None) ->bool:
         try:
-            contacts = self.db_manager.get_all_contacts()
-            data = []
-            for contact in contacts:
-                data.append({'ID': contact.id, 'Phone Number': contact.
-                    phone_number, 'Name': contact.name, 'Status': contact.
-                    status, 'Created At': contact.created_at.isoformat() if
-                    contact.created_at else ''})
-            df = pd.DataFrame(data)
-            df.to_csv(file_path, index=False)
-            self.logger.info(
-                f'Exported {len(contacts)} contacts to {file_path}')
+            exported = 0
+
+            def track(count):
+                nonlocal exported
+                if count // PROGRESS_LOG_ROWS > exported // PROGRESS_LOG_ROWS:
+                    self.logger.info(f'Exported {count} contacts so far')
+                exported = count
+                if progress:
+                    progress(count)
+            with open(file_path, 'w', encoding='utf-8', newline='') as f:
+                for chunk in self.stream_contacts_csv(status, created_after,
+                    created_before, track):
+                    f.write(chunk)
+            self.logger.info(f'Exported {exported} contacts to {file_path}')
             return True
         except Exception as e:
             self.logger.error(f'Error exporting contacts: {str(e)}')
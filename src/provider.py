@@ -0,0 +1,276 @@
+import logging
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from twilio.http import HttpClient
+from urllib3.exceptions import ConnectTimeoutError
+from twilio.http.response import Response
+from twilio.rest import Client
+from config import config
+from metrics import PROVIDER_ERRORS, PROVIDER_REQUEST_SECONDS
+TWILIO_API_BASE_URL = 'https://api.twilio.com'
+ENDPOINT_PATTERNS = [('media.download', re.compile(
+    '/Recordings/[^/.]+(\\.(mp3|wav))?$')), ('recordings.fetch', re.compile(
+    '/Recordings/[^/]+\\.json$')), ('calls.fetch', re.compile(
+    '/Calls/[^/]+\\.json$')), ('calls.list', re.compile('/Calls\\.json$')),
+    ('accounts.fetch', re.compile('/Accounts/[^/]+\\.json$'))]
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'}
+MAX_BACKOFF_SECONDS = 30.0
+LATENCY_SAMPLES = 1000
+
+
+def classify_endpoint(method: str, url: str) ->str:
+    path = urlsplit(url).path
+    for name, pattern in ENDPOINT_PATTERNS:
+        if pattern.search(path):
+            if method == 'POST' and name == 'calls.fetch':
+                return 'calls.update'
+            if method == 'POST' and name == 'calls.list':
+                return 'calls.create'
+            return name
+    return 'other'
+
+
+def connection_not_established(error: requests.exceptions.ConnectionError
+    ) ->bool:
+    """True when the request never reached the server (refused, DNS or connect timeout)."""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(reason, ConnectTimeoutError)
+
+
+class PooledHttpClient(HttpClient):
+
+    def __init__(self, base_url: str=None, pool_size: int=32,
+        connect_timeout: float=3.05, read_timeout: float=15.0, max_retries:
+        int=3, backoff_seconds: float=0.5):
+        super().__init__(logging.getLogger('twilio.http_client'), False, None)
+        self.base_url = base_url.rstrip('/') if base_url else None
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size,
+            max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.endpoint_stats = {}
+        self._stats_lock = threading.Lock()
+
+    def _rewrite(self, url: str) ->str:
+        if self.base_url and url.startswith(TWILIO_API_BASE_URL):
+            return self.base_url + url[len(TWILIO_API_BASE_URL):]
+        return url
+
+    def _should_retry(self, method: str, status_code: int) ->bool:
+        if status_code == 429:
+            return True
+        return method in IDEMPOTENT_METHODS and status_code in RETRY_STATUSES
+
+    def _should_retry_error(self, method: str, error: requests.exceptions.
+        ConnectionError) ->bool:
+        """A dropped connection may have delivered a POST (e.g. ``calls.create``), so
+        non-idempotent requests are only retried if they never left this host."""
+        return method in IDEMPOTENT_METHODS or connection_not_established(error
+            )
+
+    def _backoff(self, attempt: int, response: requests.Response=None
+        ) ->float:
+        retry_after = response.headers.get('Retry-After'
+            ) if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), MAX_BACKOFF_SECONDS)
+        return min(self.backoff_seconds * 2 ** attempt, MAX_BACKOFF_SECONDS)
+
+    def _record(self, endpoint: str, seconds: float, error: bool, retries: int
+        ):
+        PROVIDER_REQUEST_SECONDS.observe(seconds, endpoint)
+        if error:
+            PROVIDER_ERRORS.inc(endpoint)
+        with self._stats_lock:
+            stats = self.endpoint_stats.get(endpoint)
+            if stats is None:
+                stats = self.endpoint_stats[endpoint] = {'count': 0,
+                    'errors': 0, 'retries': 0, 'total_seconds': 0.0,
+                    'max_seconds': 0.0, 'samples': deque(maxlen=
+                    LATENCY_SAMPLES)}
+            stats['count'] += 1
+            stats['errors'] += 1 if error else 0
+            stats['retries'] += retries
+            stats['total_seconds'] += seconds
+            stats['max_seconds'] = max(stats['max_seconds'], seconds)
+            stats['samples'].append(seconds)
+
+    def send(self, method: str, url: str, **kwargs) ->requests.Response:
+        method = method.upper()
+        url = self._rewrite(url)
+        endpoint = classify_endpoint(method, url)
+        kwargs.setdefault('timeout', (self.connect_timeout, self.read_timeout))
+        started = time.perf_counter()
+        attempt = 0
+        while True:
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except requests.exceptions.ConnectionError as e:
+                if attempt >= self.max_retries or not self._should_retry_error(
+                    method, e):
+                    self._record(endpoint, time.perf_counter() - started,
+                        True, attempt)
+                    raise
+                time.sleep(self._backoff(attempt))
+                attempt += 1
+                continue
+            if attempt < self.max_retries and self._should_retry(method,
+                response.status_code):
+                time.sleep(self._backoff(attempt, response))
+                attempt += 1
+                continue
+            self._record(endpoint, time.perf_counter() - started, response.
+                status_code >= 400, attempt)
+            return response
+
+    def request(self, method: str, url: str, params: Optional[Dict[str,
+        object]]=None, data: Optional[Dict[str, object]]=None, headers:
+        Optional[Dict[str, str]]=None, auth: Optional[Tuple[str, str]]=None,
+        timeout: Optional[float]=None, allow_redirects: bool=False
+        ) ->Response:
+        kwargs = {'params': params, 'headers': headers, 'auth': auth,
+            'allow_redirects': allow_redirects}
+        if headers and headers.get('Content-Type') == 'application/json':
+            kwargs['json'] = data
+        else:
+            kwargs['data'] = data
+        if timeout is not None:
+            kwargs['timeout'] = self.connect_timeout, timeout
+        response = self.send(method, url, **kwargs)
+        self._test_only_last_response = Response(int(response.status_code),
+            response.text, response.headers)
+        return self._test_only_last_response
+
+    def get_endpoint_stats(self) ->Dict[str, Dict[str, Any]]:
+        with self._stats_lock:
+            snapshot = {endpoint: (dict(stats), sorted(stats['samples'])) for
+                endpoint, stats in self.endpoint_stats.items()}
+        result = {}
+        for endpoint, (stats, samples) in snapshot.items():
+            result[endpoint] = {'count': stats['count'], 'errors': stats[
+                'errors'], 'retries': stats['retries'], 'avg_ms': round(
+                stats['total_seconds'] / stats['count'] * 1000, 2),
+                'max_ms': round(stats['max_seconds'] * 1000, 2), 'p50_ms':
+                round(samples[len(samples) // 2] * 1000, 2), 'p99_ms':
+                round(samples[min(int(len(samples) * 0.99), len(samples) -
+                1)] * 1000, 2)}
+        return result
+
+
+def get_api_base_url() ->str:
+    return (config.twilio.api_base_url or TWILIO_API_BASE_URL).rstrip('/')
+
+
+def create_http_client() ->PooledHttpClient:
+    return PooledHttpClient(base_url=config.twilio.api_base_url, pool_size=
+        config.provider.pool_size, connect_timeout=config.provider.
+        connect_timeout_seconds, read_timeout=config.provider.
+        read_timeout_seconds, max_retries=config.provider.max_retries,
+        backoff_seconds=config.provider.backoff_seconds)
+
+
+def create_twilio_client(http_client: PooledHttpClient=None) ->Client:
+    return Client(config.twilio.account_sid, config.twilio.auth_token,
+        http_client=http_client or create_http_client())
+
+
+class TwilioProvider:
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self._client = None
+        self._http_client = None
+        self._lock = threading.Lock()
+        self._health_thread = None
+        self._warned_missing_credentials = False
+        self.health = {'status': 'unknown', 'account': None, 'checked_at':
+            None, 'latency_ms': None, 'error': None}
+
+    def has_credentials(self) ->bool:
+        return bool(config.twilio.account_sid and config.twilio.auth_token)
+
+    @property
+    def client(self) ->Optional[Client]:
+        if self._client is not None:
+            return self._client
+        with self._lock:
+            if self._client is None:
+                if not self.has_credentials():
+                    if not self._warned_missing_credentials:
+                        self.logger.error('Twilio credentials not configured')
+                        self._warned_missing_credentials = True
+                    return None
+                try:
+                    self._client = create_twilio_client(self.http_client)
+                except Exception as e:
+                    self.logger.error(
+                        f'Failed to initialize Twilio client: {str(e)}')
+                    return None
+        return self._client
+
+    @property
+    def http_client(self) ->PooledHttpClient:
+        if self._http_client is None:
+            self._http_client = create_http_client()
+        return self._http_client
+
+    def reset(self):
+        with self._lock:
+            self._client = None
+            self._http_client = None
+
+    def download(self, url: str) ->requests.Response:
+        return self.http_client.send('GET', url, auth=(config.twilio.
+            account_sid, config.twilio.auth_token))
+
+    def get_endpoint_stats(self) ->Dict[str, Dict[str, Any]]:
+        if self._http_client is None:
+            return {}
+        return self._http_client.get_endpoint_stats()
+
+    def verify_account(self) ->Dict[str, Any]:
+        started = time.perf_counter()
+        try:
+            client = self.client
+            if client is None:
+                raise RuntimeError('Twilio client not initialized')
+            account = client.api.accounts(config.twilio.account_sid).fetch()
+            self.health = {'status': 'ok', 'account': account.
+                friendly_name, 'checked_at': datetime.now().isoformat(),
+                'latency_ms': round((time.perf_counter() - started) * 1000,
+                1), 'error': None}
+            self.logger.info(
+                f'Twilio account verified: {account.friendly_name}')
+        except Exception as e:
+            self.health = {'status': 'error', 'account': None, 'checked_at':
+                datetime.now().isoformat(), 'latency_ms': round((time.
+                perf_counter() - started) * 1000, 1), 'error': str(e)}
+            self.logger.error(f'Twilio account verification failed: {str(e)}'
+                )
+        return self.health
+
+    def start_health_check(self):
+        with self._lock:
+            if self._health_thread is not None or not self.has_credentials():
+                return
+            self._health_thread = threading.Thread(target=self.
+                verify_account, name='twilio-health-check', daemon=True)
+            self._health_thread.start()
+
+
+provider = TwilioProvider()
@@ -0,0 +1,79 @@
+import functools
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Tuple
+from flask import Response, make_response, request, session
+from models import DatabaseManager
+MAX_ENTRIES = 512
+
+
+class ResponseCache:
+
+    def __init__(self, db_manager: DatabaseManager, ttl_seconds: float,
+        max_entries: int=MAX_ENTRIES):
+        self.db_manager = db_manager
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self._lock = threading.Lock()
+
+    def cached(self, *tables: str) ->Callable:
+
+        def decorator(view):
+
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                if (not self.ttl_seconds or self.ttl_seconds <= 0 or
+                    session.get('_flashes')):
+                    return view(*args, **kwargs)
+                key = request.endpoint, request.full_path
+                versions = self.db_manager.get_table_versions(tables)
+                now = time.monotonic()
+                with self._lock:
+                    entry = self.entries.get(key)
+                    if entry and entry[0] == versions and entry[1] > now:
+                        self.entries.move_to_end(key)
+                        self.hits += 1
+                    else:
+                        entry = None
+                        self.misses += 1
+                if entry is None:
+                    response = make_response(view(*args, **kwargs))
+                    if response.status_code != 200 or response.is_streamed:
+                        return response
+                    body = response.get_data()
+                    entry = (versions, now + self.ttl_seconds, body,
+                        response.mimetype,
+                        f'"{hashlib.sha1(body).hexdigest()[:20]}"')
+                    with self._lock:
+                        self.entries[key] = entry
+                        self.entries.move_to_end(key)
+                        while len(self.entries) > self.max_entries:
+                            self.entries.popitem(last=False)
+                return self._respond(entry)
+            return wrapper
+        return decorator
+
+    def _respond(self, entry: Tuple) ->Response:
+        _, expires_at, body, mimetype, etag = entry
+        max_age = max(int(expires_at - time.monotonic()), 0)
+        headers = {'ETag': etag, 'Cache-Control':
+            f'private, max-age={max_age}'}
+        if etag in request.headers.get('If-None-Match', ''):
+            self.not_modified += 1
+            return Response(status=304, headers=headers)
+        return Response(body, mimetype=mimetype, headers=headers)
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+
+    def get_stats(self):
+        with self._lock:
+            return {'entries': len(self.entries), 'hits': self.hits,
+                'misses': self.misses, 'not_modified': self.not_modified}
@@ -0,0 +1,166 @@
+import heapq
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional, Tuple
+from models import DatabaseManager
+DISPATCH_BATCH_SIZE = 500
+WINDOW_MINUTES = 60
+MAX_IDLE_SECONDS = 30
+
+
+class RetryDispatcher:
+    """Fires scheduled retries from an in-memory heap of the rows due within the next
+    window. Every wake also picks up due rows scheduled by other processes, and each
+    row is claimed with its own conditional DELETE, so when several processes share a
+    database every retry is dispatched by exactly one of them."""
+
+    def __init__(self, db_manager: DatabaseManager, callback: Callable[[
+        List[Tuple[int, int]]], None], batch_size: int=DISPATCH_BATCH_SIZE,
+        window_minutes: int=WINDOW_MINUTES, max_idle_seconds: float=
+        MAX_IDLE_SECONDS):
+        self.db_manager = db_manager
+        self.callback = callback
+        self.batch_size = batch_size
+        self.window = timedelta(minutes=window_minutes)
+        self.max_idle_seconds = max_idle_seconds
+        self.logger = logging.getLogger(__name__)
+        self.heap = []
+        self.entries = {}
+        self.scheduled_count = 0
+        self.window_end = None
+        self._cond = threading.Condition()
+        self._thread = None
+        self._running = False
+
+    def start(self):
+        with self._cond:
+            if self._running:
+                return
+            self.scheduled_count = self.db_manager.count_scheduled_retries()
+            self._refill(datetime.now())
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name=
+                'retry-dispatcher', daemon=True)
+            self._thread.start()
+        self.logger.info(
+            f'Retry dispatcher started with {self.scheduled_count} scheduled retries'
+            )
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def schedule(self, call_id: int, attempt_number: int, due_at: datetime):
+        self.schedule_many([(call_id, attempt_number, due_at)])
+
+    def schedule_many(self, items: List[Tuple[int, int, datetime]]) ->int:
+        if not items:
+            return 0
+        added = self.db_manager.schedule_retries(items)
+        with self._cond:
+            self.scheduled_count += added
+            wake = False
+            for call_id, attempt_number, due_at in items:
+                if self.window_end is not None and due_at < self.window_end:
+                    self.entries[call_id] = due_at, attempt_number
+                    heapq.heappush(self.heap, (due_at, call_id))
+                    wake = wake or self.heap[0][1] == call_id
+                else:
+                    self.entries.pop(call_id, None)
+            if wake:
+                self._cond.notify_all()
+        return added
+
+    def cancel(self, call_id: int) ->bool:
+        return self.cancel_many([call_id]) > 0
+
+    def cancel_many(self, call_ids: List[int]) ->int:
+        if not call_ids:
+            return 0
+        with self._cond:
+            for call_id in call_ids:
+                self.entries.pop(call_id, None)
+            if len(self.heap) > 2 * len(self.entries) + self.batch_size:
+                self.heap = [(due_at, call_id) for call_id, (due_at, _) in
+                    self.entries.items()]
+                heapq.heapify(self.heap)
+        deleted = self.db_manager.delete_scheduled_retries(call_ids)
+        with self._cond:
+            self.scheduled_count = max(self.scheduled_count - deleted, 0)
+        return deleted
+
+    def get(self, call_id: int) ->Optional[datetime]:
+        with self._cond:
+            entry = self.entries.get(call_id)
+        if entry:
+            return entry[0]
+        row = self.db_manager.get_scheduled_retry(call_id)
+        if row:
+            return datetime.fromisoformat(row['due_at'])
+        return None
+
+    def count(self) ->int:
+        return self.scheduled_count
+
+    def _refill(self, now: datetime):
+        self.window_end = now + self.window
+        self._load(self.window_end)
+
+    def _load(self, due_before: datetime):
+        for row in self.db_manager.get_scheduled_retries_before(due_before):
+            if row['call_id'] in self.entries:
+                continue
+            due_at = datetime.fromisoformat(row['due_at'])
+            self.entries[row['call_id']] = due_at, row['attempt_number']
+            heapq.heappush(self.heap, (due_at, row['call_id']))
+
+    def _pop_due(self, now: datetime) ->List[Tuple[int, int]]:
+        batch = []
+        while self.heap and self.heap[0][0] <= now and len(batch
+            ) < self.batch_size:
+            due_at, call_id = heapq.heappop(self.heap)
+            entry = self.entries.get(call_id)
+            if entry is None or entry[0] != due_at:
+                continue
+            del self.entries[call_id]
+            batch.append((call_id, entry[1]))
+        return batch
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._running:
+                    return
+                now = datetime.now()
+                try:
+                    if now >= self.window_end:
+                        self._refill(now)
+                    else:
+                        self._load(now)
+                except Exception as e:
+                    self.logger.error(
+                        f'Error loading scheduled retries: {str(e)}')
+                batch = self._pop_due(now)
+                if not batch:
+                    wait_until = self.window_end
+                    if self.heap and self.heap[0][0] < wait_until:
+                        wait_until = self.heap[0][0]
+                    timeout = min((wait_until - now).total_seconds(), self
+                        .max_idle_seconds)
+                    self._cond.wait(timeout=max(timeout, 0.01))
+                    continue
+            try:
+                claimed = self.db_manager.claim_scheduled_retries([call_id for
+                    call_id, _ in batch], now)
+                with self._cond:
+                    self.scheduled_count = max(self.scheduled_count - len(
+                        claimed), 0)
+                if claimed:
+                    self.callback(claimed)
+            except Exception as e:
+                self.logger.error(f'Error dispatching retry batch: {str(e)}')
@@ -1,12 +1,12 @@
-from datetime import datetime, timedelta
+from datetime import datetime
+from dataclasses import asdict, replace
 import logging
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Tuple
 from models import Call, Contact, RetryAttempt, DatabaseManager
 from config import config
-import time
-import threading
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.triggers.date import DateTrigger
+from concurrent.futures import Future
+from retry_dispatcher import RetryDispatcher
+from retry_planner import RetryPlanner
 
 
 class RetryHandler:
@@ -15,24 +15,28 @@ class RetryHandler:
         self.db_manager = db_manager
         self.call_manager = call_manager
         self.logger = logging.getLogger(__name__)
-        self.scheduler = BackgroundScheduler()
-        self.scheduler.start()
+        self.dispatcher = RetryDispatcher(db_manager, self._dispatch_retries)
         self.retry_statuses = {'failed': config.retry.retry_on_failed,
             'no-answer': config.retry.retry_on_no_answer, 'busy': config.
             retry.retry_on_busy}
+        self.planner = RetryPlanner()
+        call_manager.on_failure = self.schedule_retry
+
+    def start(self):
+        self.dispatcher.start()
 
     def should_retry_call(self, call: Call) ->bool:
         if call.retry_count >= config.retry.max_attempts:
-            self.logger.info(
+            self.logger.debug(
                 f'Call {call.id} has reached max retry attempts ({config.retry.max_attempts})'
                 )
             return False
         if call.status not in self.retry_statuses:
-            self.logger.info(
+            self.logger.debug(
                 f"Call {call.id} status '{call.status}' is not retry-eligible")
             return False
         if not self.retry_statuses.get(call.status, False):
-            self.logger.info(f"Retry disabled for status '{call.status}'")
+            self.logger.debug(f"Retry disabled for status '{call.status}'")
             return False
         return True
 
@@ -45,12 +49,9 @@ class RetryHandler:
             if not self.should_retry_call(call):
                 return {'success': False, 'message':
                     'Call is not eligible for retry'}
-            delay = delay_minutes or config.retry.retry_delay_minutes
-            retry_time = datetime.now() + timedelta(minutes=delay)
-            job_id = f'retry_call_{call_id}_{call.retry_count + 1}'
-            self.scheduler.add_job(func=self._execute_retry, trigger=
-                DateTrigger(run_date=retry_time), args=[call_id], id=job_id,
-                replace_existing=True)
+            retry_time = self.planner.plan(call.status, call.retry_count +
+                1, delay_minutes=delay_minutes)
+            self.dispatcher.schedule(call_id, call.retry_count + 1, retry_time)
             retry_attempt = RetryAttempt(call_id=call_id, attempt_number=
                 call.retry_count + 1, status='scheduled', attempted_at=
                 retry_time, failure_reason=f'Retry scheduled for {call.status}'
@@ -60,13 +61,17 @@ class RetryHandler:
                 f'Retry scheduled for call {call_id} at {retry_time}')
             return {'success': True, 'message':
                 f"Retry scheduled for {retry_time.strftime('%Y-%m-%d %H:%M:%S')}"
-                , 'retry_time': retry_time.isoformat(), 'job_id': job_id}
+                , 'retry_time': retry_time.isoformat()}
         except Exception as e:
             self.logger.error(
                 f'Error scheduling retry for call {call_id}: {str(e)}')
             return {'success': False, 'message':
                 f'Error scheduling retry: {str(e)}'}
 
+    def _dispatch_retries(self, batch: List[Tuple[int, int]]):
+        for call_id, _ in batch:
+            self._execute_retry(call_id)
+
     def _execute_retry(self, call_id: int):
         try:
             self.logger.info(f'Executing retry for call {call_id}')
@@ -79,55 +84,90 @@ class RetryHandler:
                 self.logger.error(
                     f'Contact {call.contact_id} not found for retry')
                 return
-            call.retry_count += 1
-            self.db_manager.update_call(call)
-            result = self.call_manager.make_call(contact)
-            retry_attempt = RetryAttempt(call_id=call_id, attempt_number=
+            call.retry_count = self.db_manager.increment_retry_count(call_id)
+            future = self.call_manager.enqueue_call(contact, priority=config
+                .dialer.retry_priority, campaign_id=call.campaign_id,
+                script_id=call.script_id)
+            future.add_done_callback(lambda done: self._record_retry_result(
+                call, done))
+        except Exception as e:
+            self.logger.error(
+                f'Error executing retry for call {call_id}: {str(e)}')
+
+    def _record_retry_result(self, call: Call, future: Future):
+        try:
+            if future.cancelled():
+                return
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {'success': False, 'message': f'Error: {str(e)}'}
+            retry_attempt = RetryAttempt(call_id=call.id, attempt_number=
                 call.retry_count, status='completed' if result['success'] else
                 'failed', attempted_at=datetime.now(), failure_reason=
                 result.get('message', '') if not result['success'] else None)
             self.db_manager.add_retry_attempt(retry_attempt)
             if result['success']:
-                self.logger.info(f'Retry successful for call {call_id}')
+                self.logger.info(f'Retry successful for call {call.id}')
             else:
                 self.logger.warning(
-                    f"Retry failed for call {call_id}: {result['message']}")
+                    f"Retry failed for call {call.id}: {result['message']}")
                 if self.should_retry_call(call):
-                    self.schedule_retry(call_id)
+                    self.schedule_retry(call.id)
         except Exception as e:
             self.logger.error(
-                f'Error executing retry for call {call_id}: {str(e)}')
+                f'Error recording retry result for call {call.id}: {str(e)}')
 
-    def retry_failed_calls(self, status_filter: List[str]=None) ->Dict[str, Any
-        ]:
+    def retry_failed_calls(self, status_filter: List[str]=None, dry_run:
+        bool=False) ->Dict[str, Any]:
         try:
-            if status_filter:
-                failed_calls = []
-                for status in status_filter:
-                    failed_calls.extend(self.db_manager.get_calls_by_status
-                        (status))
-            else:
-                failed_calls = []
-                for status in self.retry_statuses.keys():
-                    if self.retry_statuses[status]:
-                        failed_calls.extend(self.db_manager.
-                            get_calls_by_status(status))
-            eligible_calls = [call for call in failed_calls if self.
-                should_retry_call(call)]
+            statuses = status_filter or list(self.retry_statuses.keys())
+            statuses = [status for status in statuses if self.
+                retry_statuses.get(status, False)]
+            candidates = self.db_manager.get_retry_candidates(statuses,
+                config.retry.max_attempts)
+            already_scheduled = [row for row in candidates if row['scheduled']]
+            eligible_calls = [row for row in candidates if not row['scheduled']
+                ]
+            status_counts = {}
+            for row in eligible_calls:
+                status_counts[row['status']] = status_counts.get(row[
+                    'status'], 0) + 1
+            if dry_run:
+                return {'success': True, 'message':
+                    f'{len(eligible_calls)} calls eligible for retry',
+                    'dry_run': True, 'retries_scheduled': 0,
+                    'eligible_calls': len(eligible_calls),
+                    'already_scheduled': len(already_scheduled),
+                    'status_counts': status_counts}
             if not eligible_calls:
                 return {'success': True, 'message':
-                    'No calls eligible for retry', 'retries_scheduled': 0}
-            scheduled_count = 0
-            for call in eligible_calls:
-                result = self.schedule_retry(call.id)
-                if result['success']:
-                    scheduled_count += 1
+                    'No calls eligible for retry', 'retries_scheduled': 0,
+                    'already_scheduled': len(already_scheduled)}
+            now = datetime.now()
+            planned = sorted((self.planner.plan(row['status'], row[
+                'retry_count'] + 1, now=now), row['id'], row['retry_count'] +
+                1) for row in eligible_calls)
+            retry_attempts = [RetryAttempt(call_id=row['id'],
+                attempt_number=row['retry_count'] + 1, status='scheduled',
+                failure_reason=f"Retry scheduled for {row['status']}") for
+                row in eligible_calls]
+            self.db_manager.bulk_add_retry_attempts(retry_attempts)
+            self.dispatcher.schedule_many([(call_id, attempt_number,
+                retry_time) for retry_time, call_id, attempt_number in planned]
+                )
+            scheduled_count = len(eligible_calls)
+            first_retry, last_retry = planned[0][0], planned[-1][0]
             self.logger.info(
-                f'Scheduled {scheduled_count} retries out of {len(eligible_calls)} eligible calls'
+                f'Scheduled {scheduled_count} retries between {first_retry} and {last_retry} ({len(already_scheduled)} already scheduled)'
                 )
             return {'success': True, 'message':
                 f'Scheduled {scheduled_count} retries', 'retries_scheduled':
-                scheduled_count, 'eligible_calls': len(eligible_calls)}
+                scheduled_count, 'eligible_calls': scheduled_count,
+                'already_scheduled': len(already_scheduled),
+                'status_counts': status_counts, 'first_retry_time':
+                first_retry.isoformat(), 'last_retry_time': last_retry.
+                isoformat()}
         except Exception as e:
             self.logger.error(f'Error retrying failed calls: {str(e)}')
             return {'success': False, 'message':
@@ -139,31 +179,34 @@ class RetryHandler:
             call = self.db_manager.get_call(call_id)
             if not call:
                 return {'success': False, 'message': 'Call not found'}
-            job_id = f'retry_call_{call_id}_{call.retry_count + 1}'
-            try:
-                self.scheduler.remove_job(job_id)
-                self.logger.info(f'Canceled retry for call {call_id}')
-                return {'success': True, 'message':
-                    'Retry canceled successfully'}
-            except Exception:
+            if not self.dispatcher.cancel(call_id):
                 return {'success': False, 'message':
                     'No scheduled retry found for this call'}
+            self.logger.info(f'Canceled retry for call {call_id}')
+            return {'success': True, 'message': 'Retry canceled successfully'}
         except Exception as e:
             self.logger.error(f'Error canceling retry: {str(e)}')
             return {'success': False, 'message':
                 f'Error canceling retry: {str(e)}'}
 
+    def cancel_retries(self, call_ids: List[int]) ->Dict[str, Any]:
+        try:
+            canceled = self.dispatcher.cancel_many(call_ids)
+            self.logger.info(f'Canceled {canceled} scheduled retries')
+            return {'success': True, 'message':
+                f'Canceled {canceled} scheduled retries', 'retries_canceled':
+                canceled}
+        except Exception as e:
+            self.logger.error(f'Error canceling retries: {str(e)}')
+            return {'success': False, 'message':
+                f'Error canceling retries: {str(e)}', 'retries_canceled': 0}
+
     def get_retry_status(self, call_id: int) ->Dict[str, Any]:
         try:
             call = self.db_manager.get_call(call_id)
             if not call:
                 return {'call_found': False, 'message': 'Call not found'}
-            job_id = f'retry_call_{call_id}_{call.retry_count + 1}'
-            scheduled_job = None
-            try:
-                scheduled_job = self.scheduler.get_job(job_id)
-            except Exception:
-                pass
+            next_retry_time = self.dispatcher.get(call_id)
             conn = self.db_manager.get_connection()
             cursor = conn.cursor()
             cursor.execute(
@@ -184,9 +227,9 @@ class RetryHandler:
             return {'call_found': True, 'call_id': call_id,
                 'current_retry_count': call.retry_count, 'max_retries':
                 config.retry.max_attempts, 'is_retry_eligible': self.
-                should_retry_call(call), 'retry_scheduled': scheduled_job
-                 is not None, 'next_retry_time': scheduled_job.
-                next_run_time.isoformat() if scheduled_job else None,
+                should_retry_call(call), 'retry_scheduled': next_retry_time
+                 is not None, 'next_retry_time': next_retry_time.isoformat() if
+                next_retry_time else None,
                 'retry_attempts': retry_attempts}
         except Exception as e:
             self.logger.error(f'Error getting retry status: {str(e)}')
@@ -217,28 +260,37 @@ class RetryHandler:
             """
                 , (config.retry.max_attempts,))
             eligible = cursor.fetchone()
-            scheduled_jobs = len([job for job in self.scheduler.get_jobs() if
-                job.id.startswith('retry_call_')])
+            scheduled_jobs = self.dispatcher.count()
             conn.close()
-            return {'total_retries': stats['total_retries'],
-                'successful_retries': stats['successful_retries'],
-                'failed_retries': stats['failed_retries'],
-                'scheduled_retries': stats['scheduled_retries'],
+            archived = self.db_manager.get_archived_stats('retry_attempts')
+            return {'total_retries': stats['total_retries'] + sum(rows for
+                rows, _, _ in archived.values()), 'successful_retries': 
+                stats['successful_retries'] + archived.get('completed', (0,))
+                [0], 'failed_retries': stats['failed_retries'] + archived.
+                get('failed', (0,))[0], 'scheduled_retries': stats[
+                'scheduled_retries'] + archived.get('scheduled', (0,))[0],
                 'eligible_for_retry': eligible['eligible_calls'],
-                'currently_scheduled': scheduled_jobs, 'retry_config': {
-                'max_attempts': config.retry.max_attempts, 'delay_minutes':
-                config.retry.retry_delay_minutes, 'retry_on_busy': config.
-                retry.retry_on_busy, 'retry_on_no_answer': config.retry.
-                retry_on_no_answer, 'retry_on_failed': config.retry.
-                retry_on_failed}}
+                'currently_scheduled': scheduled_jobs, 'retry_config': self.
+                _retry_config_dict()}
         except Exception as e:
             self.logger.error(f'Error getting retry summary: {str(e)}')
             return {'error': f'Error getting retry summary: {str(e)}'}
 
     def update_retry_config(self, max_attempts: int=None, delay_minutes:
         int=None, retry_on_busy: bool=None, retry_on_no_answer: bool=None,
-        retry_on_failed: bool=None) ->Dict[str, Any]:
+        retry_on_failed: bool=None, max_retries_per_minute: int=None,
+        quiet_hours_start: int=None, quiet_hours_end: int=None, policies:
+        Dict[str, Dict[str, Any]]=None) ->Dict[str, Any]:
         try:
+            if max_retries_per_minute is not None:
+                config.retry.max_retries_per_minute = max_retries_per_minute
+            if quiet_hours_start is not None:
+                config.retry.quiet_hours_start = quiet_hours_start
+            if quiet_hours_end is not None:
+                config.retry.quiet_hours_end = quiet_hours_end
+            for status, values in (policies or {}).items():
+                config.retry.policies[status] = replace(self.planner.
+                    get_policy(status), **values)
             if max_attempts is not None:
                 config.retry.max_attempts = max_attempts
             if delay_minutes is not None:
@@ -254,20 +306,27 @@ class RetryHandler:
                 self.retry_statuses['failed'] = retry_on_failed
             self.logger.info('Retry configuration updated')
             return {'success': True, 'message':
-                'Retry configuration updated successfully', 'config': {
-                'max_attempts': config.retry.max_attempts, 'delay_minutes':
-                config.retry.retry_delay_minutes, 'retry_on_busy': config.
-                retry.retry_on_busy, 'retry_on_no_answer': config.retry.
-                retry_on_no_answer, 'retry_on_failed': config.retry.
-                retry_on_failed}}
+                'Retry configuration updated successfully', 'config': self.
+                _retry_config_dict()}
         except Exception as e:
             self.logger.error(f'Error updating retry configuration: {str(e)}')
             return {'success': False, 'message':
                 f'Error updating retry configuration: {str(e)}'}
 
+    def _retry_config_dict(self) ->Dict[str, Any]:
+        return {'max_attempts': config.retry.max_attempts, 'delay_minutes':
+            config.retry.retry_delay_minutes, 'retry_on_busy': config.retry
+            .retry_on_busy, 'retry_on_no_answer': config.retry.
+            retry_on_no_answer, 'retry_on_failed': config.retry.
+            retry_on_failed, 'max_retries_per_minute': config.retry.
+            max_retries_per_minute, 'quiet_hours_start': config.retry.
+            quiet_hours_start, 'quiet_hours_end': config.retry.
+            quiet_hours_end, 'policies': {status: asdict(policy) for status,
+            policy in config.retry.policies.items()}}
+
     def shutdown(self):
         try:
-            self.scheduler.shutdown()
+            self.dispatcher.stop()
             self.logger.info('Retry handler shutdown completed')
         except Exception as e:
             self.logger.error(f'Error shutting down retry handler: {str(e)}')
@@ -0,0 +1,91 @@
+import logging
+import random
+import threading
+from datetime import datetime, timedelta
+from typing import Optional
+from config import config, RetryPolicy
+SLOT_PRUNE_THRESHOLD = 10000
+
+
+class RetryPlanner:
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self.slot_counts = {}
+        self.next_slot = {}
+        self._lock = threading.Lock()
+
+    def get_policy(self, status: str) ->RetryPolicy:
+        return config.retry.policies.get(status) or RetryPolicy()
+
+    def compute_delay(self, status: str, attempt_number: int) ->timedelta:
+        policy = self.get_policy(status)
+        base_delay = (policy.base_delay_minutes if policy.
+            base_delay_minutes is not None else config.retry.
+            retry_delay_minutes)
+        delay = min(base_delay * policy.backoff_factor ** max(
+            attempt_number - 1, 0), policy.max_delay_minutes)
+        if policy.jitter_ratio:
+            delay += delay * random.uniform(-policy.jitter_ratio, policy.
+                jitter_ratio)
+        return timedelta(minutes=max(delay, 0))
+
+    def in_quiet_hours(self, when: datetime) ->bool:
+        start = config.retry.quiet_hours_start
+        end = config.retry.quiet_hours_end
+        if start is None or end is None or start == end:
+            return False
+        if start < end:
+            return start <= when.hour < end
+        return when.hour >= start or when.hour < end
+
+    def defer_quiet_hours(self, when: datetime) ->datetime:
+        if not self.in_quiet_hours(when):
+            return when
+        resume = when.replace(hour=config.retry.quiet_hours_end, minute=0,
+            second=0, microsecond=0)
+        if resume <= when:
+            resume += timedelta(days=1)
+        return resume
+
+    def plan(self, status: str, attempt_number: int, now: datetime=None,
+        delay_minutes: Optional[float]=None) ->datetime:
+        now = now or datetime.now()
+        if delay_minutes is not None:
+            target = now + timedelta(minutes=delay_minutes)
+        else:
+            target = now + self.compute_delay(status, attempt_number)
+        return self.reserve_slot(self.defer_quiet_hours(target), now)
+
+    def reserve_slot(self, when: datetime, now: datetime=None) ->datetime:
+        limit = config.retry.max_retries_per_minute
+        if not limit or limit <= 0:
+            return when
+        with self._lock:
+            if len(self.slot_counts) > SLOT_PRUNE_THRESHOLD:
+                self._prune(now or datetime.now())
+            slot = self._find_slot(when.replace(second=0, microsecond=0))
+            while self.in_quiet_hours(slot):
+                slot = self._find_slot(self.defer_quiet_hours(slot))
+            count = self.slot_counts.get(slot, 0)
+            self.slot_counts[slot] = count + 1
+            if count + 1 >= limit:
+                self.next_slot[slot] = slot + timedelta(minutes=1)
+        scheduled = slot + timedelta(seconds=count * 60 / limit)
+        return max(scheduled, when)
+
+    def _find_slot(self, slot: datetime) ->datetime:
+        path = []
+        while slot in self.next_slot:
+            path.append(slot)
+            slot = self.next_slot[slot]
+        for visited in path:
+            self.next_slot[visited] = slot
+        return slot
+
+    def _prune(self, now: datetime):
+        cutoff = now.replace(second=0, microsecond=0)
+        self.slot_counts = {slot: count for slot, count in self.
+            slot_counts.items() if slot >= cutoff}
+        self.next_slot = {slot: nxt for slot, nxt in self.next_slot.items(
+            ) if slot >= cutoff}
@@ -0,0 +1,216 @@
+import itertools
+import re
+import sqlite3
+import threading
+from datetime import date, datetime
+from typing import Any, Iterable, Optional, Sequence, Set
+from urllib.parse import urlparse
+SQLITE_SCHEME = 'sqlite'
+POSTGRES_SCHEMES = {'postgres', 'postgresql'}
+POOL_SIZE = 10
+STREAM_ITERSIZE = 1000
+_stream_names = itertools.count(1)
+
+
+def require_psycopg2():
+    try:
+        import psycopg2
+        import psycopg2.extras
+        import psycopg2.pool
+        return psycopg2
+    except ImportError:
+        raise RuntimeError(
+            'PostgreSQL storage requires psycopg2. Install it with: pip install psycopg2-binary'
+            )
+
+
+def open_backend(database: str, pool_size: int=POOL_SIZE):
+    """Return the storage backend for a ``sqlite:///path`` or ``postgresql://`` URL.
+    Anything without a scheme is treated as a SQLite file path."""
+    if '://' not in database:
+        return SQLiteBackend(database)
+    scheme = urlparse(database).scheme.split('+')[0]
+    if scheme == SQLITE_SCHEME:
+        return SQLiteBackend(database[len('sqlite:///'):])
+    if scheme in POSTGRES_SCHEMES:
+        return PostgresBackend(database, pool_size)
+    raise ValueError(
+        f'Unsupported database URL scheme: {scheme}. Use sqlite:/// or postgresql://.'
+        )
+
+
+class SQLiteBackend:
+    name = 'sqlite'
+
+    def __init__(self, path: str):
+        self.path = path
+        self.IntegrityError = sqlite3.IntegrityError
+
+    def connect(self, raw: bool=False) ->sqlite3.Connection:
+        conn = sqlite3.connect(self.path)
+        if not raw:
+            conn.row_factory = sqlite3.Row
+        return conn
+
+    def ddl(self, sql: str) ->str:
+        return sql
+
+    def column_names(self, cursor, table: str) ->Set[str]:
+        cursor.execute(f'PRAGMA table_info({table})')
+        return {row[1] for row in cursor.fetchall()}
+
+    def stream_cursor(self, conn: sqlite3.Connection, itersize: int):
+        return conn.cursor()
+
+
+class PostgresBackend:
+    """psycopg2 connection pool exposing the slice of the sqlite3 API the repo uses:
+    ``?`` placeholders, name-or-index rows, and ``with conn`` transactions."""
+    name = 'postgresql'
+
+    def __init__(self, url: str, pool_size: int=POOL_SIZE):
+        psycopg2 = require_psycopg2()
+        self.url = url
+        self.pool_size = max(pool_size, 1)
+        self.pool = psycopg2.pool.ThreadedConnectionPool(1, self.pool_size,
+            url)
+        self.IntegrityError = psycopg2.IntegrityError
+        self._slots = threading.BoundedSemaphore(self.pool_size)
+
+    def connect(self, raw: bool=False) ->'PostgresConnection':
+        self._slots.acquire()
+        try:
+            return PostgresConnection(self, self.pool.getconn(), raw)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, conn):
+        try:
+            if not conn.closed:
+                conn.rollback()
+            self.pool.putconn(conn, close=bool(conn.closed))
+        finally:
+            self._slots.release()
+
+    def ddl(self, sql: str) ->str:
+        sql = sql.replace('INTEGER PRIMARY KEY AUTOINCREMENT',
+            'BIGSERIAL PRIMARY KEY')
+        sql = sql.replace('TIMESTAMP DEFAULT CURRENT_TIMESTAMP',
+            "TEXT DEFAULT to_char(now() AT TIME ZONE 'UTC', 'YYYY-MM-DD HH24:MI:SS')"
+            )
+        sql = re.sub('\\bREAL\\b', 'DOUBLE PRECISION', sql)
+        return re.sub('\\bTIMESTAMP\\b', 'TEXT', sql)
+
+    def column_names(self, cursor, table: str) ->Set[str]:
+        cursor.execute(
+            'SELECT column_name FROM information_schema.columns WHERE table_schema = current_schema() AND table_name = ?'
+            , (table,))
+        return {row[0] for row in cursor.fetchall()}
+
+    def stream_cursor(self, conn: 'PostgresConnection', itersize: int):
+        return conn.cursor(name=f'stream_{next(_stream_names)}', itersize=
+            itersize)
+
+
+def _translate(sql: str) ->str:
+    """Rewrite ``?`` placeholders outside string literals to ``%s`` and escape ``%``."""
+    parts = sql.split("'")
+    for index in range(0, len(parts), 2):
+        parts[index] = parts[index].replace('%', '%%').replace('?', '%s')
+    for index in range(1, len(parts), 2):
+        parts[index] = parts[index].replace('%', '%%')
+    return "'".join(parts)
+
+
+def _adapt(params: Optional[Iterable[Any]]) ->Optional[tuple]:
+    """Bind datetimes as the same ISO text sqlite3 stores, so timestamp columns compare alike."""
+    if not params:
+        return None
+    return tuple(value.isoformat(' ') if isinstance(value, datetime) else
+        value.isoformat() if isinstance(value, date) else value for value in
+        params)
+
+
+class PostgresCursor:
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, sql: str, params: Sequence[Any]=()):
+        params = _adapt(params)
+        self._cursor.execute(_translate(sql) if params else sql, params)
+        return self
+
+    def executemany(self, sql: str, seq_of_params: Iterable[Sequence[Any]]):
+        self._cursor.executemany(_translate(sql), [_adapt(params) for
+            params in seq_of_params])
+        return self
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size: int=None):
+        return self._cursor.fetchmany(size or self._cursor.arraysize)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self) ->int:
+        return self._cursor.rowcount
+
+    def close(self):
+        self._cursor.close()
+
+
+class PostgresConnection:
+
+    def __init__(self, backend: PostgresBackend, conn, raw: bool):
+        self.backend = backend
+        self._conn = conn
+        self.raw = raw
+
+    def cursor(self, name: str=None, itersize: int=STREAM_ITERSIZE
+        ) ->PostgresCursor:
+        import psycopg2.extras
+        cursor = self._conn.cursor(name=name, cursor_factory=None if self.
+            raw else psycopg2.extras.DictCursor)
+        if name:
+            cursor.itersize = itersize
+        return PostgresCursor(cursor)
+
+    def execute(self, sql: str, params: Sequence[Any]=()) ->PostgresCursor:
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql: str, seq_of_params: Iterable[Sequence[Any]]
+        ) ->PostgresCursor:
+        return self.cursor().executemany(sql, seq_of_params)
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self.backend.release(conn)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+        return False
@@ -1,11 +1,20 @@
-import requests
+import csv
+from datetime import datetime, timedelta, timezone
+import io
 import logging
-from typing import List, Dict, Optional, Any
+from typing import Any, Callable, Dict, Iterator, List, Optional
 from models import Call, Transcript, DatabaseManager
-from config import config
-from twilio.rest import Client
+from metrics import TRANSCRIPTION_SECONDS
+from provider import get_api_base_url, provider
 import time
 import json
+EXPORT_BATCH_SIZE = 1000
+EXPORT_FORMATS = {'json': 'application/json', 'jsonl':
+    'application/x-ndjson', 'csv': 'text/csv'}
+EXPORT_COLUMNS = ['transcript_id', 'call_id', 'transcript_text',
+    'confidence_score', 'created_at', 'call_sid', 'phone_number',
+    'contact_name', 'call_duration', 'call_status', 'start_time']
+CALL_INFO_COLUMNS = EXPORT_COLUMNS[5:] + ['recording_url']
 
 
 class TranscriptProcessor:
@@ -13,16 +22,10 @@ class TranscriptProcessor:
     def __init__(self, db_manager: DatabaseManager):
         self.db_manager = db_manager
         self.logger = logging.getLogger(__name__)
-        self.twilio_client = None
-        self._init_twilio_client()
 
-    def _init_twilio_client(self):
-        try:
-            if config.twilio.account_sid and config.twilio.auth_token:
-                self.twilio_client = Client(config.twilio.account_sid,
-                    config.twilio.auth_token)
-        except Exception as e:
-            self.logger.error(f'Failed to initialize Twilio client: {str(e)}')
+    @property
+    def twilio_client(self):
+        return provider.client
 
     def process_call_recording(self, call_id: int, recording_sid: str=None,
         recording_url: str=None) ->Dict[str, Any]:
@@ -35,7 +38,7 @@ class TranscriptProcessor:
                     recording = self.twilio_client.recordings(recording_sid
                         ).fetch()
                     recording_url = (
-                        f"https://api.twilio.com{recording.uri.replace('.json', '.mp3')}"
+                        f"{get_api_base_url()}{recording.uri.replace('.json', '.mp3')}"
                         )
                 except Exception as e:
                     self.logger.error(f'Error fetching recording: {str(e)}')
@@ -44,16 +47,24 @@ class TranscriptProcessor:
             if not recording_url:
                 return {'success': False, 'message':
                     'No recording URL available'}
+            if (call.recording_url == recording_url and self.db_manager.
+                get_transcript_by_call_id(call_id)):
+                return {'success': True, 'message':
+                    'Recording already processed', 'recording_url':
+                    recording_url}
             call.recording_url = recording_url
-            self.db_manager.update_call(call)
+            self.db_manager.set_call_recording_url(call_id, recording_url)
+            started = time.perf_counter()
             transcript_result = self._transcribe_recording(recording_url,
                 call_id)
+            TRANSCRIPTION_SECONDS.observe(time.perf_counter() - started,
+                'success' if transcript_result['success'] else 'failed')
             if transcript_result['success']:
                 transcript = Transcript(call_id=call_id, transcript_text=
                     transcript_result['transcript'], confidence_score=
                     transcript_result.get('confidence', None))
                 transcript_id = self.db_manager.add_transcript(transcript)
-                self.logger.info(f'Transcript processed for call {call_id}')
+                self.logger.debug(f'Transcript processed for call {call_id}')
                 return {'success': True, 'message':
                     'Recording and transcript processed successfully',
                     'transcript_id': transcript_id, 'transcript':
@@ -75,8 +86,7 @@ class TranscriptProcessor:
             if not self.twilio_client:
                 return {'success': False, 'message':
                     'Twilio client not available'}
-            auth = config.twilio.account_sid, config.twilio.auth_token
-            response = requests.get(recording_url, auth=auth)
+            response = provider.download(recording_url)
             if response.status_code != 200:
                 return {'success': False, 'message':
                     f'Failed to download recording: {response.status_code}'}
@@ -128,9 +138,9 @@ class TranscriptProcessor:
             return None
 
     def get_all_transcripts(self, limit: int=100) ->List[Dict[str, Any]]:
+        """Newest transcripts first, archive months included; ordered by call
+        start time so months that cannot reach the ``limit`` are skipped."""
         try:
-            conn = self.db_manager.get_connection()
-            cursor = conn.cursor()
             query = """
                 SELECT 
                     t.id as transcript_id,
@@ -145,16 +155,15 @@ class TranscriptProcessor:
                     c.recording_url,
                     ct.phone_number,
                     ct.name as contact_name
-                FROM transcripts t
-                JOIN calls c ON t.call_id = c.id
+                FROM {schema}transcripts t
+                JOIN {schema}calls c ON t.call_id = c.id
                 JOIN contacts ct ON c.contact_id = ct.id
-                ORDER BY t.created_at DESC
+                ORDER BY c.start_time DESC, t.id DESC
             """
             if limit:
-                query += f' LIMIT {limit}'
-            cursor.execute(query)
-            rows = cursor.fetchall()
-            conn.close()
+                query += f' LIMIT {int(limit)}'
+            rows = self.db_manager.query_partitions(query, [], 'start_time',
+                limit)
             transcripts = []
             for row in rows:
                 transcripts.append({'transcript_id': row['transcript_id'],
@@ -172,12 +181,19 @@ class TranscriptProcessor:
             self.logger.error(f'Error getting all transcripts: {str(e)}')
             return []
 
-    def search_transcripts(self, search_term: str, limit: int=50) ->List[Dict
-        [str, Any]]:
+    def search_transcripts(self, search_term: str, limit: int=50,
+        started_after: datetime=None, started_before: datetime=None) ->List[
+        Dict[str, Any]]:
         try:
-            conn = self.db_manager.get_connection()
-            cursor = conn.cursor()
-            query = """
+            conditions = ['t.transcript_text LIKE ?']
+            params = [f'%{search_term}%']
+            if started_after:
+                conditions.append('c.start_time >= ?')
+                params.append(started_after)
+            if started_before:
+                conditions.append('c.start_time < ?')
+                params.append(started_before)
+            query = f"""
                 SELECT 
                     t.id as transcript_id,
                     t.call_id,
@@ -190,17 +206,16 @@ class TranscriptProcessor:
                     c.start_time,
                     ct.phone_number,
                     ct.name as contact_name
-                FROM transcripts t
-                JOIN calls c ON t.call_id = c.id
+                FROM {{schema}}transcripts t
+                JOIN {{schema}}calls c ON t.call_id = c.id
                 JOIN contacts ct ON c.contact_id = ct.id
-                WHERE t.transcript_text LIKE ?
-                ORDER BY t.created_at DESC
+                WHERE {' AND '.join(conditions)}
+                ORDER BY c.start_time DESC, t.id DESC
             """
             if limit:
-                query += f' LIMIT {limit}'
-            cursor.execute(query, (f'%{search_term}%',))
-            rows = cursor.fetchall()
-            conn.close()
+                query += f' LIMIT {int(limit)}'
+            rows = self.db_manager.query_partitions(query, params,
+                'start_time', limit, started_after, started_before)
             results = []
             for row in rows:
                 results.append({'transcript_id': row['transcript_id'],
@@ -217,63 +232,144 @@ class TranscriptProcessor:
             self.logger.error(f'Error searching transcripts: {str(e)}')
             return []
 
+    def iter_transcripts(self, batch_size: int=EXPORT_BATCH_SIZE
+        ) ->Iterator[Dict[str, Any]]:
+        """Transcripts with their call and contact, archive months (oldest first)
+        included."""
+        for rows in self.db_manager.iter_partition_batches("""
+            SELECT 
+                t.id as transcript_id,
+                t.call_id,
+                t.transcript_text,
+                t.confidence_score,
+                t.created_at as transcript_created_at,
+                c.call_sid,
+                c.status as call_status,
+                c.duration,
+                c.start_time,
+                c.recording_url,
+                ct.phone_number,
+                ct.name as contact_name
+            FROM {schema}transcripts t
+            JOIN {schema}calls c ON t.call_id = c.id
+            JOIN contacts ct ON c.contact_id = ct.id
+            ORDER BY t.id
+        """, batch_size=batch_size):
+            for row in rows:
+                yield {'transcript_id': row['transcript_id'], 'call_id':
+                    row['call_id'], 'transcript_text': row[
+                    'transcript_text'], 'confidence_score': row[
+                    'confidence_score'], 'created_at': row[
+                    'transcript_created_at'], 'call_sid': row['call_sid'],
+                    'phone_number': row['phone_number'], 'contact_name':
+                    row['contact_name'], 'call_duration': row['duration'],
+                    'call_status': row['call_status'], 'start_time': row[
+                    'start_time'], 'recording_url': row['recording_url']}
+
+    def stream_transcripts(self, format: str='json', batch_size: int=
+        EXPORT_BATCH_SIZE, progress: Callable[[int], None]=None) ->Iterator[
+        str]:
+        format = format.lower()
+        if format not in EXPORT_FORMATS:
+            raise ValueError(
+                f"Unsupported format. Use one of: {', '.join(EXPORT_FORMATS)}."
+                )
+        rows = self.iter_transcripts(batch_size)
+        if format == 'csv':
+            buffer = io.StringIO()
+            writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS,
+                extrasaction='ignore')
+            writer.writeheader()
+            count = 0
+            for count, row in enumerate(rows, 1):
+                writer.writerow(row)
+                if count % batch_size == 0:
+                    if progress:
+                        progress(count)
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+            if progress:
+                progress(count)
+            yield buffer.getvalue()
+            return
+        separator = '[\n' if format == 'json' else ''
+        chunk = []
+        count = 0
+        for count, row in enumerate(rows, 1):
+            record = {'transcript_id': row['transcript_id'], 'call_id': row
+                ['call_id'], 'transcript_text': row['transcript_text'],
+                'confidence_score': row['confidence_score'], 'created_at':
+                row['created_at'], 'call_info': {key: row[key] for key in
+                CALL_INFO_COLUMNS}}
+            if format == 'json':
+                chunk.append(separator + json.dumps(record, ensure_ascii=False))
+                separator = ',\n'
+            else:
+                chunk.append(json.dumps(record, ensure_ascii=False) + '\n')
+            if len(chunk) >= batch_size:
+                if progress:
+                    progress(count)
+                yield ''.join(chunk)
+                chunk = []
+        if progress:
+            progress(count)
+        if format == 'json':
+            chunk.append('[]\n' if separator == '[\n' else '\n]\n')
+        yield ''.join(chunk)
+
     def export_transcripts_to_file(self, file_path: str, format: str='json'
         ) ->Dict[str, Any]:
         try:
-            transcripts = self.get_all_transcripts()
-            if format.lower() == 'json':
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    json.dump(transcripts, f, indent=2, ensure_ascii=False)
-            elif format.lower() == 'csv':
-                import pandas as pd
-                flattened_data = []
-                for t in transcripts:
-                    row = {'transcript_id': t['transcript_id'], 'call_id':
-                        t['call_id'], 'transcript_text': t[
-                        'transcript_text'], 'confidence_score': t[
-                        'confidence_score'], 'created_at': t['created_at'],
-                        'call_sid': t['call_info']['call_sid'],
-                        'phone_number': t['call_info']['phone_number'],
-                        'contact_name': t['call_info']['contact_name'],
-                        'call_duration': t['call_info']['call_duration'],
-                        'call_status': t['call_info']['call_status'],
-                        'start_time': t['call_info']['start_time']}
-                    flattened_data.append(row)
-                df = pd.DataFrame(flattened_data)
-                df.to_csv(file_path, index=False)
-            else:
-                return {'success': False, 'message':
-                    'Unsupported format. Use "json" or "csv".'}
-            self.logger.info(
-                f'Exported {len(transcripts)} transcripts to {file_path}')
+            exported = 0
+
+            def track(count):
+                nonlocal exported
+                exported = count
+            with open(file_path, 'w', encoding='utf-8', newline='') as f:
+                for chunk in self.stream_transcripts(format, progress=track):
+                    f.write(chunk)
+            self.logger.info(f'Exported {exported} transcripts to {file_path}')
             return {'success': True, 'message':
-                f'Exported {len(transcripts)} transcripts to {file_path}',
-                'transcripts_exported': len(transcripts), 'file_path':
-                file_path}
+                f'Exported {exported} transcripts to {file_path}',
+                'transcripts_exported': exported, 'file_path': file_path}
+        except ValueError as e:
+            return {'success': False, 'message': str(e)}
         except Exception as e:
             self.logger.error(f'Error exporting transcripts: {str(e)}')
             return {'success': False, 'message':
                 f'Error exporting transcripts: {str(e)}'}
 
     def get_transcript_summary(self) ->Dict[str, Any]:
+        """Totals including archived months, plus the last seven days' counts by the
+        UTC date of ``created_at`` (stored as UTC text by both backends)."""
         try:
             conn = self.db_manager.get_connection()
             cursor = conn.cursor()
-            cursor.execute('SELECT COUNT(*) as count FROM transcripts')
-            total_transcripts = cursor.fetchone()['count']
             cursor.execute(
-                'SELECT AVG(confidence_score) as avg_confidence FROM transcripts WHERE confidence_score IS NOT NULL'
+                'SELECT COUNT(*) as count, SUM(confidence_score) as confidence_total, COUNT(confidence_score) as confidence_count FROM transcripts'
                 )
-            avg_confidence = cursor.fetchone()['avg_confidence']
+            totals = cursor.fetchone()
+            total_transcripts = totals['count']
+            confidence_total = totals['confidence_total'] or 0
+            confidence_count = totals['confidence_count']
+            for rows, total, count in self.db_manager.get_archived_stats(
+                'transcripts').values():
+                total_transcripts += rows
+                confidence_total += total
+                confidence_count += count
+            avg_confidence = (confidence_total / confidence_count if
+                confidence_count else None)
             cursor.execute(
                 """
-                SELECT DATE(created_at) as date, COUNT(*) as count
+                SELECT SUBSTR(created_at, 1, 10) as day, COUNT(*) as count
                 FROM transcripts 
-                WHERE created_at >= datetime('now', '-7 days')
-                GROUP BY DATE(created_at)
-                ORDER BY date DESC
+                WHERE created_at >= ?
+                GROUP BY SUBSTR(created_at, 1, 10)
+                ORDER BY 1 DESC
             """
-                )
+                , (datetime.now(timezone.utc).replace(tzinfo=None) -
+                timedelta(days=7),))
             daily_counts = dict(cursor.fetchall())
             cursor.execute('SELECT transcript_text FROM transcripts')
             all_transcripts = cursor.fetchall()
@@ -0,0 +1,460 @@
+import argparse
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import requests
+from flask import Flask, Response, jsonify, request
+API_PREFIX = '/2010-04-01/Accounts/<account_sid>'
+RECORDING_BYTES = b'ID3' + bytes(1021)
+
+
+def _default_outcomes() ->Dict[str, float]:
+    return {'completed': 0.6, 'no-answer': 0.15, 'busy': 0.15, 'failed': 0.1}
+
+
+@dataclass
+class SimulatorSettings:
+    api_latency_ms: Tuple[float, float] = (20, 80)
+    api_error_rate: float = 0.0
+    callback_latency_ms: Tuple[float, float] = (50, 250)
+    ring_seconds: Tuple[float, float] = (2, 8)
+    call_duration_seconds: Tuple[float, float] = (5, 40)
+    recording_delay_seconds: Tuple[float, float] = (1, 3)
+    outcomes: Dict[str, float] = field(default_factory=_default_outcomes)
+    fetch_twiml: bool = True
+    time_scale: float = 1.0
+    callback_workers: int = 32
+    seed: Optional[int] = None
+
+
+class CallbackScheduler:
+
+    def __init__(self, workers: int):
+        self.logger = logging.getLogger(__name__)
+        self.heap = []
+        self.executor = ThreadPoolExecutor(max_workers=workers,
+            thread_name_prefix='sim-callback')
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=
+            'sim-scheduler', daemon=True)
+        self._thread.start()
+
+    def schedule(self, delay_seconds: float, func: Callable, *args):
+        with self._cond:
+            heapq.heappush(self.heap, (time.monotonic() + max(
+                delay_seconds, 0), next(self._sequence), func, args))
+            self._cond.notify()
+
+    def pending(self) ->int:
+        with self._cond:
+            return len(self.heap)
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        self._thread.join(timeout=5)
+        self.executor.shutdown(wait=False)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._running:
+                    return
+                now = time.monotonic()
+                if not self.heap or self.heap[0][0] > now:
+                    timeout = self.heap[0][0] - now if self.heap else None
+                    self._cond.wait(timeout=timeout)
+                    continue
+                _, _, func, args = heapq.heappop(self.heap)
+            self.executor.submit(self._invoke, func, args)
+
+    def _invoke(self, func: Callable, args: tuple):
+        try:
+            func(*args)
+        except Exception as e:
+            self.logger.error(f'Simulator callback failed: {str(e)}')
+
+
+class TwilioSimulator:
+
+    def __init__(self, settings: SimulatorSettings=None):
+        self.settings = settings or SimulatorSettings()
+        self.logger = logging.getLogger(__name__)
+        self.random = random.Random(self.settings.seed)
+        self.calls = {}
+        self.recordings = {}
+        self.stats = {'calls_created': 0, 'api_errors': 0,
+            'callbacks_sent': 0, 'callbacks_failed': 0, 'twiml_fetches': 0,
+            'media_downloads': 0}
+        self.callback_latencies = []
+        self.base_url = ''
+        self.scheduler = CallbackScheduler(self.settings.callback_workers)
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=self.settings.
+            callback_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._lock = threading.Lock()
+
+    def _uniform(self, bounds: Tuple[float, float]) ->float:
+        with self._lock:
+            return self.random.uniform(*bounds)
+
+    def _scaled(self, seconds: float) ->float:
+        return seconds * self.settings.time_scale
+
+    def _pick_outcome(self) ->str:
+        with self._lock:
+            roll = self.random.random()
+        total = 0.0
+        for outcome, weight in self.settings.outcomes.items():
+            total += weight
+            if roll < total:
+                return outcome
+        return 'completed'
+
+    def _count(self, key: str, amount: int=1):
+        with self._lock:
+            self.stats[key] += amount
+
+    def api_delay(self):
+        time.sleep(self._uniform(self.settings.api_latency_ms) / 1000)
+
+    def api_should_fail(self) ->bool:
+        if not self.settings.api_error_rate:
+            return False
+        with self._lock:
+            failed = self.random.random() < self.settings.api_error_rate
+        if failed:
+            self._count('api_errors')
+        return failed
+
+    def create_call(self, account_sid: str, form: Dict[str, Any]) ->Dict[
+        str, Any]:
+        sid = f'CA{uuid.uuid4().hex}'
+        now = datetime.now(timezone.utc)
+        events = form.getlist('StatusCallbackEvent') if hasattr(form,
+            'getlist') else form.get('StatusCallbackEvent', [])
+        call = {'sid': sid, 'account_sid': account_sid, 'to': form.get(
+            'To'), 'from': form.get('From'), 'status': 'queued',
+            'direction': 'outbound-api', 'duration': None, 'price': None,
+            'price_unit': 'USD', 'date_created': format_datetime(now),
+            'date_updated': format_datetime(now), 'start_time': None,
+            'end_time': None, 'uri':
+            f'/2010-04-01/Accounts/{account_sid}/Calls/{sid}.json',
+            'url': form.get('Url'), 'status_callback': form.get(
+            'StatusCallback'), 'status_callback_events': set(events or [
+            'completed']), 'record': str(form.get('Record', 'false')).
+            lower() == 'true', 'recording_status_callback': form.get(
+            'RecordingStatusCallback'), 'sequence': itertools.count(),
+            'outcome': self._pick_outcome()}
+        with self._lock:
+            self.calls[sid] = call
+        self._count('calls_created')
+        self._advance(call, 'initiated', 'initiated')
+        self.scheduler.schedule(self._scaled(0.2), self._ring, sid)
+        return self.public_call(call)
+
+    def public_call(self, call: Dict[str, Any]) ->Dict[str, Any]:
+        return {key: value for key, value in call.items() if key not in (
+            'url', 'status_callback', 'status_callback_events', 'record',
+            'recording_status_callback', 'sequence', 'outcome',
+            'answered_at')}
+
+    def _is_final(self, call: Dict[str, Any]) ->bool:
+        return call['status'] in ('completed', 'busy', 'no-answer',
+            'failed', 'canceled')
+
+    def _advance(self, call: Dict[str, Any], status: str, event: str,
+        extra: Dict[str, Any]=None):
+        call['status'] = status
+        call['date_updated'] = format_datetime(datetime.now(timezone.utc))
+        if event in call['status_callback_events'] and call['status_callback'
+            ]:
+            payload = {'CallSid': call['sid'], 'AccountSid': call[
+                'account_sid'], 'From': call['from'], 'To': call['to'],
+                'CallStatus': status, 'Direction': call['direction'],
+                'ApiVersion': '2010-04-01', 'CallbackSource':
+                'call-progress-events', 'SequenceNumber': str(next(call[
+                'sequence'])), 'Timestamp': call['date_updated']}
+            payload.update(extra or {})
+            self._post_later(call['status_callback'], payload)
+
+    def _post_later(self, url: str, payload: Dict[str, Any]):
+        delay = self._uniform(self.settings.callback_latency_ms) / 1000
+        self.scheduler.schedule(delay, self._post, url, payload)
+
+    def _post(self, url: str, payload: Dict[str, Any]):
+        started = time.perf_counter()
+        try:
+            response = self.session.post(url, data=payload, timeout=10)
+            if response.status_code >= 400:
+                self._count('callbacks_failed')
+            else:
+                self._count('callbacks_sent')
+        except Exception as e:
+            self._count('callbacks_failed')
+            self.logger.warning(f'Callback to {url} failed: {str(e)}')
+        finally:
+            with self._lock:
+                self.callback_latencies.append(time.perf_counter() - started)
+
+    def _ring(self, sid: str):
+        call = self.calls.get(sid)
+        if not call or self._is_final(call):
+            return
+        if call['outcome'] == 'failed':
+            self._finish(call, 'failed')
+            return
+        self._advance(call, 'ringing', 'ringing')
+        ring_seconds = self._uniform(self.settings.ring_seconds)
+        self.scheduler.schedule(self._scaled(ring_seconds), self._answer, sid)
+
+    def _answer(self, sid: str):
+        call = self.calls.get(sid)
+        if not call or self._is_final(call):
+            return
+        if call['outcome'] in ('busy', 'no-answer'):
+            self._finish(call, call['outcome'])
+            return
+        call['start_time'] = format_datetime(datetime.now(timezone.utc))
+        call['answered_at'] = time.monotonic()
+        self._advance(call, 'in-progress', 'answered')
+        if self.settings.fetch_twiml and call['url']:
+            self.scheduler.schedule(0, self._fetch_twiml, call['url'], call)
+        duration = self._uniform(self.settings.call_duration_seconds)
+        self.scheduler.schedule(self._scaled(duration), self._hangup, sid)
+
+    def _fetch_twiml(self, url: str, call: Dict[str, Any]):
+        try:
+            self.session.post(url, data={'CallSid': call['sid'],
+                'AccountSid': call['account_sid'], 'CallStatus':
+                'in-progress'}, timeout=10)
+            self._count('twiml_fetches')
+        except Exception as e:
+            self.logger.warning(f'TwiML fetch from {url} failed: {str(e)}')
+
+    def _hangup(self, sid: str):
+        call = self.calls.get(sid)
+        if not call or self._is_final(call):
+            return
+        self._finish(call, 'completed')
+
+    def _finish(self, call: Dict[str, Any], status: str):
+        duration = 0
+        if call.get('answered_at'):
+            duration = max(int((time.monotonic() - call['answered_at']) /
+                max(self.settings.time_scale, 1e-06)), 1)
+        call['duration'] = str(duration)
+        call['end_time'] = format_datetime(datetime.now(timezone.utc))
+        self._advance(call, status, 'completed', {'CallDuration': str(
+            duration), 'Duration': str(max((duration + 59) // 60, 0))})
+        if status == 'completed' and call['record'] and duration:
+            delay = self._uniform(self.settings.recording_delay_seconds)
+            self.scheduler.schedule(self._scaled(delay), self.
+                _complete_recording, call['sid'])
+
+    def _complete_recording(self, sid: str):
+        call = self.calls[sid]
+        recording_sid = f'RE{uuid.uuid4().hex}'
+        uri = (
+            f"/2010-04-01/Accounts/{call['account_sid']}/Recordings/{recording_sid}.json"
+            )
+        recording = {'sid': recording_sid, 'account_sid': call[
+            'account_sid'], 'call_sid': sid, 'status': 'completed',
+            'duration': call['duration'], 'channels': 1, 'source':
+            'OutboundAPI', 'date_created': format_datetime(datetime.now(
+            timezone.utc)), 'uri': uri}
+        with self._lock:
+            self.recordings[recording_sid] = recording
+        if call['recording_status_callback']:
+            self._post_later(call['recording_status_callback'], {
+                'AccountSid': call['account_sid'], 'CallSid': sid,
+                'RecordingSid': recording_sid, 'RecordingUrl':
+                f"{self.base_url.rstrip('/')}{uri.replace('.json', '')}",
+                'RecordingStatus': 'completed', 'RecordingDuration': call[
+                'duration'], 'RecordingChannels': '1', 'RecordingSource':
+                'OutboundAPI'})
+
+    def update_call(self, sid: str, form: Dict[str, Any]) ->Optional[Dict[
+        str, Any]]:
+        call = self.calls.get(sid)
+        if not call:
+            return None
+        status = form.get('Status')
+        if status in ('canceled', 'completed') and not self._is_final(call):
+            if status == 'canceled' and call['status'] == 'in-progress':
+                status = 'completed'
+            self._finish(call, status)
+        return self.public_call(call)
+
+    def get_stats(self) ->Dict[str, Any]:
+        with self._lock:
+            latencies = sorted(self.callback_latencies)
+            statuses = {}
+            for call in self.calls.values():
+                statuses[call['status']] = statuses.get(call['status'], 0) + 1
+            stats = dict(self.stats)
+        stats['call_statuses'] = statuses
+        stats['pending_events'] = self.scheduler.pending()
+        if latencies:
+            stats['callback_latency_p50_ms'] = latencies[len(latencies) // 2
+                ] * 1000
+            stats['callback_latency_p99_ms'] = latencies[min(int(len(
+                latencies) * 0.99), len(latencies) - 1)] * 1000
+        return stats
+
+    def shutdown(self):
+        self.scheduler.stop()
+
+
+def _twilio_error(status: int, message: str) ->Tuple[Response, int]:
+    return jsonify({'code': 20000 + status, 'message': message,
+        'more_info': 'https://www.twilio.com/docs/errors', 'status': status}
+        ), status
+
+
+def create_simulator_app(simulator: TwilioSimulator=None, base_url: str=None
+    ) ->Flask:
+    simulator = simulator or TwilioSimulator()
+    if base_url:
+        simulator.base_url = base_url
+    sim_app = Flask(__name__)
+    sim_app.config['SIMULATOR'] = simulator
+
+    @sim_app.before_request
+    def simulate_api_latency():
+        if request.path.startswith('/2010-04-01/'):
+            if not simulator.base_url:
+                simulator.base_url = request.host_url
+            simulator.api_delay()
+            if request.method == 'POST' and simulator.api_should_fail():
+                return _twilio_error(503, 'Simulated provider error')
+
+    @sim_app.route('/2010-04-01/Accounts/<account_sid>.json')
+    def fetch_account(account_sid):
+        return jsonify({'sid': account_sid, 'friendly_name':
+            'Twilio Simulator', 'status': 'active', 'type': 'Full'})
+
+    @sim_app.route(f'{API_PREFIX}/Calls.json', methods=['POST'])
+    def create_call(account_sid):
+        if not request.form.get('To') or not request.form.get('Url'):
+            return _twilio_error(400, "Missing required parameter 'To' or 'Url'")
+        return jsonify(simulator.create_call(account_sid, request.form)), 201
+
+    @sim_app.route(f'{API_PREFIX}/Calls.json', methods=['GET'])
+    def list_calls(account_sid):
+        status = request.args.get('Status')
+        page_size = request.args.get('PageSize', 50, type=int)
+        page = request.args.get('Page', 0, type=int)
+        calls = [simulator.public_call(call) for call in list(simulator.
+            calls.values()) if not status or call['status'] == status]
+        records = calls[page * page_size:(page + 1) * page_size]
+        uri = f'/2010-04-01/Accounts/{account_sid}/Calls.json'
+        next_page_uri = (
+            f'{uri}?PageSize={page_size}&Page={page + 1}' + (
+            f'&Status={status}' if status else '') if (page + 1) *
+            page_size < len(calls) else None)
+        return jsonify({'calls': records, 'page': page, 'page_size':
+            page_size, 'start': page * page_size, 'end': page * page_size +
+            len(records), 'uri': uri, 'first_page_uri': uri,
+            'previous_page_uri': None, 'next_page_uri': next_page_uri})
+
+    @sim_app.route(f'{API_PREFIX}/Calls/<call_sid>.json', methods=['GET'])
+    def fetch_call(account_sid, call_sid):
+        call = simulator.calls.get(call_sid)
+        if not call:
+            return _twilio_error(404, f'Call {call_sid} not found')
+        return jsonify(simulator.public_call(call))
+
+    @sim_app.route(f'{API_PREFIX}/Calls/<call_sid>.json', methods=['POST'])
+    def update_call(account_sid, call_sid):
+        call = simulator.update_call(call_sid, request.form)
+        if not call:
+            return _twilio_error(404, f'Call {call_sid} not found')
+        return jsonify(call)
+
+    @sim_app.route(f'{API_PREFIX}/Recordings/<recording_sid>.json')
+    def fetch_recording(account_sid, recording_sid):
+        recording = simulator.recordings.get(recording_sid)
+        if not recording:
+            return _twilio_error(404, f'Recording {recording_sid} not found')
+        return jsonify(recording)
+
+    @sim_app.route(f'{API_PREFIX}/Recordings/<recording_sid>')
+    @sim_app.route(f'{API_PREFIX}/Recordings/<recording_sid>.<extension>')
+    def download_recording(account_sid, recording_sid, extension='wav'):
+        if recording_sid not in simulator.recordings:
+            return _twilio_error(404, f'Recording {recording_sid} not found')
+        simulator._count('media_downloads')
+        mimetype = 'audio/mpeg' if extension == 'mp3' else 'audio/x-wav'
+        return Response(RECORDING_BYTES, mimetype=mimetype)
+
+    @sim_app.route('/simulator/stats')
+    def simulator_stats():
+        return jsonify(simulator.get_stats())
+    return sim_app
+
+
+def _parse_range(value: str) ->Tuple[float, float]:
+    low, _, high = value.partition(',')
+    return float(low), float(high or low)
+
+
+def _parse_outcomes(value: str) ->Dict[str, float]:
+    outcomes = {}
+    for item in value.split(','):
+        status, _, weight = item.partition('=')
+        outcomes[status.strip()] = float(weight)
+    return outcomes
+
+
+def main(argv: List[str]=None):
+    parser = argparse.ArgumentParser(description=
+        'Local stand-in for the Twilio REST API used by the Robo Calling AI Agent'
+        )
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--api-latency-ms', type=_parse_range, default=(20,
+        80))
+    parser.add_argument('--api-error-rate', type=float, default=0.0)
+    parser.add_argument('--callback-latency-ms', type=_parse_range, default
+        =(50, 250))
+    parser.add_argument('--ring-seconds', type=_parse_range, default=(2, 8))
+    parser.add_argument('--call-duration-seconds', type=_parse_range,
+        default=(5, 40))
+    parser.add_argument('--outcomes', type=_parse_outcomes, default=
+        _default_outcomes(), help=
+        'Outcome mix, e.g. completed=0.6,no-answer=0.15,busy=0.15,failed=0.1')
+    parser.add_argument('--time-scale', type=float, default=1.0, help=
+        'Multiplier applied to ring, call and recording times')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args(argv)
+    settings = SimulatorSettings(api_latency_ms=args.api_latency_ms,
+        api_error_rate=args.api_error_rate, callback_latency_ms=args.
+        callback_latency_ms, ring_seconds=args.ring_seconds,
+        call_duration_seconds=args.call_duration_seconds, outcomes=args.
+        outcomes, time_scale=args.time_scale, seed=args.seed)
+    logging.basicConfig(level=logging.INFO, format=
+        '%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    base_url = f'http://{args.host}:{args.port}'
+    sim_app = create_simulator_app(TwilioSimulator(settings), base_url)
+    print(f'Twilio simulator listening on {base_url}')
+    print(f'Point the app at it with TWILIO_API_BASE_URL={base_url}')
+    sim_app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == '__main__':
+    main()
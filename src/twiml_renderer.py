@@ -0,0 +1,118 @@
+import hashlib
+import logging
+import string
+import threading
+from collections import OrderedDict
+from typing import Dict, Tuple
+from xml.sax.saxutils import escape
+TWIML_HEADER = """<?xml version="1.0" encoding="UTF-8"?>
+<Response>
+    <Say voice="alice">"""
+TWIML_FOOTER = """</Say>
+    <Pause length="2"/>
+    <Say voice="alice">Thank you for your time. Goodbye.</Say>
+</Response>"""
+FALLBACK_TWIML = b"""<?xml version="1.0" encoding="UTF-8"?>
+<Response>
+    <Say voice="alice">Hello, this is a test call. Thank you for your time.</Say>
+</Response>"""
+MAX_TEMPLATES = 256
+MAX_RENDERED = 4096
+SCRIPT_VARIABLES = frozenset({'name', 'first_name', 'phone_number'})
+logger = logging.getLogger(__name__)
+
+
+class TwimlTemplate:
+    """A script compiled once into literal TwiML parts and variable slots. Only
+    ``SCRIPT_VARIABLES`` are substituted; any other field, including positional
+    ones such as ``{0}`` or ``{}``, is kept as literal text."""
+
+    def __init__(self, script: str):
+        self.version = hashlib.sha1(script.encode('utf-8')).hexdigest()[:16]
+        self.parts = []
+        self.field_names = []
+        try:
+            parsed = list(string.Formatter().parse(script))
+        except ValueError:
+            parsed = [(script, None, None, None)]
+        literal = TWIML_HEADER
+        unknown = []
+        for text, field_name, format_spec, conversion in parsed:
+            literal += escape(text)
+            if field_name in SCRIPT_VARIABLES:
+                self.parts.extend([literal, None])
+                self.field_names.append(field_name)
+                literal = ''
+            elif field_name is not None:
+                field = field_name + (f'!{conversion}' if conversion else ''
+                    ) + (f':{format_spec}' if format_spec else '')
+                literal += escape(f'{{{field}}}')
+                unknown.append(field)
+        self.parts.append(literal + TWIML_FOOTER)
+        if unknown:
+            logger.warning(
+                f"Script {self.version} has unknown placeholders {', '.join(f'{{{field}}}' for field in unknown)}; they are spoken as written"
+                )
+        self.variables = set(self.field_names)
+        self.static_body = None if self.variables else self.parts[0].encode(
+            'utf-8')
+
+    def render(self, variables: Dict[str, str]=None) ->bytes:
+        if self.static_body is not None:
+            return self.static_body
+        variables = variables or {}
+        names = iter(self.field_names)
+        return ''.join(part if part is not None else escape(str(variables.
+            get(next(names)) or '')) for part in self.parts).encode('utf-8')
+
+
+class TwimlRenderer:
+
+    def __init__(self, max_templates: int=MAX_TEMPLATES, max_rendered: int=
+        MAX_RENDERED):
+        self.max_templates = max_templates
+        self.max_rendered = max_rendered
+        self.templates = OrderedDict()
+        self.rendered = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get_template(self, script: str) ->TwimlTemplate:
+        with self._lock:
+            template = self.templates.get(script)
+            if template is not None:
+                self.templates.move_to_end(script)
+                return template
+        template = TwimlTemplate(script)
+        with self._lock:
+            self.templates[script] = template
+            if len(self.templates) > self.max_templates:
+                self.templates.popitem(last=False)
+        return template
+
+    def render(self, script: str, variables: Dict[str, str]=None) ->Tuple[
+        bytes, str]:
+        template = self.get_template(script)
+        values = tuple(str((variables or {}).get(name) or '') for name in
+            sorted(template.variables))
+        key = template.version, values
+        with self._lock:
+            cached = self.rendered.get(key)
+            if cached is not None:
+                self.rendered.move_to_end(key)
+                self.hits += 1
+                return cached
+            self.misses += 1
+        body = template.render(variables)
+        cached = body, f'"{template.version}-{hashlib.sha1(body).hexdigest()[:16]}"'
+        with self._lock:
+            self.rendered[key] = cached
+            if len(self.rendered) > self.max_rendered:
+                self.rendered.popitem(last=False)
+        return cached
+
+    def get_stats(self) ->Dict[str, int]:
+        with self._lock:
+            return {'templates': len(self.templates), 'rendered': len(self.
+                rendered), 'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,340 @@
+import argparse
+import asyncio
+import json
+import logging
+import queue
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+from urllib.parse import parse_qsl
+import metrics
+from config import config
+WEBHOOK_PATH = re.compile('^/webhook/(status|recording|twiml)/(\\d+)$')
+CALL_STATUSES = {'queued', 'initiated', 'ringing', 'in-progress',
+    'completed', 'busy', 'failed', 'no-answer', 'canceled'}
+MAX_BODY_BYTES = 64 * 1024
+INBOX_DELETE_BATCH_SIZE = 100
+logger = logging.getLogger(__name__)
+
+
+def parse_form(body: bytes) ->Dict[str, str]:
+    return dict(parse_qsl(body.decode('utf-8', 'replace'),
+        keep_blank_values=True))
+
+
+def validate_event(kind: str, form: Dict[str, str]) ->str:
+    """Return an error message for a malformed callback, or an empty string."""
+    if kind == 'status':
+        if form.get('CallStatus') not in CALL_STATUSES:
+            return 'Unknown CallStatus'
+        if form.get('CallDuration') and not form['CallDuration'].isdigit():
+            return 'CallDuration must be an integer'
+    elif kind == 'recording' and not (form.get('RecordingUrl') or form.get
+        ('RecordingSid')):
+        return 'RecordingUrl or RecordingSid is required'
+    return ''
+
+
+class WebhookIngest:
+    """ASGI app for Twilio callbacks. Requests are parsed and validated on the event
+    loop, written to the ``webhook_inbox`` table and queued; worker threads apply them
+    through the shared ``WebhookProcessor`` and then delete them from the inbox.
+    Events for one call always land on the same worker, so they are applied in order.
+    Inbox rows left by a crash or a failed apply are queued again on ``start``."""
+
+    def __init__(self, webhook_processor, call_manager, workers: int=None,
+        queue_size: int=None, change_feed=None):
+        self.webhook_processor = webhook_processor
+        self.change_feed = change_feed
+        self.call_manager = call_manager
+        self.db_manager = webhook_processor.db_manager
+        self.workers = max(workers or config.webhooks.ingest_workers, 1)
+        self.queue_size = queue_size or config.webhooks.ingest_queue_size
+        self.queues = [queue.Queue(maxsize=self.queue_size) for _ in range
+            (self.workers)]
+        self.accepted = 0
+        self.rejected = 0
+        self.overflowed = 0
+        self.processed = 0
+        self.failed = 0
+        self.replayed = 0
+        self._pending = []
+        self._persisting = False
+        self._executor = ThreadPoolExecutor(max_workers=self.workers,
+            thread_name_prefix='webhook-io')
+        self._threads = []
+        self._lock = threading.Lock()
+        metrics.gauge('robocall_webhook_queue_depth',
+            'Callbacks accepted but not yet applied, by worker', lambda : {
+            index: events.qsize() for index, events in enumerate(self.
+            queues)}, ['worker'])
+        metrics.counter_callback('robocall_webhook_requests',
+            'Callback requests answered by the ingestion service', lambda :
+            {'accepted': self.accepted, 'rejected': self.rejected,
+            'overflowed': self.overflowed}, ['outcome'])
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for index, events in enumerate(self.queues):
+                thread = threading.Thread(target=self._work, args=(events,),
+                    name=f'webhook-worker-{index}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        self.replay()
+
+    def replay(self) ->int:
+        """Queue the inbox rows of callbacks that were acknowledged but never applied."""
+        pending = self.db_manager.get_webhook_inbox_events()
+        for event_id, kind, call_id, form in pending:
+            self.queues[call_id % self.workers].put((event_id, kind,
+                call_id, form))
+        if pending:
+            logger.info(f'Replaying {len(pending)} unapplied webhooks')
+        self.replayed += len(pending)
+        return len(pending)
+
+    def stop(self, timeout: float=5):
+        with self._lock:
+            threads, self._threads = self._threads, []
+        if not threads:
+            return
+        for events in self.queues:
+            events.put(None)
+        for thread in threads:
+            thread.join(timeout=timeout)
+
+    def join(self):
+        for events in self.queues:
+            events.join()
+
+    def _work(self, events: queue.Queue):
+        applied = []
+        while True:
+            event = events.get()
+            try:
+                if event is None:
+                    return
+                event_id, kind, call_id, form = event
+                try:
+                    if kind == 'status':
+                        self.webhook_processor.handle_status(call_id, form)
+                    else:
+                        self.webhook_processor.handle_recording(call_id, form)
+                    applied.append(event_id)
+                    self.processed += 1
+                except Exception as e:
+                    self.failed += 1
+                    logger.error(f'Error processing {kind} webhook for call {call_id}, kept for replay: {str(e)}')
+                if applied and (events.empty() or len(applied) >=
+                    INBOX_DELETE_BATCH_SIZE):
+                    self._delete_applied(applied)
+            finally:
+                events.task_done()
+
+    def _delete_applied(self, event_ids: List[int]):
+        """Drop applied events from the inbox. Should this fail they are replayed on the
+        next start, where the idempotency keys turn them into no-ops."""
+        try:
+            self.db_manager.delete_webhook_inbox_events(event_ids)
+        except Exception as e:
+            logger.error(f'Error clearing {len(event_ids)} applied webhooks from the inbox: {str(e)}')
+        event_ids.clear()
+
+    def get_stats(self) ->Dict[str, Any]:
+        return {'accepted': self.accepted, 'rejected': self.rejected,
+            'overflowed': self.overflowed, 'processed': self.processed,
+            'failed': self.failed, 'replayed': self.replayed, 'queued': sum(
+            events.qsize() for events in self.queues), 'workers': self.
+            workers, **self.
+            webhook_processor.get_stats()}
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+        if scope['path'] == '/metrics':
+            body = await asyncio.get_running_loop().run_in_executor(self.
+                _executor, metrics.render)
+            await self._respond(send, 200, body.encode(), metrics.CONTENT_TYPE)
+            return
+        if scope['path'] == '/api/health':
+            await self._respond(send, 200, json.dumps({'status': 'ok',
+                'webhooks': self.get_stats(), 'call_states': self.
+                call_manager.state_machine.get_stats(), 'change_feed': self
+                .change_feed.get_stats() if self.change_feed else None}).
+                encode(), 'application/json')
+            return
+        match = WEBHOOK_PATH.match(scope['path'])
+        if not match:
+            await self._respond(send, 404, b'Not Found')
+            return
+        kind, call_id = match.group(1), int(match.group(2))
+        if scope['method'] not in (('GET', 'POST') if kind == 'twiml' else
+            ('POST',)):
+            await self._respond(send, 405, b'Method Not Allowed')
+            return
+        body = await self._read_body(receive)
+        if body is None:
+            self.rejected += 1
+            await self._respond(send, 413, b'Payload Too Large')
+            return
+        if kind == 'twiml':
+            await self._twiml(scope, send, call_id)
+            return
+        form = parse_form(body)
+        error = validate_event(kind, form)
+        if error:
+            self.rejected += 1
+            await self._respond(send, 400, error.encode())
+            return
+        events = self.queues[call_id % self.workers]
+        if events.full():
+            await self._overflow(send)
+            return
+        try:
+            event_id = await self._persist(kind, call_id, form)
+        except Exception as e:
+            logger.error(f'Error persisting {kind} webhook for call {call_id}: {str(e)}')
+            await self._respond(send, 500, b'Error')
+            return
+        try:
+            events.put_nowait((event_id, kind, call_id, form))
+        except queue.Full:
+            await asyncio.get_running_loop().run_in_executor(self._executor,
+                self.db_manager.delete_webhook_inbox_events, [event_id])
+            await self._overflow(send)
+            return
+        self.accepted += 1
+        await self._respond(send, 200, b'OK')
+
+    async def _persist(self, kind: str, call_id: int, form: Dict[str, str]
+        ) ->int:
+        """Write the event to the inbox before it is acknowledged. Events arriving while
+        a write is in flight are written together in the next transaction."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((kind, call_id, form, future))
+        if not self._persisting:
+            self._persisting = True
+            loop.create_task(self._write_pending())
+        return await future
+
+    async def _write_pending(self):
+        loop = asyncio.get_running_loop()
+        try:
+            while self._pending:
+                batch, self._pending = self._pending, []
+                try:
+                    event_ids = await loop.run_in_executor(self._executor,
+                        self.db_manager.add_webhook_inbox_events, [(kind,
+                        call_id, form) for kind, call_id, form, _ in batch],
+                        datetime.now())
+                except Exception as e:
+                    for *_, future in batch:
+                        if not future.done():
+                            future.set_exception(e)
+                    continue
+                for (*_, future), event_id in zip(batch, event_ids):
+                    if not future.done():
+                        future.set_result(event_id)
+        finally:
+            self._persisting = False
+
+    async def _overflow(self, send):
+        self.overflowed += 1
+        await self._respond(send, 503, b'Busy', headers=[(b'retry-after',
+            b'1')])
+
+    async def _twiml(self, scope, send, call_id: int):
+        twiml, etag = await asyncio.get_running_loop().run_in_executor(self
+            ._executor, self.call_manager.get_twiml_response, call_id)
+        headers = []
+        if etag:
+            headers.append((b'etag', etag.encode()))
+            if_none_match = dict(scope['headers']).get(b'if-none-match', b'')
+            if etag.encode() in if_none_match:
+                await self._respond(send, 304, b'', 'application/xml', headers)
+                return
+        await self._respond(send, 200, twiml if isinstance(twiml, bytes) else
+            twiml.encode(), 'application/xml', headers)
+
+    async def _read_body(self, receive) ->bytes:
+        chunks = []
+        size = 0
+        while True:
+            message = await receive()
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if size > MAX_BODY_BYTES:
+                return None
+            chunks.append(chunk)
+            if not message.get('more_body'):
+                return b''.join(chunks)
+
+    async def _respond(self, send, status: int, body: bytes, content_type:
+        str='text/plain', headers: List[Tuple[bytes, bytes]]=None):
+        await send({'type': 'http.response.start', 'status': status,
+            'headers': [(b'content-type', content_type.encode()), (
+            b'content-length', str(len(body)).encode())] + (headers or [])})
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                self.start()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await asyncio.get_running_loop().run_in_executor(None, self
+                    .stop)
+                if self.change_feed:
+                    await asyncio.get_running_loop().run_in_executor(None,
+                        self.change_feed.stop)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+def create_ingest_app(workers: int=None, queue_size: int=None
+    ) ->WebhookIngest:
+    """Build the ingestion app around the managers the Flask app module creates. Its
+    table changes and call events reach the Flask app through the change feed.
+
+    The service only persists, applies and publishes callbacks: retries it schedules
+    are dispatched, and live calls are reconciled with Twilio, by the Flask app."""
+    import app as app_module
+    app_module.change_feed.start_publishing()
+    return WebhookIngest(app_module.webhook_processor, app_module.
+        call_manager, workers, queue_size, app_module.change_feed)
+
+
+def main(argv: List[str]=None):
+    parser = argparse.ArgumentParser(description=
+        'Serve Twilio webhooks from an asyncio (ASGI) process')
+    parser.add_argument('--host', default=config.flask_host)
+    parser.add_argument('--port', type=int, default=config.webhooks.
+        ingest_port)
+    parser.add_argument('--workers', type=int, default=config.webhooks.
+        ingest_workers, help='Processing threads; events are sharded by call id')
+    parser.add_argument('--queue-size', type=int, default=config.webhooks.
+        ingest_queue_size, help=
+        'Events buffered per worker before callbacks get 503')
+    args = parser.parse_args(argv)
+    try:
+        import uvicorn
+    except ImportError:
+        parser.error(
+            'The ingestion service requires uvicorn. Install it with: pip install uvicorn'
+            )
+    uvicorn.run(create_ingest_app(args.workers, args.queue_size), host=args
+        .host, port=args.port, log_level=config.log_level.lower(),
+        access_log=False)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Mapping, Tuple
+from config import config
+from metrics import WEBHOOK_EVENTS, WEBHOOK_SECONDS
+PRUNE_EVERY_EVENTS = 10000
+
+
+def event_key(call_id: int, event: str, form: Mapping[str, str]) ->Tuple[
+    str, str, int]:
+    """Idempotency key for a callback: ``(CallSid, CallStatus, SequenceNumber)``.
+    Recording callbacks are keyed on their RecordingSid instead of the status."""
+    call_sid = form.get('CallSid') or f'call:{call_id}'
+    sequence = form.get('SequenceNumber')
+    return call_sid, event, int(sequence) if sequence and sequence.isdigit(
+        ) else -1
+
+
+class RecentEvents:
+    """Bounded set of recently applied event keys, checked before the database."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.keys = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, key) ->bool:
+        with self._lock:
+            return key in self.keys
+
+    def add(self, key):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self.keys[key] = None
+            self.keys.move_to_end(key)
+            while len(self.keys) > self.max_size:
+                self.keys.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self.keys.pop(key, None)
+
+    def __len__(self) ->int:
+        return len(self.keys)
+
+
+class WebhookProcessor:
+    """Applies Twilio status and recording callbacks; shared by the Flask routes and
+    the async ingestion service. Each delivery is claimed once, so Twilio retries
+    and repeated events are acknowledged without being applied again."""
+
+    def __init__(self, call_manager, transcript_processor, retry_handler,
+        cache_size: int=None, retention_hours: float=None):
+        self.call_manager = call_manager
+        self.db_manager = call_manager.db_manager
+        self.transcript_processor = transcript_processor
+        self.retry_handler = retry_handler
+        self.recent = RecentEvents(cache_size if cache_size is not None else
+            config.webhooks.dedup_cache_size)
+        self.retention = timedelta(hours=retention_hours if
+            retention_hours is not None else config.webhooks.
+            dedup_retention_hours)
+        self.applied = 0
+        self.duplicates = 0
+        self.logger = logging.getLogger(__name__)
+
+    def handle_status(self, call_id: int, form: Mapping[str, str]) ->bool:
+        call_status = form.get('CallStatus')
+        return self._apply('status', event_key(call_id, call_status or '',
+            form), lambda : self._apply_status(call_id, call_status, form))
+
+    def handle_recording(self, call_id: int, form: Mapping[str, str]) ->bool:
+        key = (form.get('CallSid') or f'call:{call_id}',
+            f"recording:{form.get('RecordingSid') or form.get('RecordingUrl')}"
+            , -1)
+        return self._apply('recording', key, lambda : self._apply_recording
+            (call_id, form))
+
+    def _apply(self, kind: str, key: Tuple[str, str, int], apply) ->bool:
+        """Run ``apply`` unless ``key`` was already claimed. Returns False for duplicates."""
+        started = time.perf_counter()
+        if key in self.recent or not self.db_manager.claim_webhook_event(*
+            key, datetime.now()):
+            self.duplicates += 1
+            self.recent.add(key)
+            WEBHOOK_EVENTS.inc(kind, 'duplicate')
+            self.logger.debug(f'Ignoring duplicate webhook {key}')
+            return False
+        try:
+            apply()
+        except Exception:
+            self.db_manager.release_webhook_event(*key)
+            WEBHOOK_EVENTS.inc(kind, 'failed')
+            raise
+        finally:
+            WEBHOOK_SECONDS.observe(time.perf_counter() - started, kind)
+        self.recent.add(key)
+        self.applied += 1
+        WEBHOOK_EVENTS.inc(kind, 'applied')
+        if self.applied % PRUNE_EVERY_EVENTS == 0:
+            self.prune()
+        return True
+
+    def _apply_status(self, call_id: int, call_status: str, form: Mapping[
+        str, str]):
+        call_duration = form.get('CallDuration')
+        recording_url = form.get('RecordingUrl')
+        duration = int(call_duration) if call_duration else None
+        self.call_manager.update_call_status(call_id, call_status, form.get
+            ('CallSid'), duration)
+        if recording_url and config.call.transcribe_calls:
+            self.transcript_processor.process_call_recording(call_id,
+                recording_url=recording_url)
+
+    def _apply_recording(self, call_id: int, form: Mapping[str, str]):
+        recording_url = form.get('RecordingUrl')
+        if recording_url and config.call.transcribe_calls:
+            self.transcript_processor.process_call_recording(call_id, form.
+                get('RecordingSid'), recording_url)
+
+    def prune(self) ->int:
+        deleted = self.db_manager.delete_webhook_events(datetime.now() -
+            self.retention)
+        if deleted:
+            self.logger.info(f'Pruned {deleted} webhook idempotency keys')
+        return deleted
+
+    def get_stats(self) ->Dict[str, Any]:
+        return {'applied': self.applied, 'duplicates': self.duplicates,
+            'recent_keys': len(self.recent)}
@@ -0,0 +1,104 @@
+import itertools
+import os
+import sys
+from datetime import datetime
+from types import SimpleNamespace
+import pytest
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+    os.pardir, 'src'))
+from config import config
+from models import Call, Contact, DatabaseManager
+from provider import provider
+
+
+class FakeCall:
+
+    def __init__(self, twilio, sid: str):
+        self.twilio = twilio
+        self.sid = sid
+
+    def update(self, **kwargs):
+        self.twilio.updates.append((self.sid, kwargs))
+        return SimpleNamespace(sid=self.sid, **kwargs)
+
+
+class FakeCalls:
+    """The slice of ``client.calls`` the app uses: ``create`` and ``calls(sid).update``."""
+
+    def __init__(self, twilio):
+        self.twilio = twilio
+        self._sids = itertools.count(1)
+
+    def create(self, **kwargs):
+        sid = f'CA{next(self._sids):032d}'
+        self.twilio.created.append((sid, kwargs))
+        if self.twilio.on_create:
+            self.twilio.on_create(sid, kwargs)
+        return SimpleNamespace(sid=sid, status='queued')
+
+    def __call__(self, sid: str) ->FakeCall:
+        return FakeCall(self.twilio, sid)
+
+
+class FakeTwilio:
+
+    def __init__(self):
+        self.created = []
+        self.updates = []
+        self.on_create = None
+        self.calls = FakeCalls(self)
+
+
+@pytest.fixture(scope='session', autouse=True)
+def working_directory(tmp_path_factory):
+    """Run from a scratch directory: the app writes ``data/`` and ``logs/`` relative to it."""
+    previous = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp('workdir'))
+    yield
+    os.chdir(previous)
+
+
+@pytest.fixture
+def app_module(twilio):
+    """The Flask app module with its singletons, sharing one database per session."""
+    import app
+    return app
+
+
+@pytest.fixture
+def db_manager(tmp_path):
+    return DatabaseManager(str(tmp_path / 'robo_calls.db'), str(tmp_path /
+        'archive'))
+
+
+@pytest.fixture
+def twilio(monkeypatch):
+    fake = FakeTwilio()
+    monkeypatch.setattr(provider, '_client', fake)
+    monkeypatch.setattr(config.twilio, 'phone_number', '+15550000000')
+    return fake
+
+
+@pytest.fixture
+def call_manager(db_manager, twilio):
+    from call_manager import CallManager
+    return CallManager(db_manager)
+
+
+@pytest.fixture
+def contact(db_manager):
+    contact = Contact(phone_number='+15551230000', name='Pat Smith')
+    contact.id = db_manager.add_contact(contact)
+    return contact
+
+
+@pytest.fixture
+def add_call(db_manager, contact):
+    """Insert a call row directly, bypassing the provider."""
+
+    def add(status: str='initiated', call_sid: str=None, start_time:
+        datetime=None, **fields) ->int:
+        return db_manager.add_call(Call(contact_id=contact.id, call_sid=
+            call_sid, status=status, start_time=start_time or datetime.now(
+            ), **fields))
+    return add
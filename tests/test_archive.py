@@ -0,0 +1,65 @@
+import io
+from datetime import datetime
+import pytest
+from archive_manager import ArchiveManager
+from models import RetryAttempt, Transcript
+from transcript_processor import TranscriptProcessor
+
+
+@pytest.fixture
+def archived(db_manager, add_call):
+    """Two calls archived into January and February 2024, one call left hot."""
+    call_ids = [add_call('completed', start_time=start_time, duration=30) for
+        start_time in (datetime(2024, 1, 15, 9), datetime(2024, 2, 3, 12),
+        datetime.now())]
+    for call_id in call_ids:
+        db_manager.add_transcript(Transcript(call_id=call_id,
+            transcript_text=f'call {call_id}', confidence_score=0.9))
+        db_manager.add_retry_attempt(RetryAttempt(call_id=call_id,
+            attempt_number=1, status='completed', attempted_at=datetime.now()))
+    moved = ArchiveManager(db_manager).archive(before=datetime(2025, 1, 1))
+    assert moved == {'2024-01': 1, '2024-02': 1}
+    return call_ids
+
+
+def test_transcript_export_reads_archive_months(db_manager, archived):
+    rows = list(TranscriptProcessor(db_manager).iter_transcripts(batch_size=1))
+    assert [row['call_id'] for row in rows] == archived
+    assert rows[0]['contact_name'] == 'Pat Smith'
+    exported = ''.join(TranscriptProcessor(db_manager).stream_transcripts(
+        'csv'))
+    assert len(exported.strip().splitlines()) == len(archived) + 1
+
+
+
+def test_transcript_listing_reads_archive_months(db_manager, archived):
+    processor = TranscriptProcessor(db_manager)
+    listed = processor.get_all_transcripts()
+    assert [row['call_id'] for row in listed] == archived[::-1]
+    assert listed[-1]['call_info']['contact_name'] == 'Pat Smith'
+    assert [row['call_id'] for row in processor.get_all_transcripts(limit=2)
+        ] == archived[:0:-1]
+
+@pytest.mark.parametrize('table', ['calls', 'retry_attempts',
+    'transcripts', 'contacts'])
+def test_columnar_export_reads_archive_months(db_manager, archived, table):
+    pytest.importorskip('pyarrow')
+    import pyarrow.parquet
+    from columnar_export import write_table
+    sink = io.BytesIO()
+    rows = write_table(db_manager, table, sink, row_group_size=1)
+    expected = 1 if table == 'contacts' else len(archived)
+    assert rows == expected
+    sink.seek(0)
+    assert pyarrow.parquet.read_table(sink).num_rows == expected
+
+
+def test_lookups_find_archived_calls(db_manager, call_manager, archived):
+    january = archived[0]
+    assert db_manager.get_call(january).start_time == datetime(2024, 1, 15, 9)
+    assert db_manager.get_call_status(january) == 'completed'
+    assert call_manager.get_call_status(january)['status'] == 'completed'
+    transcript = TranscriptProcessor(db_manager).get_transcript(january)
+    assert transcript['transcript_text'] == f'call {january}'
+    assert transcript['call_info']['call_status'] == 'completed'
+    assert db_manager.get_call(max(archived) + 1) is None
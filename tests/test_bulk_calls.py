@@ -0,0 +1,21 @@
+import time
+from models import Contact
+
+
+def add_contacts(db_manager, count):
+    return [db_manager.add_contact(Contact(phone_number=
+        f'+1555123{index:04d}', name=f'Contact {index}')) for index in
+        range(count)]
+
+
+def test_bulk_calls_are_queued_at_once_and_paced_by_the_dialer(db_manager,
+    call_manager, twilio):
+    contact_ids = add_contacts(db_manager, 5)
+    call_manager.dial_queue.limiter.rate_per_second = 20
+    started = time.monotonic()
+    result = call_manager.make_bulk_calls(contact_ids + [max(contact_ids) +
+        1], 'Hello {name}')
+    elapsed = time.monotonic() - started
+    assert (result['successful_calls'], result['failed_calls']) == (5, 1)
+    assert len(twilio.created) == 5
+    assert 0.19 <= elapsed < 1.5
@@ -0,0 +1,89 @@
+import pytest
+from models import Call, Contact
+
+
+def status_of(db_manager, call_id):
+    return db_manager.get_call_status(call_id)
+
+
+def test_final_status_filter_never_reaches_provider(db_manager, call_manager,
+    twilio, add_call):
+    busy = add_call('busy', call_sid='CA-busy')
+    completed = add_call('completed', call_sid='CA-done')
+    result = call_manager.bulk_cancel_calls(['busy'])
+    assert result['success']
+    assert result['calls_matched'] == 1
+    assert result['calls_canceled'] == 0
+    assert result['matched_call_ids'] == [busy]
+    assert twilio.updates == []
+    assert status_of(db_manager, busy) == 'busy'
+    assert status_of(db_manager, completed) == 'completed'
+
+
+def test_campaign_cancel_only_touches_active_calls(db_manager, call_manager,
+    twilio, add_call):
+    pending = add_call('pending', campaign_id='spring')
+    ringing = add_call('ringing', call_sid='CA-ringing', campaign_id='spring')
+    answered = add_call('in-progress', call_sid='CA-live', campaign_id='spring'
+        )
+    completed = add_call('completed', call_sid='CA-done', campaign_id='spring')
+    other = add_call('ringing', call_sid='CA-other', campaign_id='autumn')
+    result = call_manager.bulk_cancel_calls(campaign_id='spring')
+    assert result['calls_canceled'] == 3
+    assert sorted(result['matched_call_ids']) == sorted([pending, ringing,
+        answered, completed])
+    assert sorted(twilio.updates) == [('CA-live', {'status': 'completed'}),
+        ('CA-ringing', {'status': 'canceled'})]
+    assert [status_of(db_manager, call_id) for call_id in (pending, ringing,
+        answered, completed, other)] == ['canceled', 'canceled', 'canceled',
+        'completed', 'ringing']
+
+
+def test_unknown_status_is_rejected(call_manager, add_call):
+    add_call('ringing', call_sid='CA-ringing')
+    with pytest.raises(ValueError):
+        call_manager.bulk_cancel_calls(['bogus'])
+
+
+def test_empty_status_list_matches_nothing(db_manager, add_call):
+    add_call('ringing')
+    assert db_manager.find_calls([]) == []
+    assert len(db_manager.find_calls(None)) == 1
+
+
+def test_dial_canceled_while_in_flight_is_hung_up(db_manager, call_manager,
+    twilio, contact):
+
+    def cancel_campaign_during_dial(sid, kwargs):
+        assert call_manager.bulk_cancel_calls(campaign_id='spring')[
+            'calls_canceled'] == 1
+    twilio.on_create = cancel_campaign_during_dial
+    result = call_manager.make_call(contact, 'Hello', campaign_id='spring')
+    sid = twilio.created[0][0]
+    assert not result['success']
+    assert twilio.updates == [(sid, {'status': 'canceled'})]
+    assert status_of(db_manager, result['call_id']) == 'canceled'
+    assert result['call_id'] not in call_manager.active_calls
+
+
+def test_cancel_route_with_final_status_only_drops_retries(app_module):
+    db = app_module.db_manager
+    contact_id = db.add_contact(Contact(phone_number='+15559870000', name=
+        'Route Test'))
+    busy = db.add_call(Call(contact_id=contact_id, call_sid='CA-route-busy',
+        status='busy', campaign_id='route-test'))
+    live = db.add_call(Call(contact_id=contact_id, call_sid='CA-route-live',
+        status='completed', campaign_id='route-test'))
+    assert app_module.retry_handler.schedule_retry(busy)['success']
+    client = app_module.app.test_client()
+    response = client.post('/api/calls/cancel', json={'status': 'busy',
+        'campaign_id': 'route-test'})
+    body = response.get_json()
+    assert response.status_code == 200
+    assert body['calls_canceled'] == 0
+    assert body['retries_canceled'] == 1
+    assert 'matched_call_ids' not in body
+    assert db.get_call_status(live) == 'completed'
+    assert app_module.retry_handler.dispatcher.get(busy) is None
+    assert client.post('/api/calls/cancel', json={'status': 'bogus'}
+        ).status_code == 400
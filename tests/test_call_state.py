@@ -0,0 +1,57 @@
+import pytest
+from call_state import FINAL_STATUSES, TRANSITIONS, allowed_from
+
+
+def test_final_statuses_are_terminal():
+    for status in FINAL_STATUSES:
+        assert status not in TRANSITIONS
+        for target in TRANSITIONS:
+            assert status not in allowed_from(target)
+    assert allowed_from('bogus') == []
+
+
+def test_forward_path_is_accepted(db_manager, call_manager, add_call):
+    call_id = add_call('pending')
+    for status in ('queued', 'initiated', 'ringing', 'in-progress',
+        'completed'):
+        assert call_manager.update_call_status(call_id, status, duration=7 if
+            status == 'completed' else None)
+    call = db_manager.get_call(call_id)
+    assert (call.status, call.duration) == ('completed', 7)
+    assert call.end_time is not None
+    assert call_manager.state_machine.get_stats()['rejected'] == 0
+
+
+@pytest.mark.parametrize('current, late', [('in-progress', 'ringing'), (
+    'ringing', 'initiated'), ('completed', 'busy'), ('no-answer', 'busy'),
+    ('canceled', 'in-progress'), ('in-progress', 'busy')])
+def test_stale_transitions_are_rejected_and_counted(db_manager,
+    call_manager, add_call, current, late):
+    call_id = add_call(current)
+    assert not call_manager.update_call_status(call_id, late)
+    assert db_manager.get_call_status(call_id) == current
+    assert call_manager.state_machine.get_stats()['rejected_transitions'
+        ] == {f'{current}->{late}': 1}
+
+
+def test_repeated_status_is_a_no_op_not_a_rejection(db_manager,
+    call_manager, add_call):
+    call_id = add_call('ringing')
+    assert not call_manager.update_call_status(call_id, 'ringing')
+    assert call_manager.state_machine.get_stats()['rejected'] == 0
+
+
+def test_initiated_callback_after_dial_is_not_counted(call_manager, twilio,
+    contact):
+    result = call_manager.make_call(contact, 'Hello')
+    assert result['success']
+    assert not call_manager.update_call_status(result['call_id'],
+        'initiated', result['call_sid'])
+    assert call_manager.state_machine.get_stats() == {'accepted': {
+        'initiated': 1}, 'rejected': 0, 'rejected_transitions': {}}
+
+
+def test_missing_call_is_counted_as_rejected(call_manager):
+    assert not call_manager.update_call_status(12345, 'completed')
+    assert call_manager.state_machine.get_stats()['rejected_transitions'
+        ] == {'missing->completed': 1}
@@ -0,0 +1,95 @@
+import pytest
+import requests
+from urllib3.exceptions import MaxRetryError, NewConnectionError, ProtocolError
+import provider as provider_module
+from provider import PooledHttpClient, classify_endpoint
+
+CREATE_URL = 'https://api.twilio.com/2010-04-01/Accounts/AC1/Calls.json'
+FETCH_URL = 'https://api.twilio.com/2010-04-01/Accounts/AC1/Calls/CA1.json'
+
+
+def response(status_code: int, headers=None) ->requests.Response:
+    result = requests.Response()
+    result.status_code = status_code
+    result.headers.update(headers or {})
+    result._content = b'{}'
+    return result
+
+
+def dropped_connection() ->requests.exceptions.ConnectionError:
+    return requests.exceptions.ConnectionError(ProtocolError(
+        'Connection aborted.', ConnectionResetError()))
+
+
+def refused_connection() ->requests.exceptions.ConnectionError:
+    return requests.exceptions.ConnectionError(MaxRetryError(None, '/',
+        NewConnectionError(None, 'Connection refused')))
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+    monkeypatch.setattr(provider_module.time, 'sleep', delays.append)
+    return delays
+
+
+def client_with(outcomes):
+    """A client whose session returns (or raises) ``outcomes`` in order."""
+    client = PooledHttpClient(max_retries=3)
+    calls = []
+
+    def request(method, url, **kwargs):
+        calls.append(method)
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+    client.session.request = request
+    return client, calls
+
+
+def test_dropped_call_create_is_not_retried(sleeps):
+    client, calls = client_with([dropped_connection(), response(201)])
+    with pytest.raises(requests.exceptions.ConnectionError):
+        client.send('POST', CREATE_URL)
+    assert calls == ['POST']
+    assert client.get_endpoint_stats()['calls.create']['errors'] == 1
+
+
+@pytest.mark.parametrize('error', [refused_connection(), requests.
+    exceptions.ConnectTimeout()])
+def test_call_create_is_retried_when_never_sent(sleeps, error):
+    client, calls = client_with([error, response(201)])
+    assert client.send('POST', CREATE_URL).status_code == 201
+    assert calls == ['POST', 'POST']
+
+
+def test_dropped_fetch_is_retried(sleeps):
+    client, calls = client_with([dropped_connection(), response(200)])
+    assert client.send('GET', FETCH_URL).status_code == 200
+    assert calls == ['GET', 'GET']
+    assert client.get_endpoint_stats()['calls.fetch']['retries'] == 1
+
+
+def test_server_errors_only_retried_for_idempotent_methods(sleeps):
+    client, calls = client_with([response(503), response(200)])
+    assert client.send('POST', CREATE_URL).status_code == 503
+    client, calls = client_with([response(503), response(200)])
+    assert client.send('GET', FETCH_URL).status_code == 200
+    assert calls == ['GET', 'GET']
+
+
+def test_retry_after_is_capped(sleeps):
+    client, calls = client_with([response(429, {'Retry-After': '86400'}),
+        response(429, {'Retry-After': '2'}), response(201)])
+    assert client.send('POST', CREATE_URL).status_code == 201
+    assert sleeps == [provider_module.MAX_BACKOFF_SECONDS, 2.0]
+
+
+def test_endpoints_are_classified():
+    assert classify_endpoint('POST', CREATE_URL) == 'calls.create'
+    assert classify_endpoint('POST', FETCH_URL) == 'calls.update'
+    assert classify_endpoint('GET', FETCH_URL) == 'calls.fetch'
+    assert classify_endpoint('GET',
+        'https://api.twilio.com/2010-04-01/Accounts/AC1/Recordings/RE1.mp3'
+        ) == 'media.download'
@@ -0,0 +1,77 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from models import DatabaseManager
+from retry_dispatcher import RetryDispatcher
+
+
+class Recorder:
+
+    def __init__(self):
+        self.dispatched = []
+        self._lock = threading.Lock()
+
+    def callback(self, name: str):
+
+        def record(batch):
+            with self._lock:
+                self.dispatched.extend((name, call_id, attempt) for
+                    call_id, attempt in batch)
+        return record
+
+
+def wait_for(condition, timeout: float=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.01)
+
+
+def test_dispatchers_sharing_a_database_fire_each_retry_once(db_manager,
+    tmp_path):
+    other_db = DatabaseManager(db_manager.db_path, str(tmp_path / 'archive'))
+    recorder = Recorder()
+    dispatchers = [RetryDispatcher(db, recorder.callback(name),
+        max_idle_seconds=0.05) for name, db in (('A', db_manager), ('B',
+        other_db))]
+    due_at = datetime.now() + timedelta(milliseconds=200)
+    for dispatcher in dispatchers:
+        dispatcher.start()
+    try:
+        dispatchers[0].schedule_many([(call_id, 1, due_at) for call_id in
+            range(1, 51)])
+        wait_for(lambda : len(recorder.dispatched) >= 50 and
+            db_manager.count_scheduled_retries() == 0)
+        time.sleep(0.2)
+    finally:
+        for dispatcher in dispatchers:
+            dispatcher.stop()
+    assert sorted(call_id for _, call_id, _ in recorder.dispatched) == list(
+        range(1, 51))
+
+
+def test_retries_scheduled_by_another_process_are_dispatched(db_manager,
+    tmp_path):
+    recorder = Recorder()
+    dispatcher = RetryDispatcher(db_manager, recorder.callback('A'),
+        max_idle_seconds=0.05)
+    dispatcher.start()
+    try:
+        other_db = DatabaseManager(db_manager.db_path, str(tmp_path /
+            'archive'))
+        other_db.schedule_retries([(7, 2, datetime.now())])
+        wait_for(lambda : recorder.dispatched)
+    finally:
+        dispatcher.stop()
+    assert recorder.dispatched == [('A', 7, 2)]
+    assert db_manager.get_scheduled_retry(7) is None
+
+
+def test_claim_skips_rows_already_claimed_or_not_yet_due(db_manager):
+    now = datetime.now()
+    db_manager.schedule_retries([(1, 1, now), (2, 3, now), (3, 1, now +
+        timedelta(hours=1))])
+    assert db_manager.claim_scheduled_retries([1, 2, 3], now) == [(1, 1),
+        (2, 3)]
+    assert db_manager.claim_scheduled_retries([1, 2, 3], now) == []
+    assert db_manager.count_scheduled_retries() == 1
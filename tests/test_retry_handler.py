@@ -0,0 +1,67 @@
+import pytest
+from config import config
+from retry_handler import RetryHandler
+
+
+@pytest.fixture
+def retry_handler(db_manager, call_manager):
+    handler = RetryHandler(db_manager, call_manager)
+    yield handler
+    handler.shutdown()
+
+
+def scheduled_call_ids(db_manager):
+    conn = db_manager.get_connection()
+    rows = conn.execute('SELECT call_id FROM scheduled_retries').fetchall()
+    conn.close()
+    return {row[0] for row in rows}
+
+
+def test_sweep_selects_only_eligible_calls(db_manager, retry_handler,
+    add_call, monkeypatch):
+    monkeypatch.setattr(config.retry, 'retry_on_failed', False)
+    retry_handler.retry_statuses['failed'] = False
+    busy = add_call('busy')
+    no_answer = add_call('no-answer', retry_count=1)
+    add_call('failed')
+    add_call('completed')
+    add_call('busy', retry_count=config.retry.max_attempts)
+    preview = retry_handler.retry_failed_calls(dry_run=True)
+    assert preview['eligible_calls'] == 2
+    assert preview['status_counts'] == {'busy': 1, 'no-answer': 1}
+    assert scheduled_call_ids(db_manager) == set()
+    result = retry_handler.retry_failed_calls()
+    assert result['retries_scheduled'] == 2
+    assert scheduled_call_ids(db_manager) == {busy, no_answer}
+    conn = db_manager.get_connection()
+    attempts = conn.execute(
+        'SELECT call_id, attempt_number FROM retry_attempts ORDER BY call_id'
+        ).fetchall()
+    conn.close()
+    assert [tuple(row) for row in attempts] == [(busy, 1), (no_answer, 2)]
+
+
+def test_second_sweep_skips_already_scheduled_calls(retry_handler, add_call):
+    add_call('busy')
+    add_call('no-answer')
+    assert retry_handler.retry_failed_calls()['retries_scheduled'] == 2
+    result = retry_handler.retry_failed_calls()
+    assert result['retries_scheduled'] == 0
+    assert result['already_scheduled'] == 2
+
+
+def test_status_filter_limits_sweep(db_manager, retry_handler, add_call):
+    busy = add_call('busy')
+    add_call('no-answer')
+    result = retry_handler.retry_failed_calls(['busy'])
+    assert result['retries_scheduled'] == 1
+    assert scheduled_call_ids(db_manager) == {busy}
+
+
+def test_scheduling_does_not_start_the_dispatcher(db_manager,
+    retry_handler, add_call):
+    busy = add_call('busy')
+    assert retry_handler.schedule_retry(busy)['success']
+    assert retry_handler.retry_failed_calls()['success']
+    assert retry_handler.dispatcher._thread is None
+    assert scheduled_call_ids(db_manager) == {busy}
@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+import pytest
+from config import RetryPolicy, config
+from retry_planner import RetryPlanner
+
+
+@pytest.fixture
+def planner(monkeypatch):
+    monkeypatch.setattr(config.retry, 'retry_delay_minutes', 5)
+    monkeypatch.setattr(config.retry, 'policies', {'busy': RetryPolicy(
+        jitter_ratio=0), 'failed': RetryPolicy(base_delay_minutes=10,
+        backoff_factor=3.0, max_delay_minutes=60, jitter_ratio=0)})
+    monkeypatch.setattr(config.retry, 'max_retries_per_minute', 0)
+    monkeypatch.setattr(config.retry, 'quiet_hours_start', None)
+    monkeypatch.setattr(config.retry, 'quiet_hours_end', None)
+    return RetryPlanner()
+
+
+def test_delay_grows_exponentially_and_is_capped(planner):
+    assert [planner.compute_delay('busy', attempt) for attempt in (1, 2, 3)
+        ] == [timedelta(minutes=5), timedelta(minutes=10), timedelta(
+        minutes=20)]
+    assert [planner.compute_delay('failed', attempt) for attempt in (1, 2, 3)
+        ] == [timedelta(minutes=10), timedelta(minutes=30), timedelta(
+        minutes=60)]
+
+
+def test_jitter_stays_within_ratio(planner):
+    config.retry.policies['busy'] = RetryPolicy(jitter_ratio=0.2)
+    delays = {planner.compute_delay('busy', 1) for _ in range(200)}
+    assert len(delays) > 1
+    assert all(timedelta(minutes=4) <= delay <= timedelta(minutes=6) for
+        delay in delays)
+
+
+@pytest.mark.parametrize('start, end, hour, quiet', [(21, 8, 22, True), (
+    21, 8, 3, True), (21, 8, 8, False), (21, 8, 12, False), (1, 5, 2, True),
+    (1, 5, 5, False), (9, 9, 9, False)])
+def test_quiet_hours_window(planner, monkeypatch, start, end, hour, quiet):
+    monkeypatch.setattr(config.retry, 'quiet_hours_start', start)
+    monkeypatch.setattr(config.retry, 'quiet_hours_end', end)
+    assert planner.in_quiet_hours(datetime(2026, 3, 1, hour, 30)) is quiet
+
+
+def test_retry_in_quiet_hours_moves_to_next_morning(planner, monkeypatch):
+    monkeypatch.setattr(config.retry, 'quiet_hours_start', 21)
+    monkeypatch.setattr(config.retry, 'quiet_hours_end', 8)
+    assert planner.plan('busy', 1, now=datetime(2026, 3, 1, 20, 58)
+        ) == datetime(2026, 3, 2, 8, 0)
+    assert planner.plan('busy', 1, now=datetime(2026, 3, 2, 3, 0)
+        ) == datetime(2026, 3, 2, 8, 0)
+    assert planner.plan('busy', 1, now=datetime(2026, 3, 2, 12, 0)
+        ) == datetime(2026, 3, 2, 12, 5)
+
+
+def test_slots_spread_retries_across_minutes(planner, monkeypatch):
+    monkeypatch.setattr(config.retry, 'max_retries_per_minute', 2)
+    when = datetime(2026, 3, 1, 10, 0, 10)
+    assert [planner.reserve_slot(when, when) for _ in range(5)] == [datetime
+        (2026, 3, 1, 10, 0, 10), datetime(2026, 3, 1, 10, 0, 30), datetime(
+        2026, 3, 1, 10, 1), datetime(2026, 3, 1, 10, 1, 30), datetime(2026,
+        3, 1, 10, 2)]
+
+
+def test_full_slots_skip_quiet_hours(planner, monkeypatch):
+    monkeypatch.setattr(config.retry, 'max_retries_per_minute', 1)
+    monkeypatch.setattr(config.retry, 'quiet_hours_start', 21)
+    monkeypatch.setattr(config.retry, 'quiet_hours_end', 8)
+    when = datetime(2026, 3, 1, 20, 59)
+    assert planner.reserve_slot(when, when) == when
+    assert planner.reserve_slot(when, when) == datetime(2026, 3, 2, 8, 0)
+    assert planner.reserve_slot(when, when) == datetime(2026, 3, 2, 8, 1)
+
+
+def test_explicit_zero_delay_retries_now(planner):
+    now = datetime(2026, 3, 1, 12, 0)
+    assert planner.plan('busy', 1, now=now, delay_minutes=0) == now
+    assert planner.plan('busy', 1, now=now) == now + timedelta(minutes=5)
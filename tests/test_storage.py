@@ -0,0 +1,243 @@
+import glob
+import os
+import re
+import sqlite3
+import sys
+from datetime import date, datetime, timedelta, timezone
+from types import ModuleType
+import pytest
+from models import Call, Contact, DatabaseManager, Transcript
+from storage import PostgresBackend, _adapt, _translate
+from transcript_processor import TranscriptProcessor
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.
+    pardir, 'src')
+SQLITE_ONLY_MODULES = {'archive_manager.py', 'storage.py'}
+SQLITE_ONLY_SQL = re.compile(
+    "datetime\\('now'|\\bDATE\\(|julianday\\(|INSERT OR |IFNULL\\(|GROUP_CONCAT\\(")
+
+
+POSTGRES_DDL = [(re.compile('BIGSERIAL PRIMARY KEY'),
+    'INTEGER PRIMARY KEY AUTOINCREMENT'), (re.compile(
+    "DEFAULT to_char\\(now\\(\\) AT TIME ZONE 'UTC', '[^']*'\\)"),
+    'DEFAULT CURRENT_TIMESTAMP'), (re.compile(
+    'SELECT column_name FROM information_schema\\.columns WHERE .* AND table_name = \\?'
+    ), 'SELECT name FROM pragma_table_info(?)')]
+
+
+class FakePostgresCursor:
+    """A psycopg2 cursor that checks what psycopg2 would be sent and runs it on SQLite."""
+
+    def __init__(self, connection, name, cursor_factory):
+        self.connection = connection
+        self.name = name
+        self.cursor_factory = cursor_factory
+        self.itersize = None
+        self.arraysize = 1
+        self._cursor = connection.sqlite.cursor()
+
+    def _sqlite(self, sql, params):
+        self.connection.statements.append((sql, params))
+        if params is not None:
+            assert isinstance(params, tuple)
+            assert not any(isinstance(value, (date, datetime)) for value in
+                params)
+            assert '?' not in sql.split("'")[::2] and sql.count('%s') == len(
+                params), sql
+            sql = sql.replace('%s', '?').replace('%%', '%')
+        for pattern, replacement in POSTGRES_DDL:
+            sql = pattern.sub(replacement, sql)
+        return sql
+
+    def execute(self, sql, params=None):
+        self._cursor.execute(self._sqlite(sql, params), params or ())
+
+    def executemany(self, sql, seq_of_params):
+        seq_of_params = list(seq_of_params)
+        self._cursor.executemany(self._sqlite(sql, seq_of_params[0] if
+            seq_of_params else None), seq_of_params)
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size):
+        return self._cursor.fetchmany(size)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def close(self):
+        self._cursor.close()
+
+
+class FakePostgresConnection:
+
+    def __init__(self, path, statements):
+        self.sqlite = sqlite3.connect(path, check_same_thread=False)
+        self.statements = statements
+        self.closed = False
+
+    def cursor(self, name=None, cursor_factory=None):
+        cursor = FakePostgresCursor(self, name, cursor_factory)
+        if cursor_factory is not None:
+            cursor._cursor.row_factory = sqlite3.Row
+        return cursor
+
+    def commit(self):
+        self.sqlite.commit()
+
+    def rollback(self):
+        self.sqlite.rollback()
+
+
+def fake_psycopg2(path):
+    """Just enough of psycopg2 for PostgresBackend: a pool over SQLite connections
+    that records every statement and its parameters."""
+    psycopg2 = ModuleType('psycopg2')
+    psycopg2.IntegrityError = sqlite3.IntegrityError
+    psycopg2.extras = ModuleType('psycopg2.extras')
+    psycopg2.extras.DictCursor = object()
+    psycopg2.pool = ModuleType('psycopg2.pool')
+    psycopg2.statements = []
+
+    class ThreadedConnectionPool:
+
+        def __init__(self, minconn, maxconn, url):
+            self.url = url
+
+        def getconn(self):
+            return FakePostgresConnection(path, psycopg2.statements)
+
+        def putconn(self, conn, close=False):
+            conn.sqlite.close()
+    psycopg2.pool.ThreadedConnectionPool = ThreadedConnectionPool
+    return psycopg2
+
+
+@pytest.fixture
+def fake_postgres(monkeypatch, tmp_path):
+    psycopg2 = fake_psycopg2(str(tmp_path / 'postgres.db'))
+    monkeypatch.setitem(sys.modules, 'psycopg2', psycopg2)
+    monkeypatch.setitem(sys.modules, 'psycopg2.extras', psycopg2.extras)
+    monkeypatch.setitem(sys.modules, 'psycopg2.pool', psycopg2.pool)
+    return psycopg2
+
+
+@pytest.fixture(params=['sqlite', 'fake-postgresql', 'postgresql'])
+def storage(request, tmp_path):
+    """A DatabaseManager on SQLite, on PostgresBackend over the fake psycopg2 and,
+    when ``ROBOCALL_TEST_POSTGRES_URL`` names a scratch database and psycopg2 is
+    installed, on PostgreSQL."""
+    if request.param == 'sqlite':
+        yield DatabaseManager(str(tmp_path / 'robo_calls.db'), str(
+            tmp_path / 'archive'))
+        return
+    if request.param == 'fake-postgresql':
+        request.getfixturevalue('fake_postgres')
+        yield DatabaseManager('postgresql://localhost/robocall', str(
+            tmp_path / 'archive'))
+        return
+    url = os.getenv('ROBOCALL_TEST_POSTGRES_URL')
+    if not url:
+        pytest.skip('ROBOCALL_TEST_POSTGRES_URL is not set')
+    pytest.importorskip('psycopg2')
+    db_manager = DatabaseManager(url, str(tmp_path / 'archive'))
+    yield db_manager
+    conn = db_manager.get_connection()
+    tables = [row[0] for row in conn.execute(
+        'SELECT table_name FROM information_schema.tables WHERE table_schema = current_schema()'
+        ).fetchall()]
+    conn.execute(f"TRUNCATE {', '.join(tables)} RESTART IDENTITY CASCADE")
+    conn.commit()
+    conn.close()
+
+
+def test_translate_rewrites_placeholders_outside_literals():
+    assert _translate("SELECT * FROM t WHERE a = ? AND b = '?' AND c LIKE ?"
+        ) == "SELECT * FROM t WHERE a = %s AND b = '?' AND c LIKE %s"
+    assert _translate("SELECT '5%' || ?, 100 % 7") == "SELECT '5%%' || %s, 100 %% 7"
+
+
+def test_adapt_binds_timestamps_as_sqlite_text():
+    assert _adapt(()) is None
+    assert _adapt((datetime(2024, 1, 2, 3, 4, 5), date(2024, 1, 2), 7, None)
+        ) == ('2024-01-02 03:04:05', '2024-01-02', 7, None)
+
+
+def test_postgres_ddl():
+    backend = object.__new__(PostgresBackend)
+    sql = backend.ddl(
+        'CREATE TABLE t (id INTEGER PRIMARY KEY AUTOINCREMENT, score REAL, seen TIMESTAMP, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)'
+        )
+    assert sql.startswith('CREATE TABLE t (id BIGSERIAL PRIMARY KEY, score DOUBLE PRECISION, seen TEXT, created_at TEXT DEFAULT to_char(')
+    assert 'TIMESTAMP' not in sql.replace('CURRENT_TIMESTAMP', '')
+
+
+def test_shared_sql_avoids_sqlite_only_functions():
+    offenders = []
+    for path in sorted(glob.glob(os.path.join(SRC_DIR, '*.py'))):
+        if os.path.basename(path) in SQLITE_ONLY_MODULES:
+            continue
+        with open(path) as source:
+            offenders += [f'{os.path.basename(path)}:{number}' for number,
+                line in enumerate(source, 1) if SQLITE_ONLY_SQL.search(line)]
+    assert offenders == []
+
+
+def test_transcript_summary_counts_last_week_by_utc_day(storage):
+    contact_id = storage.add_contact(Contact(phone_number='+15551230000',
+        name='Pat Smith'))
+    call_id = storage.add_call(Call(contact_id=contact_id, status=
+        'completed', start_time=datetime.now()))
+    for confidence in (0.5, 0.9, None):
+        storage.add_transcript(Transcript(call_id=call_id, transcript_text=
+            'Please call back tomorrow', confidence_score=confidence))
+    conn = storage.get_connection()
+    conn.execute('UPDATE transcripts SET created_at = ? WHERE id = 3', (
+        datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=10),))
+    conn.commit()
+    conn.close()
+    summary = TranscriptProcessor(storage).get_transcript_summary()
+    assert summary['total_transcripts'] == 3
+    assert summary['average_confidence'] == 0.7
+    assert summary['daily_counts'] == {datetime.now(timezone.utc).date().
+        isoformat(): 2}
+    assert ('please', 3) in summary['top_words']
+
+
+def test_postgres_backend_sends_translated_sql(fake_postgres):
+    db_manager = DatabaseManager('postgresql://localhost/robocall')
+    assert isinstance(db_manager.backend, PostgresBackend)
+    contact_id = db_manager.add_contact(Contact(phone_number=
+        '+15551230000', name='Pat Smith'))
+    started = datetime(2024, 1, 2, 3, 4, 5)
+    call_id = db_manager.add_call(Call(contact_id=contact_id, status=
+        'initiated', start_time=started))
+    del fake_postgres.statements[:]
+    assert db_manager.transition_call_status(call_id, 'completed', [
+        'initiated', 'ringing'], call_sid='CA1', duration=30, end_time=
+        datetime(2024, 1, 2, 3, 5, 0))
+    sql, params = fake_postgres.statements[0]
+    assert 'WHERE id = %s AND status IN (%s, %s)' in sql
+    assert params == ('completed', 'CA1', 30, '2024-01-02 03:05:00',
+        call_id, 'initiated', 'ringing')
+    assert not db_manager.transition_call_status(call_id, 'ringing', [
+        'initiated'])
+    call = db_manager.get_call(call_id)
+    assert (call.status, call.call_sid, call.duration) == ('completed',
+        'CA1', 30)
+    assert str(call.start_time) == '2024-01-02 03:04:05'
+    assert db_manager.get_contact(contact_id).name == 'Pat Smith'
+    assert [row['status'] for row in db_manager.get_call_history_rows()
+        ] == ['completed']
+    assert db_manager.backend._slots._value == db_manager.backend.pool_size
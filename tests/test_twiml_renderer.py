@@ -0,0 +1,65 @@
+import logging
+from xml.etree import ElementTree
+from twiml_renderer import TwimlRenderer
+
+
+def spoken_text(body: bytes) ->str:
+    return ElementTree.fromstring(body).find('Say').text
+
+
+def test_script_and_variables_are_escaped():
+    renderer = TwimlRenderer()
+    body, _ = renderer.render('Hi {name} & welcome <back>', {'name':
+        'Pat</Say><Hangup/>'})
+    assert b'<Hangup/>' not in body
+    assert spoken_text(body) == 'Hi Pat</Say><Hangup/> & welcome <back>'
+
+
+def test_static_script_is_served_from_one_compiled_body():
+    renderer = TwimlRenderer()
+    first, etag = renderer.render('Hello there')
+    second, second_etag = renderer.render('Hello there')
+    assert first is second and etag == second_etag
+    assert renderer.get_stats()['templates'] == 1
+
+
+def test_etag_changes_with_variables_and_script():
+    renderer = TwimlRenderer()
+    _, pat = renderer.render('Hello {first_name}', {'first_name': 'Pat'})
+    _, sam = renderer.render('Hello {first_name}', {'first_name': 'Sam'})
+    _, again = renderer.render('Hello {first_name}', {'first_name': 'Pat'})
+    _, other_script = renderer.render('Hi {first_name}', {'first_name': 'Pat'})
+    assert pat == again
+    assert len({pat, sam, other_script}) == 3
+    assert renderer.get_stats()['hits'] == 1
+
+
+def test_missing_variables_and_stray_braces_render_literally():
+    renderer = TwimlRenderer()
+    body, _ = renderer.render('Hello {first_name}, code {}', {})
+    assert spoken_text(body) == 'Hello , code {}'
+    body, _ = renderer.render('Unbalanced {name', {'name': 'Pat'})
+    assert spoken_text(body) == 'Unbalanced {name'
+
+
+def test_unknown_and_positional_fields_stay_literal_and_warn_once(caplog):
+    renderer = TwimlRenderer()
+    script = 'Hi {frist_name}, press {0} or {} for {name}'
+    with caplog.at_level(logging.WARNING, logger='twiml_renderer'):
+        for name in ('Pat', 'Sam'):
+            body, _ = renderer.render(script, {'name': name, 'frist_name':
+                'x', '0': 'y'})
+            assert spoken_text(body
+                ) == f'Hi {{frist_name}}, press {{0}} or {{}} for {name}'
+    assert [record.getMessage() for record in caplog.records] == [
+        f'Script {renderer.get_template(script).version} has unknown placeholders {{frist_name}}, {{0}}, {{}}; they are spoken as written'
+        ]
+
+
+def test_rendered_cache_is_bounded():
+    renderer = TwimlRenderer(max_templates=2, max_rendered=3)
+    for index in range(10):
+        renderer.render(f'Script {index} for {{name}}', {'name': str(index)})
+    stats = renderer.get_stats()
+    assert stats['templates'] == 2
+    assert stats['rendered'] == 3
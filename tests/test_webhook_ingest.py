@@ -0,0 +1,192 @@
+import asyncio
+import time
+from urllib.parse import urlencode
+import pytest
+from change_feed import ChangeFeed
+from event_bus import EventBus, event_bus
+from models import DatabaseManager
+from retry_handler import RetryHandler
+from transcript_processor import TranscriptProcessor
+from webhook_ingest import WebhookIngest
+from webhook_processor import WebhookProcessor
+
+
+@pytest.fixture
+def webhook_processor(db_manager, call_manager):
+    retry_handler = RetryHandler(db_manager, call_manager)
+    yield WebhookProcessor(call_manager, TranscriptProcessor(db_manager),
+        retry_handler, cache_size=100)
+    retry_handler.shutdown()
+
+
+@pytest.fixture
+def make_ingest(webhook_processor, call_manager):
+    ingests = []
+
+    def make(**kwargs) ->WebhookIngest:
+        ingest = WebhookIngest(webhook_processor, call_manager, workers=2,
+            **kwargs)
+        ingests.append(ingest)
+        return ingest
+    yield make
+    for ingest in ingests:
+        ingest.stop()
+
+
+async def post(ingest, call_id: int, form: dict, kind: str='status') ->int:
+    messages = [{'type': 'http.request', 'body': urlencode(form).encode(),
+        'more_body': False}]
+    codes = []
+
+    async def receive():
+        return messages.pop()
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            codes.append(message['status'])
+    await ingest({'type': 'http', 'method': 'POST', 'path':
+        f'/webhook/{kind}/{call_id}', 'headers': []}, receive, send)
+    return codes[0]
+
+
+def deliver(ingest, call_id: int, form: dict, kind: str='status') ->int:
+    return asyncio.run(post(ingest, call_id, form, kind))
+
+
+def status_form(status: str, sequence: int=0) ->dict:
+    return {'CallSid': 'CA1', 'CallStatus': status, 'SequenceNumber': str(
+        sequence)}
+
+
+def wait_for(condition, timeout: float=2):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.01)
+
+
+def test_callback_is_persisted_before_it_is_acknowledged(db_manager,
+    make_ingest, add_call):
+    call_id = add_call('initiated', call_sid='CA1')
+    ingest = make_ingest()
+    assert deliver(ingest, call_id, status_form('ringing')) == 200
+    assert db_manager.get_webhook_inbox_events() == [(1, 'status', call_id,
+        status_form('ringing'))]
+    ingest.start()
+    ingest.join()
+    assert db_manager.get_call_status(call_id) == 'ringing'
+    assert db_manager.get_webhook_inbox_events() == []
+
+
+def test_failed_callback_is_replayed_on_restart(db_manager, make_ingest,
+    webhook_processor, add_call, monkeypatch):
+    call_id = add_call('initiated', call_sid='CA1')
+    apply_status = webhook_processor._apply_status
+
+    def fail(*args):
+        raise RuntimeError('database is locked')
+    monkeypatch.setattr(webhook_processor, '_apply_status', fail)
+    ingest = make_ingest()
+    ingest.start()
+    assert deliver(ingest, call_id, status_form('completed')) == 200
+    ingest.join()
+    assert ingest.failed == 1
+    assert len(db_manager.get_webhook_inbox_events()) == 1
+    ingest.stop()
+    monkeypatch.setattr(webhook_processor, '_apply_status', apply_status)
+    restarted = make_ingest()
+    restarted.start()
+    restarted.join()
+    assert restarted.replayed == 1
+    assert db_manager.get_call_status(call_id) == 'completed'
+    assert db_manager.get_webhook_inbox_events() == []
+
+
+def test_concurrent_callbacks_share_an_inbox_write(db_manager,
+    make_ingest, add_call, monkeypatch):
+    call_ids = [add_call('initiated', call_sid=f'CA{index}') for index in
+        range(5)]
+    writes = []
+    add_events = db_manager.add_webhook_inbox_events
+
+    def record(events, received_at):
+        writes.append(len(events))
+        return add_events(events, received_at)
+    monkeypatch.setattr(db_manager, 'add_webhook_inbox_events', record)
+    ingest = make_ingest()
+
+    async def post_all():
+        return await asyncio.gather(*(post(ingest, call_id, status_form(
+            'ringing')) for call_id in call_ids))
+    assert asyncio.run(post_all()) == [200] * 5
+    assert writes == [5]
+    assert [call_id for _, _, call_id, _ in db_manager.
+        get_webhook_inbox_events()] == call_ids
+
+
+def test_inbox_write_failure_is_not_acknowledged(db_manager, make_ingest,
+    add_call, monkeypatch):
+    call_id = add_call('initiated', call_sid='CA1')
+
+    def fail(events, received_at):
+        raise RuntimeError('disk I/O error')
+    monkeypatch.setattr(db_manager, 'add_webhook_inbox_events', fail)
+    ingest = make_ingest()
+    assert deliver(ingest, call_id, status_form('ringing')) == 500
+    assert ingest.accepted == 0
+    assert all(events.empty() for events in ingest.queues)
+
+
+def test_full_queue_and_malformed_callbacks_are_not_persisted(db_manager,
+    make_ingest, add_call):
+    call_id = add_call('initiated', call_sid='CA1')
+    ingest = make_ingest(queue_size=1)
+    assert deliver(ingest, call_id, status_form('ringing')) == 200
+    assert deliver(ingest, call_id, status_form('in-progress', 1)) == 503
+    assert deliver(ingest, call_id, status_form('dialing', 2)) == 400
+    assert deliver(ingest, call_id, {'CallSid': 'CA1'}, 'recording') == 400
+    assert len(db_manager.get_webhook_inbox_events()) == 1
+    assert (ingest.accepted, ingest.overflowed, ingest.rejected) == (1, 1, 2)
+
+
+def test_change_feed_carries_ingest_changes_to_another_process(db_manager,
+    make_ingest, add_call, tmp_path):
+    call_id = add_call('initiated', call_sid='CA1')
+    flask_db = DatabaseManager(db_manager.db_path, str(tmp_path / 'archive'))
+    flask_bus = EventBus()
+    subscription = flask_bus.subscribe()
+    follower = ChangeFeed(flask_db, flask_bus, poll_seconds=0.01)
+    publisher = ChangeFeed(db_manager, event_bus, poll_seconds=0.01)
+    follower.start_following()
+    publisher.start_publishing()
+    try:
+        versions = flask_db.get_table_versions(('calls',))
+        ingest = make_ingest(change_feed=publisher)
+        ingest.start()
+        assert deliver(ingest, call_id, status_form('completed')) == 200
+        ingest.join()
+        events = subscription.get(timeout=2)
+        assert [(event['type'], event['data']['call_id'], event['data'][
+            'status']) for event in events] == [('call_status', call_id,
+            'completed')]
+        wait_for(lambda : flask_db.get_table_versions(('calls',)) != versions)
+    finally:
+        publisher.stop()
+        follower.stop()
+    assert not event_bus.has_subscribers
+    assert db_manager.on_change is None
+
+
+def test_ingest_app_leaves_dispatch_and_reconciliation_to_flask(app_module,
+    monkeypatch):
+    from webhook_ingest import create_ingest_app
+    started = []
+    monkeypatch.setattr(app_module.retry_handler, 'start', lambda :
+        started.append('retries'))
+    monkeypatch.setattr(app_module.call_manager.reconciler, 'start', lambda :
+        started.append('reconciler'))
+    monkeypatch.setattr(app_module.change_feed, 'start_publishing', lambda :
+        started.append('change_feed'))
+    ingest = create_ingest_app(workers=1)
+    assert ingest.change_feed is app_module.change_feed
+    assert started == ['change_feed']
@@ -0,0 +1,100 @@
+import sqlite3
+import pytest
+from config import config
+from retry_handler import RetryHandler
+from transcript_processor import TranscriptProcessor
+from webhook_processor import WebhookProcessor
+
+
+@pytest.fixture
+def transcript_processor(db_manager, monkeypatch):
+    processor = TranscriptProcessor(db_manager)
+    processor.transcribed = []
+
+    def transcribe(recording_url, call_id):
+        processor.transcribed.append(recording_url)
+        return {'success': True, 'transcript': 'Hello', 'confidence': 0.9}
+    monkeypatch.setattr(processor, '_transcribe_recording', transcribe)
+    monkeypatch.setattr(config.call, 'transcribe_calls', True)
+    return processor
+
+
+@pytest.fixture
+def retry_handler(db_manager, call_manager):
+    handler = RetryHandler(db_manager, call_manager)
+    yield handler
+    handler.shutdown()
+
+
+@pytest.fixture
+def webhook_processor(call_manager, transcript_processor, retry_handler):
+    return WebhookProcessor(call_manager, transcript_processor,
+        retry_handler, cache_size=100)
+
+
+def count_rows(db_manager, table):
+    conn = db_manager.get_connection()
+    count = conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+    conn.close()
+    return count
+
+
+def test_repeated_failure_callback_schedules_one_retry(db_manager,
+    webhook_processor, add_call):
+    call_id = add_call('ringing', call_sid='CA1')
+    form = {'CallSid': 'CA1', 'CallStatus': 'busy', 'SequenceNumber': '3'}
+    assert [webhook_processor.handle_status(call_id, form) for _ in range(3)
+        ] == [True, False, False]
+    webhook_processor.recent.keys.clear()
+    assert not webhook_processor.handle_status(call_id, form)
+    assert count_rows(db_manager, 'scheduled_retries') == 1
+    assert webhook_processor.get_stats()['duplicates'] == 3
+
+
+def test_recording_is_transcribed_once(db_manager, webhook_processor,
+    transcript_processor, add_call):
+    call_id = add_call('completed', call_sid='CA1')
+    form = {'CallSid': 'CA1', 'RecordingSid': 'RE1', 'RecordingUrl':
+        'https://example.test/RE1'}
+    webhook_processor.handle_recording(call_id, form)
+    webhook_processor.handle_recording(call_id, form)
+    assert transcript_processor.transcribed == ['https://example.test/RE1']
+    assert count_rows(db_manager, 'transcripts') == 1
+
+
+def test_storage_error_releases_the_claim(db_manager, webhook_processor,
+    add_call, monkeypatch):
+    call_id = add_call('ringing', call_sid='CA1')
+    form = {'CallSid': 'CA1', 'CallStatus': 'no-answer', 'SequenceNumber': '2'}
+    transition = db_manager.transition_call_status
+
+    def locked(*args, **kwargs):
+        raise sqlite3.OperationalError('database is locked')
+    monkeypatch.setattr(db_manager, 'transition_call_status', locked)
+    with pytest.raises(sqlite3.OperationalError):
+        webhook_processor.handle_status(call_id, form)
+    assert count_rows(db_manager, 'webhook_events') == 0
+    monkeypatch.setattr(db_manager, 'transition_call_status', transition)
+    assert webhook_processor.handle_status(call_id, form)
+    assert db_manager.get_call_status(call_id) == 'no-answer'
+    assert count_rows(db_manager, 'scheduled_retries') == 1
+
+
+def test_stale_failure_does_not_schedule_a_retry(db_manager,
+    webhook_processor, add_call):
+    call_id = add_call('completed', call_sid='CA1')
+    assert webhook_processor.handle_status(call_id, {'CallSid': 'CA1',
+        'CallStatus': 'busy', 'SequenceNumber': '4'})
+    assert db_manager.get_call_status(call_id) == 'completed'
+    assert count_rows(db_manager, 'scheduled_retries') == 0
+
+
+def test_failure_reconciled_before_its_callback_schedules_one_retry(
+    db_manager, call_manager, webhook_processor, add_call):
+    call_id = add_call('ringing', call_sid='CA1')
+    assert call_manager.update_call_status(call_id, 'busy', duration=0)
+    assert count_rows(db_manager, 'scheduled_retries') == 1
+    assert webhook_processor.handle_status(call_id, {'CallSid': 'CA1',
+        'CallStatus': 'busy', 'SequenceNumber': '3'})
+    assert count_rows(db_manager, 'scheduled_retries') == 1
+    assert count_rows(db_manager, 'retry_attempts') == 1